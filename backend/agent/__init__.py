@@ -1,12 +1,18 @@
+import threading
+
+from langchain_core.runnables import RunnableLambda
 from langchain_openai import ChatOpenAI
 from langgraph.graph import END, StateGraph
+from langgraph.graph.state import CompiledStateGraph
 
+from backend.agent.document_store import get_document_store
 from backend.agent.edges import GraphEdges
 from backend.agent.generate_chain import create_recommendation_chain
 from backend.agent.grader import GraderUtils
 from backend.agent.graph import GraphState
+from backend.agent.keyword_index import get_keyword_index_store
 from backend.agent.nodes import GraphNodes
-from backend.agent.vector_store import get_pinecone_vector_store, Retriever
+from backend.agent.vector_store import get_vector_store, get_reranker, vector_scores_are_distances, Retriever
 from backend.config import settings
 from backend.utils import get_tavily_web_search_tool
 
@@ -14,8 +20,17 @@ from backend.utils import get_tavily_web_search_tool
 def compile_graph():
 
     # Vector Store
-    _vector_store = get_pinecone_vector_store()
-    retriever = Retriever(vector_store=_vector_store)
+    _vector_store = get_vector_store()
+    keyword_index = get_keyword_index_store() if settings.HYBRID_SEARCH_ENABLED else None
+    retriever = Retriever(
+        vector_store=_vector_store,
+        keyword_index=keyword_index,
+        reranker=get_reranker(),
+        scores_are_distances=vector_scores_are_distances(),
+        candidates=settings.RETRIEVAL_CANDIDATES,
+        top_k=settings.RETRIEVAL_TOP_K,
+        document_store=get_document_store(),
+    )
 
     # LLM
     llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.5, openai_api_key=settings.OPENAI_API_KEY)
@@ -30,14 +45,23 @@ def compile_graph():
     graph_nodes = GraphNodes(
         llm=llm, retriever=retriever, retrieval_grader=retrieval_grader, web_search_tool=web_search_tool)
     graph_edges = GraphEdges(None, None)
+    return build_workflow(graph_nodes, graph_edges)
+
 
+def build_workflow(graph_nodes: GraphNodes, graph_edges: GraphEdges) -> CompiledStateGraph:
     # Build workflow
     workflow = StateGraph(GraphState)
 
-    workflow.add_node("vector_search", graph_nodes.vector_store_retrieve)
-    workflow.add_node("vector_search_evaluate", graph_nodes.grade_vector_store_documents)
-    workflow.add_node("web_search", graph_nodes.web_search)
-    workflow.add_node("generate", graph_nodes.generate)
+    # Each node carries a sync and an async implementation, `invoke` runs the former and `ainvoke` the latter
+    workflow.add_node("vector_search", RunnableLambda(
+        graph_nodes.vector_store_retrieve, afunc=graph_nodes.avector_store_retrieve, name="vector_search"))
+    workflow.add_node("vector_search_evaluate", RunnableLambda(
+        graph_nodes.grade_vector_store_documents, afunc=graph_nodes.agrade_vector_store_documents,
+        name="vector_search_evaluate"))
+    workflow.add_node("web_search", RunnableLambda(
+        graph_nodes.web_search, afunc=graph_nodes.aweb_search, name="web_search"))
+    workflow.add_node("generate", RunnableLambda(
+        graph_nodes.generate, afunc=graph_nodes.agenerate, name="generate"))
 
     workflow.set_entry_point("vector_search")
     workflow.add_edge("vector_search", "vector_search_evaluate")
@@ -56,4 +80,17 @@ def compile_graph():
     return workflow.compile()
 
 
-agent_workflow = compile_graph()
+_agent_workflow: CompiledStateGraph | None = None
+_agent_workflow_lock = threading.Lock()
+
+
+def get_agent_workflow() -> CompiledStateGraph:
+    """
+    Compile the agent graph on first use, so importing the backend does not create the API clients
+    """
+    global _agent_workflow
+    if _agent_workflow is None:
+        with _agent_workflow_lock:
+            if _agent_workflow is None:
+                _agent_workflow = compile_graph()
+    return _agent_workflow
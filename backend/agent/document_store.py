@@ -0,0 +1,145 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from langchain_core.documents import Document
+from sqlalchemy import text
+
+from backend.config import settings
+from backend.database import db_session
+
+POST_COLUMNS = "id, title, body, author, subreddit, score, created_at, s3_url, namespace, comments"
+# Columns of a `reddit_post_chunks` row "c" joined with its parent post "p"
+CHUNK_COLUMNS = (
+    "c.id, c.post_id, c.chunk_type, c.chunk_index, c.content, p.title, p.author, p.subreddit, p.score, p.created_at, "
+    "p.s3_url, p.namespace, jsonb_array_length(COALESCE(p.comments, '[]'::jsonb)) AS num_comments"
+)
+
+
+def post_document(post: dict) -> Document:
+    """
+    Document for a `reddit_posts` row, with the text and metadata the ingestion pipeline embeds for a whole post
+    """
+    comments = post["comments"] or []
+    comments_text = " ".join(
+        f"Comment by {comment.get('author', 'Unknown')}: {comment.get('text', '')}" for comment in comments
+    )
+    return Document(
+        id=post["id"],
+        page_content=f"{post['title']} {post['body'] or ''} {comments_text}",
+        metadata={
+            "id": post["id"],
+            "title": post["title"],
+            "body": post["body"] or "",
+            "author": post["author"],
+            "subreddit": post["subreddit"],
+            "score": post["score"],
+            "created": str(post["created_at"]),
+            "s3_url": post["s3_url"],
+            "namespace": post["namespace"],
+            "comments": json.dumps(comments),
+        },
+    )
+
+
+def chunk_document(chunk: dict) -> Document:
+    """
+    Document for a `reddit_post_chunks` row joined with its parent post
+    """
+    return Document(
+        id=chunk["id"],
+        page_content=chunk["content"],
+        metadata={
+            "id": chunk["id"],
+            "post_id": chunk["post_id"],
+            "chunk_type": chunk["chunk_type"],
+            "chunk_index": chunk["chunk_index"],
+            "title": chunk["title"],
+            "author": chunk["author"],
+            "subreddit": chunk["subreddit"],
+            "score": chunk["score"],
+            "created": str(chunk["created_at"]),
+            "s3_url": chunk["s3_url"],
+            "namespace": chunk["namespace"],
+            "num_comments": chunk["num_comments"],
+        },
+    )
+
+
+class DocumentStore:
+    """
+    Content of the indexed posts and chunks, looked up by vector id so the vectors only carry small metadata.
+
+    Documents are served from a bounded LRU cache, the missing and expired ones are read with one query per table.
+    Entries expire after `ttl_seconds` so edited posts and new scores are picked up.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float = 600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[str, tuple[float, Document]] = OrderedDict()
+
+    def get_many(self, ids: list[str]) -> dict[str, Document]:
+        found = {}
+        now = time.monotonic()
+        with self._lock:
+            for _id in ids:
+                if _id not in self._cache:
+                    continue
+                expires_at, document = self._cache[_id]
+                if expires_at <= now:
+                    del self._cache[_id]
+                    continue
+                self._cache.move_to_end(_id)
+                found[_id] = document
+
+        if missing := [_id for _id in dict.fromkeys(ids) if _id not in found]:
+            fetched = self._fetch(missing)
+            found.update(fetched)
+            expires_at = time.monotonic() + self.ttl_seconds
+            with self._lock:
+                self._cache.update((_id, (expires_at, document)) for _id, document in fetched.items())
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return found
+
+    @staticmethod
+    def _fetch(ids: list[str]) -> dict[str, Document]:
+        return fetch_documents(ids)
+
+
+def fetch_documents(ids: list[str]) -> dict[str, Document]:
+    """
+    Read the posts and chunks of `ids` from the database, with one query per table
+    """
+    # Chunk ids are "<post id>#<chunk type>-<index>"
+    chunk_ids = [_id for _id in ids if "#" in _id]
+    post_ids = [_id for _id in ids if "#" not in _id]
+
+    documents = {}
+    with db_session() as session:
+        if post_ids:
+            rows = session.execute(
+                text(f"SELECT {POST_COLUMNS} FROM reddit_posts WHERE id = ANY(:ids)"), {"ids": post_ids}
+            ).mappings().all()
+            documents.update((row["id"], post_document(row)) for row in rows)
+        if chunk_ids:
+            rows = session.execute(
+                text(
+                    f"SELECT {CHUNK_COLUMNS} FROM reddit_post_chunks c JOIN reddit_posts p ON p.id = c.post_id "
+                    "WHERE c.id = ANY(:ids)"
+                ),
+                {"ids": chunk_ids},
+            ).mappings().all()
+            documents.update((row["id"], chunk_document(row)) for row in rows)
+    return documents
+
+
+@lru_cache
+def get_document_store() -> DocumentStore:
+    return DocumentStore(
+        max_entries=settings.DOCUMENT_CACHE_MAX_ENTRIES, ttl_seconds=settings.DOCUMENT_CACHE_TTL_SECONDS
+    )
@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """
+    Embedding model wrapper that keeps the most recent query embeddings in a bounded LRU cache.
+
+    Queries are keyed on the embedding model and their whitespace/case normalised text, the model still embeds the
+    text as typed. Embeddings are stored as float32 arrays to keep the memory footprint of `max_entries` vectors
+    predictable, and returned with the same values on a miss and on the later hits. Document embeddings are passed
+    through.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, max_entries: int):
+        self.embeddings = embeddings
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[tuple[str, str], np.ndarray] = OrderedDict()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        if (embedding := self._get(key)) is not None:
+            return embedding
+
+        return self._put(key, self.embeddings.embed_query(text))
+
+    async def aembed_query(self, text: str) -> list[float]:
+        key = self._key(text)
+        if (embedding := self._get(key)) is not None:
+            return embedding
+
+        return self._put(key, await self.embeddings.aembed_query(text))
+
+    def _key(self, text: str) -> tuple[str, str]:
+        return self.model, " ".join(text.split()).casefold()
+
+    def _get(self, key: tuple[str, str]) -> list[float] | None:
+        with self._lock:
+            if key not in self._cache:
+                self.misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return self._cache[key].tolist()
+
+    def _put(self, key: tuple[str, str], embedding: list[float]) -> list[float]:
+        """Cache the embedding and return it as stored, so a miss returns the same values as the later hits"""
+        stored = np.asarray(embedding, dtype=np.float32)
+        with self._lock:
+            self._cache[key] = stored
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return stored.tolist()
@@ -1,3 +1,5 @@
+import asyncio
+import concurrent.futures
 from enum import StrEnum
 
 from typing_extensions import TypedDict
@@ -16,12 +18,17 @@ class GraphState(TypedDict):
         generation: LLM generation
         resources: A list of resources that were used to generate the response.
         steps: A list of steps that were taken to generate the response.
+        query_embedding: Embedding of the prompt, computed once and reused by every stage of the request.
+        speculative_web_search: Web search started alongside the vector search, consumed by the web search node or
+            cancelled once the retrieved documents are graded relevant.
     """
     prompt: str
+    query_embedding: list[float]
     generation: str
     resources: list
     steps: list[str]
     perform_web_search: bool
+    speculative_web_search: concurrent.futures.Future | asyncio.Future | None
     category: str
     chat_session_id: int
 
@@ -0,0 +1,283 @@
+import logging
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable
+
+import numpy as np
+from langchain_core.documents import Document
+from sqlalchemy import text, bindparam
+
+from backend.agent.document_store import post_document, POST_COLUMNS
+from backend.config import settings
+from backend.database import db_session
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-.][a-z0-9]+)*")
+_SEPARATOR_PATTERN = re.compile(r"[-.]")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i if in is it its me my of on or so that the this to was what "
+    "which with you your".split()
+)
+
+
+def tokenize(content: str) -> list[str]:
+    """
+    Split text into lowercase terms, keeping product model names searchable in their common spellings:
+    "WH-1000XM5" also yields "wh1000xm5", and "HD 600" also yields "hd600".
+    """
+    tokens = []
+    previous = None
+    for match in _TOKEN_PATTERN.findall(content.lower()):
+        if "-" in match or "." in match:
+            parts = _SEPARATOR_PATTERN.split(match)
+            tokens.extend(part for part in parts if part not in _STOPWORDS)
+            tokens.append("".join(parts))
+            first, last = parts[0], parts[-1]
+        else:
+            if match not in _STOPWORDS:
+                tokens.append(match)
+            first = last = match
+        if previous is not None and first.isdigit() and previous.isalpha():
+            tokens.append(previous + first)
+        previous = last
+    return tokens
+
+
+class _Postings:
+    """
+    Growable arrays of the rows containing a term and the term frequency in each row, read as NumPy arrays
+    without copying
+    """
+    __slots__ = ("rows", "frequencies")
+
+    def __init__(self):
+        self.rows = array("i")
+        self.frequencies = array("f")
+
+    def append(self, row: int, frequency: int):
+        self.rows.append(row)
+        self.frequencies.append(frequency)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class KeywordIndex:
+    """
+    In-memory BM25 index over the posts of one namespace.
+
+    Postings are kept as per-term NumPy arrays, so a query is a handful of vectorised operations over the postings of
+    its terms. Documents are added incrementally, re-adding an id replaces the previous version of the document, which
+    is tombstoned and dropped from the arrays once tombstones make up a quarter of the rows.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._postings: dict[str, _Postings] = {}
+        self._document_frequencies: dict[str, int] = {}
+        self._documents: list[Document | None] = []
+        self._rows: dict[str, int] = {}
+        self._lengths = np.empty(0, dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._total_length = 0.0
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, document_id: str) -> bool:
+        return document_id in self._rows
+
+    def add(self, documents: Iterable[Document]):
+        """
+        Index the documents, replacing the indexed versions of documents with the same id
+        """
+        # Tokenize outside the lock, searches only wait for the array updates
+        tokenized = [(document, tokenize(document.page_content)) for document in documents]
+        with self._lock:
+            for document, tokens in tokenized:
+                self._remove(document.id)
+                self._append(document, tokens)
+            self._compact_if_needed()
+
+    def remove(self, document_ids: Iterable[str]):
+        with self._lock:
+            for document_id in document_ids:
+                self._remove(document_id)
+            self._compact_if_needed()
+
+    def search(self, query: str, k: int) -> list[tuple[Document, float]]:
+        """
+        Top-k documents by BM25 score, best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            if not self._rows:
+                return []
+            postings = [(term, self._postings[term]) for term in terms if term in self._postings]
+            if not postings:
+                return []
+
+            count = len(self._rows)
+            average_length = self._total_length / count
+            rows = np.concatenate([np.frombuffer(p.rows, dtype=np.int32) for _, p in postings])
+            frequencies = np.concatenate([np.frombuffer(p.frequencies, dtype=np.float32) for _, p in postings])
+            idf = np.repeat(
+                np.array([self._idf(self._document_frequencies[term], count) for term, _ in postings], dtype=np.float32),
+                [len(p) for _, p in postings],
+            )
+
+            norms = self.k1 * (1 - self.b + self.b * self._lengths[rows] / average_length)
+            term_scores = idf * frequencies * (self.k1 + 1) / (frequencies + norms)
+            scores = np.bincount(rows, weights=term_scores, minlength=len(self._documents))
+            if len(self._rows) < len(self._documents):
+                scores[~self._alive[:len(scores)]] = 0
+
+            matched = np.flatnonzero(scores)
+            k = min(k, len(matched))
+            if not k:
+                return []
+            top = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+            top = top[np.argsort(-scores[top])]
+            return [(self._documents[row], float(scores[row])) for row in top]
+
+    @staticmethod
+    def _idf(document_frequency: int, count: int) -> float:
+        return float(np.log(1 + (count - document_frequency + 0.5) / (document_frequency + 0.5)))
+
+    def _append(self, document: Document, tokens: list[str]):
+        row = len(self._documents)
+        if row == len(self._lengths):
+            capacity = max(1024, 2 * row)
+            self._lengths = np.resize(self._lengths, capacity)
+            self._alive = np.resize(self._alive, capacity)
+        self._lengths[row] = len(tokens)
+        self._alive[row] = True
+        self._total_length += len(tokens)
+
+        for term, frequency in Counter(tokens).items():
+            if (postings := self._postings.get(term)) is None:
+                postings = self._postings[term] = _Postings()
+            postings.append(row, frequency)
+            self._document_frequencies[term] = self._document_frequencies.get(term, 0) + 1
+
+        self._documents.append(document)
+        self._rows[document.id] = row
+
+    def _remove(self, document_id: str):
+        if (row := self._rows.pop(document_id, None)) is None:
+            return
+        self._alive[row] = False
+        self._total_length -= self._lengths[row]
+        for term in set(tokenize(self._documents[row].page_content)):
+            self._document_frequencies[term] -= 1
+        self._documents[row] = None
+
+    def _compact_if_needed(self):
+        tombstones = len(self._documents) - len(self._rows)
+        if tombstones and tombstones * 4 >= len(self._documents):
+            documents = [document for document in self._documents if document is not None]
+            self._reset()
+            for document in documents:
+                self._append(document, tokenize(document.page_content))
+
+
+class KeywordIndexStore:
+    """
+    Keyword indexes of every namespace, built from `reddit_posts` on first use and synced with it in the background
+    once they are older than `refresh_seconds`: new and re-ingested posts are (re-)added, deleted posts are removed.
+    """
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self._indexes: dict[str, KeywordIndex] = {}
+        # Content hash and score of every indexed post, a post whose row no longer matches is indexed again
+        self._versions: dict[str, dict[str, tuple]] = {}
+        self._refreshed_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._refreshing: set[str] = set()
+
+    def get_index(self, namespace: str) -> KeywordIndex:
+        if namespace not in self._indexes:
+            with self._lock:
+                if namespace not in self._indexes:
+                    index = KeywordIndex()
+                    self._sync_posts(namespace, index)
+                    self._indexes[namespace] = index
+                    self._refreshed_at[namespace] = time.monotonic()
+        elif time.monotonic() - self._refreshed_at[namespace] > self.refresh_seconds:
+            self._refresh_in_background(namespace)
+        return self._indexes[namespace]
+
+    def search(self, query: str, namespace: str, k: int) -> list[tuple[Document, float]]:
+        return self.get_index(namespace).search(query, k)
+
+    def _refresh_in_background(self, namespace: str):
+        with self._lock:
+            if namespace in self._refreshing:
+                return
+            self._refreshing.add(namespace)
+            self._refreshed_at[namespace] = time.monotonic()
+        threading.Thread(target=self._refresh, args=(namespace,), daemon=True).start()
+
+    def _refresh(self, namespace: str):
+        try:
+            self._sync_posts(namespace, self._indexes[namespace])
+        except Exception as e:
+            logger.warning(f"Failed to refresh the keyword index of {namespace}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(namespace)
+
+    def _sync_posts(self, namespace: str, index: KeywordIndex):
+        versions = self._fetch_versions(namespace)
+        indexed_versions = self._versions.get(namespace, {})
+        changed_ids = [post_id for post_id, version in versions.items() if indexed_versions.get(post_id) != version]
+        removed_ids = [post_id for post_id in indexed_versions if post_id not in versions]
+
+        for start in range(0, len(changed_ids), 1000):
+            # Re-adding an id replaces the indexed version of the post
+            index.add(self._fetch_posts(changed_ids[start:start + 1000]))
+        index.remove(removed_ids)
+        self._versions[namespace] = versions
+
+        if changed_ids or removed_ids:
+            logger.info(
+                f"Synced the keyword index of {namespace}: {len(changed_ids)} posts added or updated, "
+                f"{len(removed_ids)} removed"
+            )
+
+    @staticmethod
+    def _fetch_versions(namespace: str) -> dict[str, tuple]:
+        with db_session() as session:
+            rows = session.execute(
+                text("SELECT id, content_hash, score FROM reddit_posts WHERE namespace = :namespace"),
+                {"namespace": namespace},
+            ).all()
+        return {post_id: (content_hash, score) for post_id, content_hash, score in rows}
+
+    @staticmethod
+    def _fetch_posts(post_ids: list[str]) -> list[Document]:
+        with db_session() as session:
+            rows = session.execute(
+                text(f"SELECT {POST_COLUMNS} FROM reddit_posts WHERE id IN :ids").bindparams(
+                    bindparam("ids", expanding=True)
+                ),
+                {"ids": post_ids},
+            ).mappings().all()
+        return [post_document(row) for row in rows]
+
+
+@lru_cache
+def get_keyword_index_store() -> KeywordIndexStore:
+    return KeywordIndexStore(refresh_seconds=settings.KEYWORD_INDEX_REFRESH_SECONDS)
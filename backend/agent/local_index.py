@@ -0,0 +1,407 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from typing import Iterable, Iterator
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from sqlalchemy import text
+
+from backend.agent.document_store import CHUNK_COLUMNS, POST_COLUMNS, chunk_document, fetch_documents, post_document
+from backend.config import settings
+from backend.database import db_session
+
+logger = logging.getLogger(__name__)
+
+VECTORS_FILE = "vectors.f32"
+CENTROIDS_FILE = "centroids.npy"
+LIST_OFFSETS_FILE = "list_offsets.npy"
+DOCUMENTS_FILE = "documents.jsonl"
+DOCUMENT_OFFSETS_FILE = "document_offsets.npy"
+INDEX_INFO_FILE = "index.json"
+
+_BLOCK_SIZE = 65536
+
+
+class LocalVectorIndex:
+    """
+    Offline IVF index over a memory-mapped float32 matrix for a single namespace.
+
+    Vectors are L2 normalised and stored grouped by their inverted list, so probing a list reads one contiguous slice
+    of the memory map. Documents are kept in a JSONL file addressed by byte offset and only the top-k hits are read.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, INDEX_INFO_FILE)) as f:
+            info = json.load(f)
+        self.dimension = info["dimension"]
+        self.count = info["count"]
+
+        self.vectors = np.memmap(
+            os.path.join(directory, VECTORS_FILE), dtype=np.float32, mode="r", shape=(self.count, self.dimension)
+        )
+        self.centroids = np.load(os.path.join(directory, CENTROIDS_FILE))
+        self.list_offsets = np.load(os.path.join(directory, LIST_OFFSETS_FILE))
+        self.document_offsets = np.load(os.path.join(directory, DOCUMENT_OFFSETS_FILE), mmap_mode="r")
+
+    def search(self, vector: list[float], k: int, nprobe: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate top-k search by cosine similarity over the `nprobe` closest inverted lists.
+
+        Returns:
+            The matched row numbers and their similarities, best first.
+        """
+        query = _normalize(np.asarray(vector, dtype=np.float32))
+        centroid_scores = self.centroids @ query
+        nprobe = min(nprobe, len(centroid_scores))
+        probed_lists = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+
+        rows = np.concatenate([
+            np.arange(self.list_offsets[i], self.list_offsets[i + 1]) for i in probed_lists
+        ])
+        if not len(rows):
+            return rows, np.empty(0, dtype=np.float32)
+        scores = np.concatenate([
+            self.vectors[self.list_offsets[i]:self.list_offsets[i + 1]] @ query for i in probed_lists
+        ])
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return rows[top], scores[top]
+
+    def documents(self, rows: Iterable[int]) -> list[Document]:
+        documents = []
+        with open(os.path.join(self.directory, DOCUMENTS_FILE), "rb") as f:
+            for row in rows:
+                f.seek(int(self.document_offsets[row]))
+                record = json.loads(f.readline())
+                documents.append(Document(id=record["id"], page_content=record["text"], metadata=record["metadata"]))
+        return documents
+
+    @classmethod
+    def build(
+        cls,
+        directory: str,
+        batches: Iterable[tuple[list[str], np.ndarray, list[str], list[dict]]],
+        dimension: int,
+        nlist: int | None = None,
+        kmeans_iterations: int = 10,
+        seed: int = 42,
+    ) -> "LocalVectorIndex":
+        """
+        Build the index from `(ids, vectors, texts, metadatas)` batches, streaming them to disk so the whole
+        collection never has to fit in memory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        unsorted_vectors_path = os.path.join(directory, f"{VECTORS_FILE}.tmp")
+        unsorted_documents_path = os.path.join(directory, f"{DOCUMENTS_FILE}.tmp")
+
+        count, unsorted_document_offsets = 0, []
+        with open(unsorted_vectors_path, "wb") as vectors_file, open(unsorted_documents_path, "wb") as documents_file:
+            for ids, vectors, texts, metadatas in batches:
+                vectors = _normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, dimension))
+                vectors_file.write(vectors.tobytes())
+                for _id, page_content, metadata in zip(ids, texts, metadatas):
+                    unsorted_document_offsets.append(documents_file.tell())
+                    documents_file.write(
+                        json.dumps({"id": _id, "text": page_content, "metadata": metadata}, default=str).encode("utf-8") + b"\n"
+                    )
+                count += len(ids)
+        if not count:
+            raise ValueError(f"No vectors to index in {directory}")
+
+        unsorted = np.memmap(unsorted_vectors_path, dtype=np.float32, mode="r", shape=(count, dimension))
+        nlist = min(nlist or max(1, int(2 * np.sqrt(count))), count)
+        centroids = _train_centroids(unsorted, nlist, kmeans_iterations, np.random.default_rng(seed))
+
+        assignments = np.concatenate([
+            np.argmax(unsorted[start:start + _BLOCK_SIZE] @ centroids.T, axis=1)
+            for start in range(0, count, _BLOCK_SIZE)
+        ])
+        order = np.argsort(assignments, kind="stable")
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))]).astype(np.int64)
+
+        # Rewrite vectors and documents grouped by inverted list
+        vectors = np.memmap(
+            os.path.join(directory, VECTORS_FILE), dtype=np.float32, mode="w+", shape=(count, dimension)
+        )
+        for start in range(0, count, _BLOCK_SIZE):
+            vectors[start:start + _BLOCK_SIZE] = unsorted[order[start:start + _BLOCK_SIZE]]
+        vectors.flush()
+        del vectors, unsorted
+
+        document_offsets = np.empty(count + 1, dtype=np.int64)
+        with open(unsorted_documents_path, "rb") as source, \
+                open(os.path.join(directory, DOCUMENTS_FILE), "wb") as target:
+            for position, row in enumerate(order):
+                source.seek(unsorted_document_offsets[row])
+                document_offsets[position] = target.tell()
+                target.write(source.readline())
+            document_offsets[count] = target.tell()
+
+        np.save(os.path.join(directory, CENTROIDS_FILE), centroids)
+        np.save(os.path.join(directory, LIST_OFFSETS_FILE), list_offsets)
+        np.save(os.path.join(directory, DOCUMENT_OFFSETS_FILE), document_offsets)
+        with open(os.path.join(directory, INDEX_INFO_FILE), "w") as f:
+            json.dump({"dimension": dimension, "count": count, "nlist": nlist, "metric": "cosine"}, f)
+
+        os.remove(unsorted_vectors_path)
+        os.remove(unsorted_documents_path)
+        logger.info(f"Built local vector index with {count} vectors and {nlist} lists in {directory}")
+        return cls(directory)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Drop-in, fully offline replacement for the Pinecone vector store, with one `LocalVectorIndex` per namespace.
+
+    Scores are cosine similarities (higher is better).
+    """
+
+    def __init__(self, directory: str, embedding: Embeddings, nprobe: int = 8):
+        self.directory = directory
+        self.nprobe = nprobe
+        self._embedding = embedding
+        self._indexes: dict[str, LocalVectorIndex] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embedding
+
+    def get_index(self, namespace: str | None) -> LocalVectorIndex:
+        namespace = namespace or "default"
+        if namespace not in self._indexes:
+            with self._lock:
+                if namespace not in self._indexes:
+                    self._indexes[namespace] = LocalVectorIndex(os.path.join(self.directory, namespace))
+        return self._indexes[namespace]
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: list[float], *, k: int = 4, filter: dict | None = None, namespace: str | None = None
+    ) -> list[tuple[Document, float]]:
+        if filter:
+            raise ValueError("Metadata filters are not supported by the local vector index")
+        index = self.get_index(namespace)
+        rows, scores = index.search(embedding, k=k, nprobe=self.nprobe)
+        return list(zip(index.documents(rows), scores.tolist()))
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: dict | None = None, namespace: str | None = None
+    ) -> list[tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_score(
+            self._embedding.embed_query(query), k=k, filter=filter, namespace=namespace
+        )
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: dict | None = None, namespace: str | None = None, **kwargs
+    ) -> list[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter, namespace=namespace)]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: list[str],
+        embedding: Embeddings,
+        metadatas: list[dict] | None = None,
+        *,
+        ids: list[str] | None = None,
+        directory: str | None = None,
+        namespace: str | None = None,
+        nprobe: int = 8,
+        **kwargs,
+    ) -> "LocalVectorStore":
+        """
+        Embed `texts` into a new index of `namespace`, under `directory` or a temporary directory when missing.
+        The ingested namespaces are built with `build_local_index` instead.
+        """
+        directory = directory or tempfile.mkdtemp(prefix="local_vector_index_")
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = np.asarray(embedding.embed_documents(list(texts)), dtype=np.float32)
+
+        LocalVectorIndex.build(
+            os.path.join(directory, namespace or "default"), [(ids, vectors, list(texts), metadatas)],
+            dimension=vectors.shape[1], **kwargs
+        )
+        return cls(directory, embedding, nprobe=nprobe)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _train_centroids(vectors: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Spherical k-means on a sample of the vectors
+    """
+    sample_size = min(len(vectors), nlist * 32)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))])
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        order = np.argsort(assignments, kind="stable")
+        clusters, starts = np.unique(assignments[order], return_index=True)
+        centroids[clusters] = _normalize(np.add.reduceat(sample[order], starts, axis=0))
+
+        empty = np.setdiff1d(np.arange(nlist), clusters)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+    return centroids
+
+
+def _fetch_ingested_documents(namespace: str, batch_size: int) -> Iterator[list[Document]]:
+    """
+    Yield the documents the ingestion pipeline indexed in `namespace`, with the text they were embedded from: the
+    chunks of the posts indexed in chunked mode and the whole posts indexed in post mode
+    """
+    queries = [
+        (
+            f"SELECT {CHUNK_COLUMNS} FROM reddit_post_chunks c JOIN reddit_posts p ON p.id = c.post_id "
+            "WHERE c.namespace = :namespace AND c.id > :after ORDER BY c.id LIMIT :limit",
+            chunk_document,
+        ),
+        (
+            f"SELECT {POST_COLUMNS} FROM reddit_posts WHERE namespace = :namespace AND id > :after "
+            "AND NOT EXISTS (SELECT 1 FROM reddit_post_chunks c WHERE c.post_id = reddit_posts.id) "
+            "ORDER BY id LIMIT :limit",
+            post_document,
+        ),
+    ]
+    for query, to_document in queries:
+        after = ""
+        while True:
+            with db_session() as session:
+                rows = session.execute(
+                    text(query), {"namespace": namespace, "after": after, "limit": batch_size}
+                ).mappings().all()
+            if not rows:
+                break
+            yield [to_document(row) for row in rows]
+            after = rows[-1]["id"]
+
+
+def _embedding_cache_key(page_content: str) -> str:
+    """Key of a document vector in the ingestion pipeline's `EmbeddingCache` (dags/embedding_cache.py)"""
+    return f"{settings.OPENAI_EMBEDDINGS_MODEL}:default:{hashlib.sha256(page_content.encode('utf-8')).hexdigest()}"
+
+
+def _fetch_ingested_vectors(
+    namespace: str, batch_size: int, embeddings: Embeddings | None = None
+) -> Iterator[tuple[list[str], np.ndarray, list[str], list[dict]]]:
+    """
+    Yield the documents of `namespace` with the vectors the ingestion pipeline cached for them. Documents missing from
+    the cache are embedded with `embeddings`, or left out when it is None so the build needs no API.
+    """
+    cache = None
+    if os.path.exists(settings.EMBEDDING_CACHE_PATH):
+        cache = sqlite3.connect(f"file:{settings.EMBEDDING_CACHE_PATH}?mode=ro", uri=True)
+    try:
+        for documents in _fetch_ingested_documents(namespace, batch_size):
+            texts = [document.page_content for document in documents]
+            keys = [_embedding_cache_key(page_content) for page_content in texts]
+            cached = {}
+            if cache is not None:
+                cached = dict(cache.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(keys))})", keys
+                ).fetchall())
+
+            vectors = {i: np.frombuffer(cached[key], dtype=np.float32) for i, key in enumerate(keys) if key in cached}
+            if missing := [i for i in range(len(documents)) if i not in vectors]:
+                if embeddings is None:
+                    logger.warning(f"Leaving out {len(missing)} documents of {namespace} without a cached embedding")
+                else:
+                    embedded = embeddings.embed_documents([texts[i] for i in missing])
+                    vectors.update(zip(missing, np.asarray(embedded, dtype=np.float32)))
+
+            if kept := sorted(vectors):
+                yield (
+                    [documents[i].id for i in kept],
+                    np.stack([vectors[i] for i in kept]),
+                    [texts[i] for i in kept],
+                    [documents[i].metadata for i in kept],
+                )
+    finally:
+        if cache is not None:
+            cache.close()
+
+
+def _fetch_pinecone_vectors(namespace: str, batch_size: int) -> Iterator[tuple[list[str], np.ndarray, list[str], list[dict]]]:
+    """
+    Yield the vectors upserted to `namespace` of the Pinecone index.
+
+    Vectors indexed with slim metadata carry no text, it is read from the database while building so the local index
+    can be searched without it.
+    """
+    from pinecone import Pinecone
+
+    pinecone_index = Pinecone(api_key=settings.PINECONE_API_KEY).Index(settings.PINECONE_INDEX_NAME)
+    for vector_ids in pinecone_index.list(namespace=namespace, limit=batch_size):
+        fetched = pinecone_index.fetch(ids=vector_ids, namespace=namespace).vectors
+        ids = [_id for _id in vector_ids if _id in fetched]
+        metadatas = [dict(fetched[_id].metadata or {}) for _id in ids]
+        texts = [metadata.pop("text", "") for metadata in metadatas]
+        if missing_ids := [_id for _id, text in zip(ids, texts) if not text]:
+            stored_docs = fetch_documents(missing_ids)
+            for i, _id in enumerate(ids):
+                if not texts[i] and _id in stored_docs:
+                    texts[i] = stored_docs[_id].page_content
+                    metadatas[i] = {**stored_docs[_id].metadata, **metadatas[i]}
+        yield ids, np.array([fetched[_id].values for _id in ids], dtype=np.float32), texts, metadatas
+
+
+def build_local_index(
+    namespace: str,
+    directory: str,
+    dimension: int = 1536,
+    nlist: int | None = None,
+    batch_size: int = 100,
+    source: str = "ingestion",
+    embeddings: Embeddings | None = None,
+) -> LocalVectorIndex:
+    """
+    Build the index of `namespace` from the ingestion output: the posts and chunks of `reddit_posts` with their
+    vectors from the ingestion embedding cache. The "pinecone" source copies the remote index instead.
+
+    Args:
+        embeddings: Embeds the ingestion documents missing from the embedding cache, which are left out when None
+    """
+    if source == "ingestion":
+        batches = _fetch_ingested_vectors(namespace, batch_size, embeddings)
+    elif source == "pinecone":
+        batches = _fetch_pinecone_vectors(namespace, batch_size)
+    else:
+        raise ValueError(f"Unknown local index source {source}, expected 'ingestion' or 'pinecone'")
+    return LocalVectorIndex.build(os.path.join(directory, namespace), batches, dimension, nlist=nlist)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local vector index for a namespace")
+    parser.add_argument("namespace")
+    parser.add_argument("--directory", default=settings.LOCAL_VECTOR_INDEX_PATH)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--source", choices=["ingestion", "pinecone"], default="ingestion")
+    parser.add_argument("--embed-missing", action="store_true",
+                        help="Embed the documents missing from the embedding cache with the OpenAI API")
+    args = parser.parse_args()
+
+    missing_embeddings = None
+    if args.embed_missing:
+        from langchain_openai import OpenAIEmbeddings
+
+        missing_embeddings = OpenAIEmbeddings(model=settings.OPENAI_EMBEDDINGS_MODEL, api_key=settings.OPENAI_API_KEY)
+    build_local_index(
+        args.namespace, args.directory, nlist=args.nlist, source=args.source, embeddings=missing_embeddings
+    )
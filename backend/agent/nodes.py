@@ -1,5 +1,7 @@
+import asyncio
 import json
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from langchain_community.tools import TavilySearchResults
 from langchain_core.language_models import BaseChatModel
@@ -8,7 +10,9 @@ from langgraph.errors import create_error_message
 from backend.agent.generate_chain import create_recommendation_chain
 from backend.agent.graph import Steps, GraphState
 from backend.agent.vector_store import Retriever
-from backend.database.messages import create_message, MessageSenderEnum
+from backend.config import settings
+from backend.database.messages import create_message, acreate_message, MessageSenderEnum
+from backend.categories import get_category_namespace
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +25,7 @@ class GraphNodes:
         self.web_search_tool = web_search_tool
 
         self.generate_chain = create_recommendation_chain(llm)
+        self._web_search_executor = ThreadPoolExecutor(thread_name_prefix="speculative-web-search")
 
     def vector_store_retrieve(self, state):
         """
@@ -34,10 +39,47 @@ class GraphNodes:
         """
         print("---RETRIEVE---")
         prompt = state["prompt"]
-        namespace = state["category"]
+        namespace = get_category_namespace(state["category"])
+
+        # Start the web search right away, so its latency overlaps retrieval and grading instead of following them
+        if settings.SPECULATIVE_WEB_SEARCH:
+            state["speculative_web_search"] = self._web_search_executor.submit(self.web_search_tool.invoke, {"query": prompt})
+
+        # Embed the prompt once, later stages of the request reuse the vector from the state
+        query_embedding = state.get("query_embedding") or self.retriever.embed_query(prompt)
+        state["query_embedding"] = query_embedding
 
         # Retrieval
-        documents = self.retriever.sim_search(prompt, namespace)
+        documents = self.retriever.sim_search(prompt, namespace, embedding=query_embedding)
+        state["resources"] = documents
+        state["steps"] = [Steps.VECTOR_STORE_RETRIEVAL.value]
+
+        return state
+
+    async def avector_store_retrieve(self, state):
+        """
+        Retrieve documents without blocking the event loop
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): New key added to state, documents, that contains retrieved documents
+        """
+        print("---RETRIEVE---")
+        prompt = state["prompt"]
+        namespace = get_category_namespace(state["category"])
+
+        # Start the web search right away, so its latency overlaps retrieval and grading instead of following them
+        if settings.SPECULATIVE_WEB_SEARCH:
+            state["speculative_web_search"] = asyncio.create_task(self.web_search_tool.ainvoke({"query": prompt}))
+
+        # Embed the prompt once, later stages of the request reuse the vector from the state
+        query_embedding = state.get("query_embedding") or await self.retriever.aembed_query(prompt)
+        state["query_embedding"] = query_embedding
+
+        # Retrieval
+        documents = await self.retriever.asim_search(prompt, namespace, embedding=query_embedding)
         state["resources"] = documents
         state["steps"] = [Steps.VECTOR_STORE_RETRIEVAL.value]
 
@@ -55,17 +97,12 @@ class GraphNodes:
         """
         print("---GENERATE---")
         prompt = state["prompt"]
-        # TODO: Handle Tavily web results by converting to Document
-        resources = [r.page_content if hasattr(r, "page_content") else r for r in state["resources"]]
+        resources = self._resource_contents(state)
 
         # RAG generation
-        generation = self.generate_chain.invoke({"resources": '\n'.join(f"{index + 1}. {item}" for index, item in enumerate(resources)), "prompt": prompt})
-
-
-        tools_used = ["vector_search"]
-        if state.get("perform_web_search", False):
-            tools_used.append("web_search")
+        generation = self.generate_chain.invoke(self._generation_input(prompt, resources))
 
+        tools_used = self._tools_used(state)
         create_message(content=prompt, chat_session_id=state["chat_session_id"], references=[], sender=MessageSenderEnum.USER,
                        tools_used=tools_used)
         create_message(content=json.dumps(generation.model_dump(mode="json")), chat_session_id=state["chat_session_id"], references=[r for r in resources],
@@ -75,17 +112,78 @@ class GraphNodes:
         state["steps"].append(Steps.LLM_GENERATION.value)
         return state
 
+    async def agenerate(self, state):
+        """
+        Generate answer without blocking the event loop
+
+        Args:
+            state (dict): The current graph state
+
+        Returns:
+            state (dict): New key added to state, generation, that contains LLM generation
+        """
+        print("---GENERATE---")
+        prompt = state["prompt"]
+        resources = self._resource_contents(state)
+
+        # RAG generation
+        generation = await self.generate_chain.ainvoke(self._generation_input(prompt, resources))
+
+        tools_used = self._tools_used(state)
+        await acreate_message(content=prompt, chat_session_id=state["chat_session_id"], references=[],
+                              sender=MessageSenderEnum.USER, tools_used=tools_used)
+        await acreate_message(content=json.dumps(generation.model_dump(mode="json")), chat_session_id=state["chat_session_id"],
+                              references=[r for r in resources], sender=MessageSenderEnum.SYSTEM, tools_used=tools_used)
+
+        state["generation"] = generation
+        state["steps"].append(Steps.LLM_GENERATION.value)
+        return state
+
+    @staticmethod
+    def _resource_contents(state) -> list[str]:
+        # TODO: Handle Tavily web results by converting to Document
+        return [r.page_content if hasattr(r, "page_content") else r for r in state["resources"]]
+
+    @staticmethod
+    def _generation_input(prompt: str, resources: list[str]) -> dict:
+        return {"resources": '\n'.join(f"{index + 1}. {item}" for index, item in enumerate(resources)), "prompt": prompt}
+
+    @staticmethod
+    def _tools_used(state) -> list[str]:
+        tools_used = ["vector_search"]
+        if state.get("perform_web_search", False):
+            tools_used.append("web_search")
+        return tools_used
+
     def _base_grade_documents(self, state: GraphState, previous_state: str):
         prompt = state["prompt"]
         resources = state["resources"]
 
+        # Grade all the documents concurrently, so the stage costs about one LLM round trip instead of one per document
+        scores = self.retrieval_grader.batch(
+            [{"prompt": prompt, "resources": resource} for resource in resources],
+            config={"max_concurrency": settings.RETRIEVAL_GRADER_MAX_CONCURRENCY},
+        )
+        return self._apply_document_grades(state, previous_state, scores)
+
+    async def _abase_grade_documents(self, state: GraphState, previous_state: str):
+        prompt = state["prompt"]
+        resources = state["resources"]
+
+        scores = await self.retrieval_grader.abatch(
+            [{"prompt": prompt, "resources": resource} for resource in resources],
+            config={"max_concurrency": settings.RETRIEVAL_GRADER_MAX_CONCURRENCY},
+        )
+        return self._apply_document_grades(state, previous_state, scores)
+
+    @staticmethod
+    def _apply_document_grades(state: GraphState, previous_state: str, scores: list[dict]):
+        resources = state["resources"]
+
         filtered_resources = []
         next_search = False
 
-        for resource in resources:
-            score = self.retrieval_grader.invoke({
-                "prompt": prompt, "resources": resource
-            })
+        for resource, score in zip(resources, scores):
             # print(f"{resource} || {score}")
             if score["score"].lower() == "yes":
                 filtered_resources.append(resource)
@@ -100,17 +198,55 @@ class GraphNodes:
                     state["steps"].append(Steps.VECTOR_STORE_EVALUATION.value)
         state["resources"] = filtered_resources
 
+        # Mirrors `GraphEdges.vector_search_decide_to_generate`, the web search result won't be used
+        if filtered_resources:
+            GraphNodes._discard_speculative_web_search(state)
+
         return state
 
+    @staticmethod
+    def _discard_speculative_web_search(state: GraphState):
+        if (search := state.get("speculative_web_search")) is None:
+            return
+        state["speculative_web_search"] = None
+        if not search.cancel() and search.done() and not search.cancelled():
+            # Already finished, retrieve the outcome so a failed search is not reported as unhandled
+            search.exception()
+
     def grade_vector_store_documents(self, state: GraphState):
         print("---GRADE VECTOR STORE DOCUMENTS---")
         return self._base_grade_documents(state, "vector_store")
 
+    async def agrade_vector_store_documents(self, state: GraphState):
+        print("---GRADE VECTOR STORE DOCUMENTS---")
+        return await self._abase_grade_documents(state, "vector_store")
+
     def web_search(self, state: GraphState):
         print("---WEB SEARCH - TAVILY---")
 
         prompt = state["prompt"]
-        web_results = self.web_search_tool.invoke({"query": prompt})
+        if search := state.get("speculative_web_search"):
+            web_results = search.result()
+            state["speculative_web_search"] = None
+        else:
+            web_results = self.web_search_tool.invoke({"query": prompt})
+        state["resources"] = [
+           result["content"] for result in web_results
+        ]
+        state["steps"].append(Steps.WEB_SEARCH_RETRIEVAL.value)
+
+        print(state["resources"])
+        return state
+
+    async def aweb_search(self, state: GraphState):
+        print("---WEB SEARCH - TAVILY---")
+
+        prompt = state["prompt"]
+        if search := state.get("speculative_web_search"):
+            web_results = await search
+            state["speculative_web_search"] = None
+        else:
+            web_results = await self.web_search_tool.ainvoke({"query": prompt})
         state["resources"] = [
            result["content"] for result in web_results
         ]
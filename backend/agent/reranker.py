@@ -0,0 +1,96 @@
+import json
+from datetime import datetime
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+class Reranker:
+    """
+    Orders retrieval candidates by a weighted sum of normalised signals, computed as vector operations over the whole
+    candidate set:
+        relevance: the retrieval score, min-max scaled over the candidates
+        score: the log-scaled Reddit score, relative to the best scored candidate
+        recency: exponential decay on the age of the post, halving every `recency_half_life_days`
+        comments: the log-scaled number of comments, relative to the most discussed candidate
+    """
+
+    def __init__(
+        self,
+        relevance_weight: float = 0.6,
+        score_weight: float = 0.2,
+        recency_weight: float = 0.1,
+        comments_weight: float = 0.1,
+        recency_half_life_days: float = 180,
+    ):
+        self.weights = np.array([relevance_weight, score_weight, recency_weight, comments_weight], dtype=np.float32)
+        self.recency_half_life_days = recency_half_life_days
+
+    def rerank(self, docs: list[Document], relevance: list[float], k: int) -> list[Document]:
+        """
+        Args:
+            docs: The retrieval candidates
+            relevance: Retrieval score of every candidate, higher is more relevant
+            k: Number of documents to return
+
+        Returns:
+            The `k` best candidates, best first
+        """
+        if not docs:
+            return []
+        signals = np.stack([
+            _min_max_scale(np.asarray(relevance, dtype=np.float32)),
+            _max_scale(np.log1p(np.maximum([_reddit_score(doc) for doc in docs], 0))),
+            self._recency([_created(doc) for doc in docs]),
+            _max_scale(np.log1p([_comment_count(doc) for doc in docs])),
+        ])
+        scores = self.weights @ signals
+
+        k = min(k, len(docs))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [docs[i] for i in top]
+
+    def _recency(self, created: list[float]) -> np.ndarray:
+        age_days = (datetime.now().timestamp() - np.asarray(created, dtype=np.float64)) / 86400
+        recency = np.exp2(-np.maximum(age_days, 0) / self.recency_half_life_days)
+        return np.nan_to_num(recency, nan=0.0).astype(np.float32)
+
+
+def _min_max_scale(values: np.ndarray) -> np.ndarray:
+    spread = values.max() - values.min()
+    if spread == 0:
+        return np.ones_like(values)
+    return (values - values.min()) / spread
+
+
+def _max_scale(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float32)
+    peak = values.max()
+    return values / peak if peak > 0 else np.zeros_like(values)
+
+
+def _reddit_score(doc: Document) -> float:
+    try:
+        return float(doc.metadata.get("score") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _created(doc: Document) -> float:
+    try:
+        return datetime.fromisoformat(str(doc.metadata["created"])).timestamp()
+    except (KeyError, ValueError):
+        return np.nan
+
+
+def _comment_count(doc: Document) -> int:
+    if "num_comments" in doc.metadata:
+        return int(doc.metadata["num_comments"])
+    comments = doc.metadata.get("comments") or []
+    if isinstance(comments, str):
+        try:
+            comments = json.loads(comments)
+        except ValueError:
+            return 0
+    return len(comments)
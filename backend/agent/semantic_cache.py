@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+from backend.config import settings
+from backend.schemas.chain import SearchResult
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    category: str
+    result: SearchResult
+    tools_used: list[str]
+    expires_at: float
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on the query embedding within a category namespace.
+
+    A lookup returns the answer of the most similar cached query when their cosine similarity clears the threshold.
+    Entries expire after `ttl_seconds` and the least recently used entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, similarity_threshold: float, ttl_seconds: int, max_entries: int):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._next_entry_id = 0
+        # Entry ids in least -> most recently used order
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        # Per category: unit-norm key matrix, with the entry id and expiry of every row
+        self._keys: dict[str, np.ndarray] = {}
+        self._key_entry_ids: dict[str, np.ndarray] = {}
+        self._key_expiry: dict[str, np.ndarray] = {}
+
+    def lookup(self, category: str, embedding: list[float]) -> CachedAnswer | None:
+        query = self._normalize(embedding)
+        with self._lock:
+            keys = self._keys.get(category)
+            if keys is None or not len(keys):
+                self.misses += 1
+                return None
+
+            similarities = keys @ query
+            similarities[self._key_expiry[category] <= time.time()] = -np.inf
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            entry_id = int(self._key_entry_ids[category][best])
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            logger.info(f"Semantic cache hit in `{category}` with similarity {similarities[best]:.4f}")
+            return self._entries[entry_id]
+
+    def store(self, category: str, embedding: list[float], result: SearchResult, tools_used: list[str]) -> None:
+        key = self._normalize(embedding)
+        with self._lock:
+            self._remove_expired(category)
+
+            entry_id = self._next_entry_id
+            self._next_entry_id += 1
+            expires_at = time.time() + self.ttl_seconds
+            self._entries[entry_id] = CachedAnswer(
+                category=category, result=result, tools_used=tools_used, expires_at=expires_at
+            )
+
+            if category in self._keys:
+                self._keys[category] = np.vstack([self._keys[category], key])
+                self._key_entry_ids[category] = np.append(self._key_entry_ids[category], entry_id)
+                self._key_expiry[category] = np.append(self._key_expiry[category], expires_at)
+            else:
+                self._keys[category] = key[np.newaxis, :]
+                self._key_entry_ids[category] = np.array([entry_id])
+                self._key_expiry[category] = np.array([expires_at])
+
+            while len(self._entries) > self.max_entries:
+                evicted_id, evicted = self._entries.popitem(last=False)
+                self._remove_rows(evicted.category, self._key_entry_ids[evicted.category] == evicted_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "size": len(self._entries),
+        }
+
+    def _remove_expired(self, category: str) -> None:
+        if category not in self._keys:
+            return
+        expired = self._key_expiry[category] <= time.time()
+        for entry_id in self._key_entry_ids[category][expired]:
+            self._entries.pop(int(entry_id), None)
+        self._remove_rows(category, expired)
+
+    def _remove_rows(self, category: str, mask: np.ndarray) -> None:
+        if not mask.any():
+            return
+        keep = ~mask
+        self._keys[category] = self._keys[category][keep]
+        self._key_entry_ids[category] = self._key_entry_ids[category][keep]
+        self._key_expiry[category] = self._key_expiry[category][keep]
+
+    @staticmethod
+    def _normalize(embedding: list[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+@lru_cache
+def get_semantic_cache() -> SemanticCache:
+    return SemanticCache(
+        similarity_threshold=settings.SEMANTIC_CACHE_SIMILARITY_THRESHOLD,
+        ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES,
+    )
@@ -0,0 +1,104 @@
+import json
+
+from pydantic import ValidationError
+
+from backend.schemas.chain import ExtractedProduct, SearchResult
+
+
+def sse_event(event: str, data: dict) -> str:
+    """
+    Format a Server-Sent Event
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class ProductStreamParser:
+    """
+    Incrementally parses the `SearchResult` JSON streamed by the recommendation chain and releases every
+    `ExtractedProduct` as soon as it is complete.
+
+    Every token is scanned once, tracking strings and nesting, so the cost stays linear in the generation length.
+    A product is complete once the `products` array goes on to the next element or is closed, whatever the order of
+    the top-level keys.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._released = 0
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string = None
+        self._key = None
+        self._element_start = None
+        self._done = False
+
+    def feed(self, token: str) -> list[ExtractedProduct]:
+        self._buffer += token
+        released = []
+        while self._position < len(self._buffer) and not self._done:
+            product = self._scan(self._buffer[self._position])
+            self._position += 1
+            if product is not None:
+                released.append(product)
+        return released
+
+    def finish(self, result: SearchResult) -> list[ExtractedProduct]:
+        """
+        Release the products not streamed yet, taken from the final parsed generation
+        """
+        remaining = result.products[self._released:]
+        self._released = len(result.products)
+        self._done = True
+        return remaining
+
+    def _scan(self, char: str) -> ExtractedProduct | None:
+        """
+        Advance over one character of the generation, returning the product it completes
+        """
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+                self._last_string = self._buffer[self._string_start + 1:self._position]
+            return None
+
+        in_products = self._element_start is not None and self._depth == 2
+        if char == '"' and self._depth > 0:
+            self._in_string, self._string_start = True, self._position
+        elif char == ":" and self._depth == 1:
+            self._key = self._last_string
+        elif char in "{[":
+            # The chain wraps its output in ```json tags, only the object itself is scanned
+            self._depth += 1
+            if char == "[" and self._depth == 2 and self._key == "products":
+                self._element_start = self._position + 1
+        elif char in "}]" and self._depth > 0:
+            self._depth -= 1
+            if in_products and char == "]":
+                self._done = True
+                return self._release(self._buffer[self._element_start:self._position])
+            # Anything after the closed object, the closing tag included, is ignored
+            self._done = self._depth == 0
+        elif char == "," and in_products:
+            element = self._buffer[self._element_start:self._position]
+            self._element_start = self._position + 1
+            return self._release(element)
+        return None
+
+    def _release(self, element: str) -> ExtractedProduct | None:
+        if not element.strip():
+            return None
+        try:
+            product = ExtractedProduct.model_validate(json.loads(element))
+        except (json.JSONDecodeError, ValidationError):
+            # The products after an invalid one are left to `finish`, which takes them from the parsed result
+            self._done = True
+            return None
+        self._released += 1
+        return product
@@ -1,33 +1,237 @@
+import asyncio
+import logging
+from functools import lru_cache
+
 from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
 from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
-from pinecone import Pinecone
+from pinecone import Pinecone, Index
 
+from backend.agent.document_store import DocumentStore
+from backend.agent.embeddings import CachedQueryEmbeddings
+from backend.agent.keyword_index import KeywordIndexStore
+from backend.agent.local_index import LocalVectorStore
+from backend.agent.reranker import Reranker
 from backend.config import settings
 
+logger = logging.getLogger(__name__)
+
+RRF_K = 60
+
+
+@lru_cache
+def get_embeddings() -> CachedQueryEmbeddings:
+    """
+    Query embedding model shared by the vector store and the semantic cache, repeated prompts are served from memory
+    :return:
+    """
+    return CachedQueryEmbeddings(
+        OpenAIEmbeddings(model=settings.OPENAI_EMBEDDINGS_MODEL, api_key=settings.OPENAI_API_KEY),
+        model=settings.OPENAI_EMBEDDINGS_MODEL,
+        max_entries=settings.QUERY_EMBEDDING_CACHE_MAX_ENTRIES,
+    )
+
+
+@lru_cache
+def get_pinecone_index() -> Index:
+    """
+    Pinecone index client, shared so its connection pool is opened once per process
+    :return:
+    """
+    pinecone_client = Pinecone(api_key=settings.PINECONE_API_KEY)
+    return pinecone_client.Index(settings.PINECONE_INDEX_NAME)
+
+
+class SlimPineconeVectorStore(PineconeVectorStore):
+    """
+    Pinecone vector store that also returns vectors indexed without their text, as documents with empty content.
+
+    The ingestion pipeline only stores ids and small fields in the metadata, the content is hydrated by `Retriever`.
+    """
+
+    def similarity_search_by_vector_with_score(
+        self, embedding: list[float], *, k: int = 4, filter: dict | None = None, namespace: str | None = None
+    ) -> list[tuple[Document, float]]:
+        if namespace is None:
+            namespace = self._namespace
+        results = self._index.query(
+            vector=embedding, top_k=k, include_metadata=True, namespace=namespace, filter=filter
+        )
+        docs = []
+        for match in results["matches"]:
+            metadata = dict(match["metadata"] or {})
+            page_content = metadata.pop(self._text_key, "")
+            docs.append((Document(id=match["id"], page_content=page_content, metadata=metadata), match["score"]))
+        return docs
+
 
 def get_pinecone_vector_store():
     """
     Create pinecone vector store using langchain tooling
     :return:
     """
-    embeddings = OpenAIEmbeddings(model=settings.OPENAI_EMBEDDINGS_MODEL, api_key=settings.OPENAI_API_KEY)
-    pinecone_client = Pinecone(api_key=settings.PINECONE_API_KEY)
-    pinecone_index = pinecone_client.Index(settings.PINECONE_INDEX_NAME)
-    vector_store = PineconeVectorStore(index=pinecone_index, embedding=embeddings)
+    embeddings = get_embeddings()
+    vector_store = SlimPineconeVectorStore(index=get_pinecone_index(), embedding=embeddings)
 
     return vector_store
 
 
+def get_local_vector_store():
+    """
+    Create the offline vector store over the memory-mapped namespace indexes built by `backend.agent.local_index`
+    :return:
+    """
+    return LocalVectorStore(
+        directory=settings.LOCAL_VECTOR_INDEX_PATH, embedding=get_embeddings(), nprobe=settings.LOCAL_VECTOR_INDEX_NPROBE
+    )
+
+
+def get_reranker() -> Reranker:
+    return Reranker(
+        relevance_weight=settings.RERANK_RELEVANCE_WEIGHT,
+        score_weight=settings.RERANK_SCORE_WEIGHT,
+        recency_weight=settings.RERANK_RECENCY_WEIGHT,
+        comments_weight=settings.RERANK_COMMENTS_WEIGHT,
+        recency_half_life_days=settings.RERANK_RECENCY_HALF_LIFE_DAYS,
+    )
+
+
+def vector_scores_are_distances() -> bool:
+    """
+    Pinecone returns the raw index metric, a distance for euclidean indexes, the local index returns cosine similarities
+    """
+    return settings.VECTOR_STORE_BACKEND != "local" and settings.PINECONE_INDEX_METRIC == "euclidean"
+
+
+@lru_cache
+def get_vector_store() -> VectorStore:
+    if settings.VECTOR_STORE_BACKEND == "local":
+        return get_local_vector_store()
+    return get_pinecone_vector_store()
+
 
 class Retriever:
-    def __init__(self, vector_store: PineconeVectorStore):
+    def __init__(
+        self,
+        vector_store: VectorStore,
+        keyword_index: KeywordIndexStore | None = None,
+        reranker: Reranker | None = None,
+        scores_are_distances: bool = False,
+        candidates: int = 50,
+        top_k: int = 6,
+        document_store: DocumentStore | None = None,
+    ):
         self.vector_store = vector_store
+        self.keyword_index = keyword_index
+        self.document_store = document_store
+        self.reranker = reranker or Reranker()
+        self.scores_are_distances = scores_are_distances
+        self.candidates = candidates
+        self.top_k = top_k
 
-    def sim_search(self, prompt: str, namespace: str | None):
-        top_matched_docs = self.vector_store.similarity_search(prompt, k=6, namespace=namespace if namespace else "")
-        return self._rerank_docs(top_matched_docs)
+    def embed_query(self, prompt: str) -> list[float]:
+        return self.vector_store.embeddings.embed_query(prompt)
+
+    async def aembed_query(self, prompt: str) -> list[float]:
+        return await self.vector_store.embeddings.aembed_query(prompt)
+
+    def sim_search(self, prompt: str, namespace: str | None, embedding: list[float] | None = None):
+        if embedding is None:
+            embedding = self.embed_query(prompt)
+        top_matched_docs = self.vector_store.similarity_search_by_vector_with_score(
+            embedding, k=self.candidates, namespace=namespace if namespace else ""
+        )
+        keyword_matched_docs = self._keyword_search(prompt, namespace)
+        return self._hydrate_docs(self._rerank_docs(top_matched_docs, keyword_matched_docs))
+
+    async def asim_search(self, prompt: str, namespace: str | None, embedding: list[float] | None = None):
+        # The embedding uses the native async OpenAI client, the Pinecone client has no async query so it runs on a thread
+        if embedding is None:
+            embedding = await self.aembed_query(prompt)
+        top_matched_docs, keyword_matched_docs = await asyncio.gather(
+            asyncio.to_thread(
+                self.vector_store.similarity_search_by_vector_with_score,
+                embedding, k=self.candidates, namespace=namespace if namespace else ""
+            ),
+            asyncio.to_thread(self._keyword_search, prompt, namespace),
+        )
+        return await asyncio.to_thread(self._hydrate_docs, self._rerank_docs(top_matched_docs, keyword_matched_docs))
+
+    def _keyword_search(self, prompt: str, namespace: str | None) -> list[tuple[Document, float]]:
+        if self.keyword_index is None or not namespace:
+            return []
+        try:
+            return self.keyword_index.search(prompt, namespace, k=self.candidates)
+        except Exception as e:
+            # Keyword matches only add to the vector results, the search goes on without them
+            logger.warning(f"Keyword search failed for {namespace}: {e}")
+            return []
+
+    def _rerank_docs(
+        self, vector_matched_docs: list[tuple[Document, float]], keyword_matched_docs: list[tuple[Document, float]]
+    ) -> list[Document]:
+        if keyword_matched_docs:
+            candidates = self._fuse_ranked_docs([vector_matched_docs, keyword_matched_docs])
+        elif self.scores_are_distances:
+            candidates = [(doc, -score) for doc, score in vector_matched_docs]
+        else:
+            candidates = vector_matched_docs
+        # Every candidate is ranked, the ranking is cut to `top_k` once the content is hydrated
+        return self.reranker.rerank(
+            [doc for doc, _ in candidates], [relevance for _, relevance in candidates], k=len(candidates)
+        )
+
+    def _hydrate_docs(self, ranked_docs: list[Document]) -> list[Document]:
+        """
+        Keep the `top_k` best ranked documents, filling in the content of the ones indexed with slim metadata.
+
+        Only the documents that can be kept are looked up. A document without stored content is dropped and the next
+        candidate takes its place. When the lookup fails, the documents that already carry their content are kept.
+        """
+        hydrated_docs, position, lookup_failed = [], 0, False
+        while len(hydrated_docs) < self.top_k and position < len(ranked_docs):
+            window = ranked_docs[position:position + self.top_k - len(hydrated_docs)]
+            position += len(window)
+
+            stored_docs = {}
+            missing_ids = [doc.id or doc.metadata.get("id") for doc in window if not doc.page_content]
+            if missing_ids and self.document_store and not lookup_failed:
+                try:
+                    stored_docs = self.document_store.get_many(missing_ids)
+                except Exception as e:
+                    logger.warning(f"Document lookup failed, keeping the documents with content: {e}")
+                    lookup_failed = True
+
+            for doc in window:
+                if doc.page_content:
+                    hydrated_docs.append(doc)
+                elif stored_doc := stored_docs.get(doc.id or doc.metadata.get("id")):
+                    hydrated_docs.append(Document(
+                        id=stored_doc.id, page_content=stored_doc.page_content,
+                        metadata={**stored_doc.metadata, **doc.metadata}
+                    ))
+                elif not lookup_failed:
+                    logger.warning(f"No stored content for retrieved document {doc.id}")
+        return hydrated_docs
 
     @staticmethod
-    def _rerank_docs(docs: list[Document]):
-        return sorted(docs, key=lambda d: d.metadata["score"], reverse=True)
\ No newline at end of file
+    def _fuse_ranked_docs(rankings: list[list[tuple[Document, float]]]) -> list[tuple[Document, float]]:
+        """
+        Reciprocal rank fusion, posts ranked well by several searches get the highest fused score.
+
+        Results are fused per post: a chunk vector and the whole post found by the keyword search count as the same
+        post, which is represented by the first document found for it, the best ranked chunk of the first search.
+        """
+        fused_scores, docs = {}, {}
+        for ranking in rankings:
+            ranked_post_ids = set()
+            for rank, (doc, _) in enumerate(ranking):
+                post_id = doc.metadata.get("post_id") or doc.id or doc.metadata.get("id")
+                # Only the best ranked chunk of a post counts in each search
+                if post_id in ranked_post_ids:
+                    continue
+                ranked_post_ids.add(post_id)
+                fused_scores[post_id] = fused_scores.get(post_id, 0.0) + 1 / (RRF_K + rank + 1)
+                docs.setdefault(post_id, doc)
+        return sorted(((docs[post_id], score) for post_id, score in fused_scores.items()), key=lambda d: d[1], reverse=True)
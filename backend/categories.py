@@ -0,0 +1,23 @@
+import json
+from functools import lru_cache
+
+from backend.config import settings
+
+
+@lru_cache
+def get_category_registry() -> dict[str, dict]:
+    """
+    Product categories of the registry shared with the ingestion DAG, keyed by name, each with its namespace
+    """
+    with open(settings.CATEGORY_REGISTRY_PATH) as f:
+        registry = json.load(f)
+    return {
+        category["name"]: {**category, "namespace": category.get("namespace", category["name"])}
+        for category in registry["categories"]
+    }
+
+
+def get_category_namespace(category: str) -> str:
+    """Pinecone namespace the posts of `category` are ingested into"""
+    registry = get_category_registry()
+    return registry[category]["namespace"] if category in registry else category
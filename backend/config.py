@@ -25,19 +25,61 @@ class Settings(BaseSettings, extra="ignore"):
     POSTGRES_PORT: int = 6543
     POSTGRES_DB: str
     POSTGRES_URI: str | None = None
+    POSTGRES_POOL_SIZE: int = 10
+    POSTGRES_MAX_OVERFLOW: int = 20
+
+    # Product categories, the subreddits and Pinecone namespace of each, shared with the ingestion DAG
+    CATEGORY_REGISTRY_PATH: str = "config/categories.json"
 
     # Pinecone
     PINECONE_API_KEY: str
     PINECONE_ENVIRONMENT: str
     PINECONE_INDEX_NAME: str = "damg7245-a4"
+    PINECONE_INDEX_METRIC: str = "euclidean"
+
+    # Vector store backend, "pinecone" or the offline "local" index
+    VECTOR_STORE_BACKEND: str = "pinecone"
+    LOCAL_VECTOR_INDEX_PATH: str = "resources/vector_index"
+    LOCAL_VECTOR_INDEX_NPROBE: int = 8
+    # SQLite embedding cache of the ingestion pipeline, the local index is built from its vectors
+    EMBEDDING_CACHE_PATH: str = "output/embedding_cache.sqlite"
+
+    # Hybrid retrieval, BM25 keyword matches fused with the vector search results
+    HYBRID_SEARCH_ENABLED: bool = True
+    KEYWORD_INDEX_REFRESH_SECONDS: int = 60 * 10  # 10 minutes
+
+    # Reranking, the candidates fetched from every search are reordered and the best RETRIEVAL_TOP_K are kept
+    RETRIEVAL_CANDIDATES: int = 50
+    RETRIEVAL_TOP_K: int = 6
+    RERANK_RELEVANCE_WEIGHT: float = 0.6
+    RERANK_SCORE_WEIGHT: float = 0.2
+    RERANK_RECENCY_WEIGHT: float = 0.1
+    RERANK_COMMENTS_WEIGHT: float = 0.1
+    RERANK_RECENCY_HALF_LIFE_DAYS: float = 180
+
+    # Content of the retrieved documents, hydrated from Postgres for vectors indexed with slim metadata
+    DOCUMENT_CACHE_MAX_ENTRIES: int = 10000
+    DOCUMENT_CACHE_TTL_SECONDS: int = 60 * 10  # 10 minutes
 
     # OpenAI
     OPENAI_API_KEY: str
     OPENAI_EMBEDDINGS_MODEL: str = "text-embedding-3-small"
+    QUERY_EMBEDDING_CACHE_MAX_ENTRIES: int = 4096
 
     # Tavily
     TAVILY_API_KEY: str
 
+    # Agent
+    AGENT_WARMUP_ENABLED: bool = True  # Build the agent and open connection pools before serving requests
+    RETRIEVAL_GRADER_MAX_CONCURRENCY: int = 6
+    SPECULATIVE_WEB_SEARCH: bool = False  # Start the web search alongside retrieval instead of after grading
+
+    # Semantic answer cache
+    SEMANTIC_CACHE_ENABLED: bool = True
+    SEMANTIC_CACHE_SIMILARITY_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_TTL_SECONDS: int = 60 * 60 * 6  # 6 hours
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 2048
+
     # OxyLabs
     OXYLABS_USERNAME: str
     OXYLABS_PASSWORD: str
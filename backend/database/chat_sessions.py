@@ -1,3 +1,5 @@
+import asyncio
+
 from sqlalchemy import Column, Integer, Sequence, DateTime, String, func
 
 from backend.database import Base, db_session
@@ -56,3 +58,11 @@ def update_chat_session_title(chat_session_id: int, title: str) -> ChatSessionMo
         session.commit()
         session.refresh(chat_session)
         return chat_session
+
+
+async def acreate_chat_session(user_id: int) -> ChatSessionModel:
+    return await asyncio.to_thread(create_chat_session, user_id)
+
+
+async def aupdate_chat_session_title(chat_session_id: int, title: str) -> ChatSessionModel:
+    return await asyncio.to_thread(update_chat_session_title, chat_session_id, title)
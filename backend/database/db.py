@@ -22,7 +22,9 @@ class DatabaseSession:
         if cls._instance is None:
             logger.info("Created new database session object")
             cls._instance = super().__new__(cls)
-            cls._instance.db_engine = create_engine(settings.POSTGRES_URI)
+            cls._instance.db_engine = create_engine(
+                settings.POSTGRES_URI, pool_size=settings.POSTGRES_POOL_SIZE, max_overflow=settings.POSTGRES_MAX_OVERFLOW
+            )
             cls._instance.session_maker = scoped_session(
                 sessionmaker(autocommit=False, autoflush=True, bind=cls._instance.db_engine)
             )
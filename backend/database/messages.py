@@ -1,3 +1,4 @@
+import asyncio
 from enum import StrEnum
 
 from sqlalchemy import Column, Integer, String, Sequence, Text, DateTime
@@ -34,6 +35,11 @@ def create_message(content: str, chat_session_id: int, references: list[str], to
         return _new_message
 
 
+async def acreate_message(content: str, chat_session_id: int, references: list[str], tools_used: list[str], sender) -> MessagesModel:
+    # The ORM session is synchronous, run it on a worker thread so the event loop stays free
+    return await asyncio.to_thread(create_message, content, chat_session_id, references, tools_used, sender)
+
+
 def get_messages_by_chat_id(chat_session_id: int) -> list[MessagesModel]:
     with db_session() as session:
         return session.query(
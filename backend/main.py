@@ -1,13 +1,18 @@
+import time
+
+_import_started = time.perf_counter()
+
 import logging.config
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from backend.config import settings
 from backend.database import db_session
-from backend.schemas import HealthSchema
+from backend.schemas import HealthSchema, StartupReportSchema
+from backend.services.startup import warm_up
 from backend.views import central_router
 
 # Load logging configuration from file
@@ -21,6 +26,8 @@ logging.getLogger("passlib").setLevel(logging.ERROR)
 async def lifespan(app: FastAPI):
     logger.info("[FastAPI] Startup lifespan invoked")
     # await init_db()
+    if settings.AGENT_WARMUP_ENABLED:
+        app.state.startup_report = await warm_up(time.perf_counter() - _import_started)
     yield
 
 
@@ -43,3 +50,10 @@ app.add_middleware(
 @app.get("/", response_model=HealthSchema, tags=["health"])
 async def health_check(db: AsyncSession = Depends(db_session)):
     return {"api": True, "database": True}
+
+
+@app.get("/startup", response_model=StartupReportSchema, tags=["health"])
+async def startup_report():
+    if not hasattr(app.state, "startup_report"):
+        raise HTTPException(status_code=404, detail="Startup warm-up is disabled")
+    return app.state.startup_report
@@ -8,3 +8,17 @@ class ExceptionSchema(BaseModel):
 class HealthSchema(BaseModel):
     api: bool
     database: bool
+
+
+class StartupStepSchema(BaseModel):
+    name: str
+    seconds: float
+    ok: bool
+    error: str | None = None
+
+
+class StartupReportSchema(BaseModel):
+    import_seconds: float
+    warmup_seconds: float
+    total_seconds: float
+    steps: list[StartupStepSchema]
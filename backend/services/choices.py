@@ -1,5 +1,5 @@
+from backend.categories import get_category_registry
+
+
 def get_supported_product_categories():
-    return [
-        "headphones",
-        "sneakers"
-    ]
+    return list(get_category_registry())
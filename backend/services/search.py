@@ -1,14 +1,23 @@
+import asyncio
+import json
+import logging
 from functools import lru_cache
-from typing import List, Dict
+from typing import List, Dict, AsyncIterator
 
 import requests
 
-from backend.agent import agent_workflow
+from backend.agent import get_agent_workflow
+from backend.agent.semantic_cache import get_semantic_cache, CachedAnswer
+from backend.agent.streaming import ProductStreamParser, sse_event
+from backend.agent.vector_store import get_embeddings
 from backend.config import settings
-from backend.database.chat_sessions import create_chat_session, update_chat_session_title, \
+from backend.database.chat_sessions import acreate_chat_session, aupdate_chat_session_title, \
     fetch_chat_sessions_by_user_id
+from backend.database.messages import acreate_message, MessageSenderEnum
 from backend.schemas.search import InitialSearchResponse
 
+logger = logging.getLogger(__name__)
+
 
 @lru_cache(maxsize=128)
 def manage_chat_sessions(chat_session_id):
@@ -18,17 +27,111 @@ def manage_chat_sessions(chat_session_id):
 async def process_initial_search_query(
     model: str, prompt: str, category: str, chat_session_id: int | None, user_id: int
 ) -> InitialSearchResponse:
-    if chat_session_id is None:
-        chat_session_id = create_chat_session(user_id,).id
+    embedding = _start_query_embedding(prompt)
+    try:
+        if chat_session_id is None:
+            chat_session_id = (await acreate_chat_session(user_id)).id
+    except BaseException:
+        _cancel(embedding)
+        raise
+
+    query_embedding = None
+    if embedding is not None:
+        query_embedding = await embedding
+        if cached := get_semantic_cache().lookup(category, query_embedding):
+            return await _respond_from_cache(prompt, chat_session_id, cached)
+
+    response = await get_agent_workflow().ainvoke({
+        "prompt": prompt, "category": category, "chat_session_id": chat_session_id, "query_embedding": query_embedding
+    })
 
-    response = agent_workflow.invoke({"prompt": prompt, "category": category, "chat_session_id": chat_session_id})
+    return await _complete_search(category, chat_session_id, query_embedding, response)
 
+
+async def stream_initial_search_query(
+    model: str, prompt: str, category: str, chat_session_id: int | None, user_id: int
+) -> AsyncIterator[str]:
+    """
+    Run the initial search as a stream of Server-Sent Events:
+        session: the chat session the search is recorded in
+        step: a graph step that has finished
+        token: a token generated by the recommendation chain
+        product: a recommended product, sent as soon as it is completely generated
+        result: the final `InitialSearchResponse`
+        error: the search failed
+    """
+    embedding = _start_query_embedding(prompt)
+    try:
+        if chat_session_id is None:
+            chat_session_id = (await acreate_chat_session(user_id)).id
+        yield sse_event("session", {"chat_session_id": chat_session_id})
+
+        query_embedding = None
+        if embedding is not None:
+            query_embedding = await embedding
+            if cached := get_semantic_cache().lookup(category, query_embedding):
+                response = await _respond_from_cache(prompt, chat_session_id, cached)
+                for product in response.response.products:
+                    yield sse_event("product", product.model_dump(mode="json"))
+                yield sse_event("result", response.model_dump(mode="json"))
+                return
+
+        parser = ProductStreamParser()
+        streamed_steps, state = set(), {}
+        async for event in get_agent_workflow().astream_events({
+            "prompt": prompt, "category": category, "chat_session_id": chat_session_id, "query_embedding": query_embedding
+        }, version="v2"):
+            node = event.get("metadata", {}).get("langgraph_node")
+            if event["event"] == "on_chat_model_stream" and node == "generate":
+                if token := event["data"]["chunk"].content:
+                    yield sse_event("token", {"content": token})
+                    for product in parser.feed(token):
+                        yield sse_event("product", product.model_dump(mode="json"))
+            elif event["event"] == "on_chain_end" and event["name"] == node:
+                state = event["data"]["output"]
+                for step in state.get("steps", []):
+                    if step not in streamed_steps:
+                        streamed_steps.add(step)
+                        yield sse_event("step", {"step": step})
+
+        for product in parser.finish(state["generation"]):
+            yield sse_event("product", product.model_dump(mode="json"))
+        response = await _complete_search(category, chat_session_id, query_embedding, state)
+        yield sse_event("result", response.model_dump(mode="json"))
+    except Exception as e:
+        logger.error(f"Streaming search failed: {e}", exc_info=True)
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        _cancel(embedding)
+
+
+def _start_query_embedding(prompt: str) -> asyncio.Task | None:
+    """
+    Start embedding the query for the semantic cache lookup, so it runs while the chat session is created
+    """
+    if not settings.SEMANTIC_CACHE_ENABLED:
+        return None
+    return asyncio.create_task(get_embeddings().aembed_query(prompt))
+
+
+def _cancel(embedding: asyncio.Task | None):
+    """Cancel a query embedding that is no longer awaited, the search failed or the client disconnected"""
+    if embedding is not None and not embedding.done():
+        embedding.cancel()
+
+
+async def _complete_search(
+    category: str, chat_session_id: int, query_embedding: list[float] | None, response: dict
+) -> InitialSearchResponse:
     print(response["steps"])
 
     tools_used = ["vector_search"]
     if response.get("perform_web_search", False):
         tools_used.append("web_search")
-    update_chat_session_title(chat_session_id, response["prompt"])
+    await aupdate_chat_session_title(chat_session_id, response["prompt"])
+
+    if query_embedding is not None:
+        get_semantic_cache().store(category, query_embedding, response["generation"], tools_used)
 
     return InitialSearchResponse(
         chat_session_id=chat_session_id,
@@ -36,6 +139,24 @@ async def process_initial_search_query(
         tools_used=tools_used
     )
 
+
+async def _respond_from_cache(prompt: str, chat_session_id: int, cached: CachedAnswer) -> InitialSearchResponse:
+    """
+    Answer from the semantic cache, recording the exchange in the chat session like a regular search would
+    """
+    tools_used = cached.tools_used + ["semantic_cache"]
+    await acreate_message(content=prompt, chat_session_id=chat_session_id, references=[],
+                          sender=MessageSenderEnum.USER, tools_used=tools_used)
+    await acreate_message(content=json.dumps(cached.result.model_dump(mode="json")), chat_session_id=chat_session_id,
+                          references=[], sender=MessageSenderEnum.SYSTEM, tools_used=tools_used)
+    await aupdate_chat_session_title(chat_session_id, prompt)
+
+    return InitialSearchResponse(
+        chat_session_id=chat_session_id,
+        response=cached.result,
+        tools_used=tools_used
+    )
+
 def fetch_google_shopping_results(search_term: str) -> Dict:
     payload = {
         'source': 'google_shopping_search',
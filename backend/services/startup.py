@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Awaitable
+
+from sqlalchemy import text
+
+from backend.agent import get_agent_workflow
+from backend.agent.keyword_index import get_keyword_index_store
+from backend.agent.local_index import LocalVectorStore
+from backend.agent.vector_store import get_embeddings, get_vector_store, get_pinecone_index
+from backend.categories import get_category_registry
+from backend.config import settings
+from backend.database import db_session
+from backend.schemas import StartupReportSchema, StartupStepSchema
+
+logger = logging.getLogger(__name__)
+
+
+async def warm_up(import_seconds: float) -> StartupReportSchema:
+    """
+    Build the agent and open the connection pools a request would otherwise pay for, timing every step.
+
+    A failing step is logged and reported instead of stopping the worker, the request that needs it will raise.
+    """
+    started = time.perf_counter()
+    # The graph creates the clients the other steps warm up, so it is built first
+    steps = [await _timed("agent_workflow", _compile_agent_workflow)]
+    steps += await asyncio.gather(
+        _timed("query_embedding", _embed_dummy_query),
+        _timed("vector_store", _open_vector_store),
+        _timed("database", _open_database_connection),
+        _timed("keyword_index", _build_keyword_indexes),
+    )
+    warmup_seconds = time.perf_counter() - started
+
+    report = StartupReportSchema(
+        import_seconds=round(import_seconds, 3),
+        warmup_seconds=round(warmup_seconds, 3),
+        total_seconds=round(import_seconds + warmup_seconds, 3),
+        steps=steps,
+    )
+    logger.info(f"Startup completed in {report.total_seconds}s: " +
+                ", ".join(f"{step.name}={step.seconds}s{'' if step.ok else ' (failed)'}" for step in steps))
+    return report
+
+
+async def _timed(name: str, step: Callable[[], Awaitable]) -> StartupStepSchema:
+    started = time.perf_counter()
+    try:
+        await step()
+    except Exception as e:
+        logger.warning(f"Startup warm-up step {name} failed: {e}")
+        return StartupStepSchema(name=name, seconds=round(time.perf_counter() - started, 3), ok=False, error=str(e))
+    return StartupStepSchema(name=name, seconds=round(time.perf_counter() - started, 3), ok=True)
+
+
+async def _compile_agent_workflow():
+    await asyncio.to_thread(get_agent_workflow)
+
+
+async def _embed_dummy_query():
+    # Goes through the wrapped model, the warm-up prompt should not take a slot in the query cache
+    await get_embeddings().embeddings.aembed_query("warm up")
+
+
+async def _open_vector_store():
+    vector_store = get_vector_store()
+    if isinstance(vector_store, LocalVectorStore):
+        namespaces = os.listdir(vector_store.directory) if os.path.isdir(vector_store.directory) else []
+        await asyncio.to_thread(lambda: [vector_store.get_index(namespace) for namespace in namespaces])
+    else:
+        await asyncio.to_thread(get_pinecone_index().describe_index_stats)
+
+
+async def _open_database_connection():
+    def select_one():
+        with db_session() as session:
+            session.execute(text("SELECT 1"))
+
+    await asyncio.to_thread(select_one)
+
+
+async def _build_keyword_indexes():
+    if not settings.HYBRID_SEARCH_ENABLED:
+        return
+    store = get_keyword_index_store()
+    for category in get_category_registry().values():
+        await asyncio.to_thread(store.get_index, category["namespace"])
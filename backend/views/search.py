@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 
 from backend.schemas.search import InitialSearchRequest, Product, SearchQuery, InitialSearchResponse
 from backend.services.auth_bearer import get_current_user_id
 from backend.services.search import process_initial_search_query, fetch_google_shopping_results, \
-    extract_product_details, get_chat_sessions_for_user
+    extract_product_details, get_chat_sessions_for_user, stream_initial_search_query
 
 search_router = APIRouter(prefix="/search", tags=["search"])
 
@@ -25,6 +26,20 @@ async def initial_search(
 ) -> InitialSearchResponse:
     return await process_initial_search_query(request.model, request.prompt, request.category, request.chat_session_id, user_id)
 
+
+@search_router.post(
+    "/initial/stream",
+    response_class=StreamingResponse,
+)
+async def initial_search_stream(
+    request: InitialSearchRequest, user_id: int = Depends(get_current_user_id)
+) -> StreamingResponse:
+    return StreamingResponse(
+        stream_initial_search_query(request.model, request.prompt, request.category, request.chat_session_id, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 """
     Initial Search -> List[Products]
     
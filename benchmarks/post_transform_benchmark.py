@@ -0,0 +1,94 @@
+"""
+Throughput of the ingestion transform stage on a synthetic scrape.
+
+Compares `transform_posts` with the previous row by row preparation (`iterrows` and `to_dict` for every post):
+
+    python benchmarks/post_transform_benchmark.py --posts 100000 --comments 25
+"""
+import argparse
+import hashlib
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dags'))
+
+from post_transform import transform_posts  # noqa: E402
+
+WORDS = "sony bose sennheiser hd600 xm5 airpods max comfortable bass treble soundstage cable amp dac for the and".split()
+
+
+def synthetic_posts(n_posts, n_comments, seed=0):
+    rng = random.Random(seed)
+
+    def sentence(n_words):
+        return " ".join(rng.choices(WORDS, k=n_words))
+
+    return pd.DataFrame({
+        'id': [f"p{i}" for i in range(n_posts)],
+        'title': [sentence(10) for _ in range(n_posts)],
+        'body': [sentence(60) for _ in range(n_posts)],
+        'author': [f"user{rng.randrange(5000)}" for _ in range(n_posts)],
+        'subreddit': 'HeadphoneAdvice',
+        'score': [rng.randrange(2000) for _ in range(n_posts)],
+        'created': pd.Timestamp('2024-01-01') + pd.to_timedelta([rng.randrange(10 ** 7) for _ in range(n_posts)], 's'),
+        'comments': [
+            [{'text': sentence(30), 'score': rng.randrange(100), 'author': f"user{rng.randrange(5000)}"}
+             for _ in range(rng.randrange(n_comments + 1))]
+            for _ in range(n_posts)
+        ],
+    })
+
+
+def iterrows_baseline(dataframe, namespace):
+    """The row by row preparation `transform_posts` replaced, without the Pinecone metadata"""
+    posts = []
+    for _, row in dataframe.iterrows():
+        row_dict = row.to_dict()
+        row_dict['comments'] = [dict(comment) for comment in row_dict['comments']]
+        comments_text = " ".join(
+            f"Comment by {comment.get('author', 'Unknown')}: {comment.get('text', '')}"
+            for comment in row_dict['comments']
+        )
+        full_text = f"{row_dict['title']} {row_dict.get('body', '')} {comments_text}"
+        posts.append({
+            'raw': row_dict,
+            'text': full_text,
+            'post_data': {**row_dict, 'namespace': namespace,
+                          'content_hash': hashlib.sha256(full_text.encode('utf-8')).hexdigest()},
+        })
+    return posts
+
+
+def measure(name, func, dataframe, chunk_size):
+    start = time.perf_counter()
+    for i in range(0, len(dataframe), chunk_size):
+        func(dataframe.iloc[i:i + chunk_size], 'headphones')
+    elapsed = time.perf_counter() - start
+    print(f"{name:>16}: {len(dataframe) / elapsed:>10,.0f} rows/s ({elapsed:.2f}s)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--posts', type=int, default=100_000)
+    parser.add_argument('--comments', type=int, default=25, help="Maximum number of comments per post")
+    parser.add_argument('--chunk-size', type=int, default=250, help="Posts per process_reddit_data call")
+    parser.add_argument('--skip-baseline', action='store_true')
+    args = parser.parse_args()
+
+    dataframe = synthetic_posts(args.posts, args.comments)
+    print(f"{len(dataframe):,} posts, {int(dataframe['comments'].map(len).sum()):,} comments, "
+          f"chunks of {args.chunk_size}")
+
+    transform = measure('transform_posts', transform_posts, dataframe, args.chunk_size)
+    if not args.skip_baseline:
+        baseline = measure('iterrows', iterrows_baseline, dataframe, args.chunk_size)
+        print(f"{'speedup':>16}: {baseline / transform:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+import json
+import os
+
+# Registry shared with the backend, mounted at /opt/airflow/config next to the dags folder
+DEFAULT_REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'categories.json')
+
+
+def load_categories(path=None):
+    """
+    Product categories to ingest, each into its own Pinecone namespace
+
+    Args:
+        path (str): Registry file, CATEGORY_REGISTRY_PATH or the repository's config/categories.json when missing
+
+    Returns:
+        list: One dictionary per category with its name, namespace, subreddits, scrape settings, chunk_size and
+            streaming_batch_size, the registry defaults filling the settings a category leaves out
+    """
+    path = path or os.getenv('CATEGORY_REGISTRY_PATH', DEFAULT_REGISTRY_PATH)
+    with open(path) as f:
+        registry = json.load(f)
+
+    defaults = registry.get('defaults', {})
+    categories = []
+    for category in registry['categories']:
+        if not category.get('subreddits'):
+            raise ValueError(f"Category {category['name']} has no subreddits")
+        categories.append({
+            **defaults,
+            **category,
+            'namespace': category.get('namespace', category['name']),
+            'scrape': {**defaults.get('scrape', {}), **category.get('scrape', {})},
+        })
+
+    names = [category['name'] for category in categories]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate category names in {path}")
+    return categories
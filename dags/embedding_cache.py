@@ -0,0 +1,146 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# SQLite limits the number of parameters of a statement
+SQLITE_BATCH_SIZE = 500
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache in a SQLite file.
+
+    Vectors are stored as float32 blobs keyed by (model, dimensions, sha256(text)). Once the cache holds more than
+    `max_entries` vectors, the least recently used ones are evicted.
+    """
+
+    def __init__(self, path, max_entries=1_000_000):
+        """
+        Args:
+            path (str): SQLite database file, created if missing
+            max_entries (int): Maximum number of cached vectors
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        # Concurrent tasks on a worker share the file, a writer waits for the lock instead of failing
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(model, dimensions, text):
+        return f"{model}:{dimensions}:{hashlib.sha256(text.encode('utf-8')).hexdigest()}"
+
+    def get_many(self, keys):
+        """
+        Args:
+            keys (list): Cache keys
+
+        Returns:
+            dict: Cached vector of every key found in the cache
+        """
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[i:i + SQLITE_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update((key, np.frombuffer(vector, dtype=np.float32).tolist()) for key, vector in rows)
+                self._conn.execute(
+                    f"UPDATE embeddings SET last_used = ? WHERE key IN ({placeholders})", [time.time_ns(), *batch]
+                )
+            self._conn.commit()
+
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, items):
+        """
+        Args:
+            items (dict): Vector of every key to cache
+        """
+        if not items:
+            return
+        with self._lock:
+            now = time.time_ns()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now) for key, vector in items.items()]
+            )
+            # Counted in the write transaction, other processes sharing the file add entries too
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if entries > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (entries - self.max_entries,)
+                )
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedDocumentEmbeddings(Embeddings):
+    """
+    Embedding model wrapper that only sends the texts missing from the persistent cache to the embedding model
+    """
+
+    def __init__(self, embeddings, cache, model, dimensions=None):
+        """
+        Args:
+            embeddings (Embeddings): Embedding model
+            cache (EmbeddingCache): Persistent cache
+            model (str): Embedding model name, part of the cache key
+            dimensions (int, optional): Embedding dimensions, part of the cache key
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+        self.dimensions = dimensions or "default"
+
+    def embed_documents(self, texts):
+        keys = [self.cache.key(self.model, self.dimensions, text) for text in texts]
+        cached = self.cache.get_many(keys)
+
+        # Embed every missing text once, even when it appears several times in the batch
+        missing = {key: text for key, text in zip(keys, texts) if key not in cached}
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            embedded = dict(zip(missing, vectors))
+            self.cache.put_many(embedded)
+            cached.update(embedded)
+
+        return [cached[key] for key in keys]
+
+    def embed_query(self, text):
+        return self.embeddings.embed_query(text)
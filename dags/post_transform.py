@@ -0,0 +1,125 @@
+import hashlib
+
+import numpy as np
+
+REQUIRED_COLUMNS = ('id', 'title', 'author', 'subreddit', 'score', 'created')
+
+# Version of the Pinecone metadata and database record layout, bump it to re-index the stored posts
+INDEX_SCHEMA_VERSION = 2
+
+
+def transform_posts(dataframe, namespace, index_version=''):
+    """
+    Build the text to embed, the Pinecone metadata and the database record of every post of a scraped chunk.
+
+    Each column is converted to a Python list once and the posts are assembled from those lists in plain Python
+    loops. This is not a vectorised transform: it only avoids building a pandas row and a `to_dict` per post, which
+    is what made the `iterrows` preparation slow. Pandas string methods over the exploded comments were measured
+    slower than these loops on scraped chunks of a few hundred posts (see benchmarks/post_transform_benchmark.py).
+
+    Args:
+        dataframe (pd.DataFrame): Reddit posts, one row per post with a `comments` list column
+        namespace (str): Pinecone namespace of the posts
+        index_version (str): Indexing layout of the posts, part of the content hash so that posts stored with
+            another layout are re-indexed
+
+    Returns:
+        list: Prepared posts with the raw post, the post `text`, Pinecone `metadata` and the database `post_data`,
+            the S3 url is set once the post is archived. Rows without an id or title are left out.
+    """
+    missing_columns = [column for column in REQUIRED_COLUMNS if column not in dataframe]
+    if missing_columns:
+        raise ValueError(f"Reddit posts are missing the columns {missing_columns}")
+
+    valid = dataframe['id'].notna() & dataframe['title'].notna()
+    if not valid.all():
+        print(f"Skipping {int((~valid).sum())} posts without an id or title")
+        dataframe = dataframe[valid]
+    if dataframe.empty:
+        return []
+
+    columns = {column: dataframe[column].tolist() for column in dataframe.columns}
+    comments = [_comment_list(value) for value in columns.get('comments', [None] * len(dataframe))]
+    columns['comments'] = comments
+    bodies = ['' if _is_missing(body) else str(body) for body in columns.get('body', [''] * len(dataframe))]
+
+    texts = [
+        f"{title} {body} {comments_text}"
+        for title, body, comments_text in zip(columns['title'], bodies, comments_texts(comments))
+    ]
+    # Hash of the embedded content and its layout, a post is only re-indexed when one of them changes
+    content_hashes = [hashlib.sha256(f"{index_version}\n{text}".encode('utf-8')).hexdigest() for text in texts]
+    raw_posts = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    posts = []
+    for i, post_id in enumerate(map(str, columns['id'])):
+        posts.append({
+            'raw': raw_posts[i],
+            'text': texts[i],
+            # Only ids and small fields, the backend reads the content from reddit_posts
+            'metadata': {
+                'id': post_id,
+                'post_id': post_id,
+                'title': columns['title'][i],
+                'author': columns['author'][i],
+                'subreddit': columns['subreddit'][i],
+                'score': columns['score'][i],
+                'created': str(columns['created'][i]),
+                's3_url': None,
+                'namespace': namespace,
+                'num_comments': len(comments[i])
+            },
+            'post_data': {
+                'id': post_id,
+                'title': columns['title'][i],
+                'body': bodies[i],
+                'author': columns['author'][i],
+                'subreddit': columns['subreddit'][i],
+                'score': columns['score'][i],
+                'created': columns['created'][i],
+                's3_url': None,
+                'vector_id': f"{namespace}_{post_id}",
+                'namespace': namespace,
+                'comments': comments[i],
+                'content_hash': content_hashes[i]
+            }
+        })
+    return posts
+
+
+def comments_texts(comments):
+    """
+    Format the comments of every post as `Comment by <author>: <text>` lines joined with spaces.
+
+    Args:
+        comments (list): Comment list of every post
+
+    Returns:
+        list: Comments text of every post, empty for posts without comments
+    """
+    return [
+        ' '.join(
+            f"Comment by {comment.get('author', 'Unknown')}: {comment.get('text', '')}" for comment in post_comments
+        )
+        for post_comments in comments
+    ]
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+def _comment_list(comments):
+    """
+    Comments of a post as a list of plain dictionaries, comment lists read back from Arrow or Parquet are NumPy
+    arrays with NumPy array values
+    """
+    if isinstance(comments, list):
+        return comments
+    if not isinstance(comments, np.ndarray):
+        return []
+    return [
+        {key: (value.tolist() if isinstance(value, np.ndarray) else value) for key, value in comment.items()}
+        if any(isinstance(value, np.ndarray) for value in comment.values()) else comment
+        for comment in comments.tolist()
+    ]
@@ -0,0 +1,72 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every worker calling the same rate limited API.
+
+    Tokens are added at `rate` per second up to `capacity`, every request takes one. The rate follows the API's
+    rate limit headers: the remaining requests of the current window are spread evenly over the seconds left until
+    it resets, so concurrent workers never spend the window's budget before it resets.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            rate (float): Initial requests per second, until the first rate limit headers are seen
+            capacity (int): Maximum burst of requests
+            clock (callable): Monotonic clock in seconds
+            sleep (callable): Sleep function, both are injectable for tests
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated_at = clock()
+        self._paused_until = 0.0
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = self._refill()
+                if now >= self._paused_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = max(self._paused_until - now, (1 - self._tokens) / self.rate)
+            self._sleep(wait)
+
+    def update(self, remaining, seconds_to_reset):
+        """
+        Adjust the bucket to the rate limit reported by the API
+
+        Args:
+            remaining (float): Requests left in the current window
+            seconds_to_reset (float): Seconds until the window resets
+        """
+        with self._lock:
+            self._refill()
+            self.rate = max(remaining, 1) / max(seconds_to_reset, 1)
+            self._tokens = min(self._tokens, max(remaining, 0))
+
+    def update_from_headers(self, headers):
+        """Adjust the bucket to the `x-ratelimit-remaining` and `x-ratelimit-reset` headers of a Reddit response"""
+        remaining, seconds_to_reset = headers.get('x-ratelimit-remaining'), headers.get('x-ratelimit-reset')
+        if remaining is not None and seconds_to_reset is not None:
+            self.update(float(remaining), float(seconds_to_reset))
+
+    def pause(self, seconds):
+        """Hold every request for `seconds`, after the API rejected a request as rate limited"""
+        with self._lock:
+            now = self._refill()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = min(self._tokens, 0)
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+        return now
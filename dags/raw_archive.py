@@ -0,0 +1,140 @@
+import gzip
+import json
+import re
+import uuid
+import concurrent.futures
+
+
+BYTE_RANGE_PATTERN = re.compile(r"#bytes=(\d+)-(\d+)$")
+
+
+class RawArchiveWriter:
+    """
+    Writes the raw scraped posts to S3 in one of two layouts:
+
+    1. per_post: one JSON object per post under `{prefix}/{id}.json`, uploaded concurrently
+    2. bundled: one gzip compressed NDJSON object per chunk under `{prefix}/part-{uuid}.ndjson.gz`, with a
+       `.manifest.json` object mapping every post id to its byte range in the bundle
+
+    Every post in a bundle is its own gzip member, so a single post is read back with a ranged GET of its bytes,
+    the returned s3 url carries that range as `s3://bucket/key#bytes=start-end` and is resolved by `read_raw_post`.
+
+    In both layouts a failed upload is retried through `retry`, posts whose upload still fails are logged and left
+    out of the result instead of failing the whole batch.
+    """
+
+    MODES = ('per_post', 'bundled')
+
+    def __init__(self, s3_client, bucket, mode='per_post', max_workers=8, json_encoder=json.JSONEncoder, retry=None):
+        """
+        Args:
+            s3_client: boto3 S3 client
+            bucket (str): Bucket the raw data is written to
+            mode (str): 'per_post' or 'bundled'
+            max_workers (int): Number of concurrent uploads in per_post mode
+            json_encoder (type): JSON encoder class used to serialize the posts
+            retry (callable): Called as `retry(func, *args, **kwargs)` for every upload, calls `func` once when missing
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown raw archive mode {mode}, expected one of {self.MODES}")
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.mode = mode
+        self.max_workers = max_workers
+        self.json_encoder = json_encoder
+        self.retry = retry or (lambda func, *args, **kwargs: func(*args, **kwargs))
+
+    def write(self, posts, prefix):
+        """
+        Archive the posts under `prefix`
+
+        Args:
+            posts (list): Post dictionaries, each with an `id`
+            prefix (str): Key prefix of the archived objects
+
+        Returns:
+            dict: S3 url of every archived post by id, posts that failed to upload are left out
+        """
+        if not posts:
+            return {}
+        if self.mode == 'bundled':
+            return self._write_bundle(posts, prefix)
+        return self._write_per_post(posts, prefix)
+
+    def _serialize(self, post):
+        return json.dumps(post, cls=self.json_encoder, default=str)
+
+    def _write_per_post(self, posts, prefix):
+        s3_urls = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            future_to_post_id = {
+                executor.submit(self.retry, self._put_post, post, f"{prefix}/{post['id']}.json"): post['id']
+                for post in posts
+            }
+            for future in concurrent.futures.as_completed(future_to_post_id):
+                post_id = future_to_post_id[future]
+                try:
+                    s3_urls[post_id] = future.result()
+                except Exception as e:
+                    print(f"Error uploading post {post_id} to S3: {e}")
+        return s3_urls
+
+    def _put_post(self, post, key):
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=key,
+            Body=self._serialize(post).encode('utf-8'),
+            ContentType='application/json'
+        )
+        return f"s3://{self.bucket}/{key}"
+
+    def _write_bundle(self, posts, prefix):
+        key = f"{prefix}/part-{uuid.uuid4().hex}.ndjson.gz"
+
+        body, manifest = bytearray(), {}
+        for post in posts:
+            member = gzip.compress((self._serialize(post) + "\n").encode('utf-8'))
+            manifest[post['id']] = {'key': key, 'offset': len(body), 'length': len(member)}
+            body += member
+
+        # The bundle goes first, so a manifest never points at a missing object
+        try:
+            self.retry(
+                self.s3_client.put_object, Bucket=self.bucket, Key=key, Body=bytes(body), ContentType='application/gzip'
+            )
+            self.retry(
+                self.s3_client.put_object,
+                Bucket=self.bucket,
+                Key=key.replace('.ndjson.gz', '.manifest.json'),
+                Body=json.dumps(manifest).encode('utf-8'),
+                ContentType='application/json'
+            )
+        except Exception as e:
+            print(f"Error uploading the bundle of {len(posts)} posts to S3: {e}")
+            return {}
+        return {
+            post_id: f"s3://{self.bucket}/{key}#bytes={entry['offset']}-{entry['offset'] + entry['length'] - 1}"
+            for post_id, entry in manifest.items()
+        }
+
+
+def read_raw_post(s3_client, s3_url):
+    """
+    Read an archived post back from the s3 url returned by `RawArchiveWriter.write`
+
+    Args:
+        s3_client: boto3 S3 client
+        s3_url (str): s3://bucket/key url, with a `#bytes=start-end` range for bundled posts
+
+    Returns:
+        dict: The archived post
+    """
+    byte_range = BYTE_RANGE_PATTERN.search(s3_url)
+    bucket, key = BYTE_RANGE_PATTERN.sub('', s3_url).removeprefix('s3://').split('/', 1)
+
+    if byte_range is None:
+        return json.loads(s3_client.get_object(Bucket=bucket, Key=key)['Body'].read())
+
+    start, end = byte_range.groups()
+    body = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")['Body'].read()
+    return json.loads(gzip.decompress(body))
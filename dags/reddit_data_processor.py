@@ -1,7 +1,8 @@
 import os
 import json
+import concurrent.futures
+from contextlib import contextmanager
 from datetime import datetime
-import pandas as pd
 import time
 import numpy as np
 
@@ -13,9 +14,72 @@ from langchain_pinecone import PineconeVectorStore
 # Additional imports
 from pinecone import Pinecone, ServerlessSpec
 import boto3
+from botocore.config import Config
 import psycopg2
+import psycopg2.pool
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 
+from embedding_cache import EmbeddingCache, CachedDocumentEmbeddings
+from post_transform import INDEX_SCHEMA_VERSION, transform_posts
+from raw_archive import RawArchiveWriter
+
+EMBEDDING_MODEL = 'text-embedding-3-small'
+
+# Pinecone rejects upsert requests over 2MB, batches are kept under it with room for the request envelope
+MAX_UPSERT_REQUEST_BYTES = 1_500_000
+
+CREATE_TABLES = """
+CREATE TABLE IF NOT EXISTS reddit_posts (
+    id TEXT PRIMARY KEY,
+    title TEXT,
+    body TEXT,
+    author TEXT,
+    subreddit TEXT,
+    score INTEGER,
+    created_at TIMESTAMP,
+    s3_url TEXT,
+    vector_id TEXT,
+    namespace TEXT,
+    comments JSONB,
+    content_hash TEXT
+);
+ALTER TABLE reddit_posts ADD COLUMN IF NOT EXISTS content_hash TEXT;
+CREATE TABLE IF NOT EXISTS reddit_post_chunks (
+    id TEXT PRIMARY KEY,
+    post_id TEXT NOT NULL,
+    namespace TEXT,
+    chunk_type TEXT,
+    chunk_index INTEGER,
+    content TEXT
+);
+CREATE INDEX IF NOT EXISTS reddit_post_chunks_post_id ON reddit_post_chunks (post_id);
+"""
+
+REDDIT_POSTS_COLUMNS = (
+    "id, title, body, author, subreddit, score, created_at, s3_url, vector_id, namespace, comments, content_hash"
+)
+
+UPSERT_STAGED_REDDIT_POSTS = f"""
+INSERT INTO reddit_posts ({REDDIT_POSTS_COLUMNS})
+SELECT {REDDIT_POSTS_COLUMNS} FROM reddit_posts_staging
+ON CONFLICT (id) DO UPDATE SET 
+title = EXCLUDED.title,
+body = EXCLUDED.body,
+score = EXCLUDED.score,
+s3_url = EXCLUDED.s3_url,
+vector_id = EXCLUDED.vector_id,
+namespace = EXCLUDED.namespace,
+comments = EXCLUDED.comments,
+content_hash = EXCLUDED.content_hash;
+"""
+
+UPDATE_REDDIT_POST_SCORES = """
+UPDATE reddit_posts SET score = scores.score
+FROM (VALUES %s) AS scores (id, score)
+WHERE reddit_posts.id = scores.id;
+"""
+
 class NumpyEncoder(json.JSONEncoder):
     """
     Custom JSON encoder to handle NumPy arrays and other non-serializable types
@@ -30,13 +94,70 @@ class NumpyEncoder(json.JSONEncoder):
         return super().default(obj)
 
 class RedditDataProcessor:
-    def __init__(self):
+    def __init__(
+        self,
+        embedding_batch_size=256,
+        upsert_batch_size=100,
+        upsert_workers=4,
+        max_retries=3,
+        retry_backoff_seconds=1,
+        db_pool_size=4,
+        raw_archive_mode=None,
+        s3_upload_workers=8,
+        embedding_cache_path=None,
+        embedding_cache_max_entries=1_000_000,
+        indexing_mode=None,
+        chunk_size=1000,
+        chunk_overlap=100,
+        comment_window_size=3
+    ):
         """
         Initialize the RedditDataProcessor with necessary configurations and clients
+        
+        Args:
+            embedding_batch_size (int): Number of texts embedded per embedding request
+            upsert_batch_size (int): Maximum number of vectors per Pinecone upsert request
+            upsert_workers (int): Number of upsert requests sent in parallel
+            max_retries (int): Retries of a failed embedding or upsert batch
+            retry_backoff_seconds (float): Delay before the first retry, doubled on every retry
+            db_pool_size (int): Maximum number of pooled PostgreSQL connections
+            raw_archive_mode (str): 'per_post' or 'bundled' raw data layout in S3, defaults to RAW_ARCHIVE_MODE
+            s3_upload_workers (int): Number of concurrent S3 uploads in per_post mode
+            embedding_cache_path (str): SQLite file of the embedding cache, defaults to EMBEDDING_CACHE_PATH
+            embedding_cache_max_entries (int): Maximum number of cached embeddings
+            indexing_mode (str): 'post' for one vector per post or 'chunked' for one vector per body chunk and
+                comment window, defaults to INDEXING_MODE
+            chunk_size (int): Maximum characters per chunk in chunked mode
+            chunk_overlap (int): Characters shared by consecutive body chunks in chunked mode
+            comment_window_size (int): Number of comments per comment chunk in chunked mode
         """
         # Load environment variables
         load_dotenv()
         
+        # Batching configuration
+        self.embedding_batch_size = embedding_batch_size
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_workers = upsert_workers
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+        
+        # Embedding cache configuration
+        self.embedding_cache_path = embedding_cache_path or os.getenv(
+            'EMBEDDING_CACHE_PATH', os.path.join('output', 'embedding_cache.sqlite')
+        )
+        self.embedding_cache_max_entries = embedding_cache_max_entries
+        
+        # Indexing configuration
+        self.indexing_mode = indexing_mode or os.getenv('INDEXING_MODE', 'post')
+        if self.indexing_mode not in ('post', 'chunked'):
+            raise ValueError(f"Unknown indexing mode {self.indexing_mode}, expected 'post' or 'chunked'")
+        self.comment_window_size = comment_window_size
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        # Part of the content hash, posts stored with another layout or other chunking settings are re-indexed
+        self.index_version = f"{INDEX_SCHEMA_VERSION}:{self.indexing_mode}"
+        if self.indexing_mode == 'chunked':
+            self.index_version += f":{chunk_size}:{chunk_overlap}:{comment_window_size}"
+        
         # Initialize configuration
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         self.pinecone_api_key = os.getenv('PINECONE_API_KEY')
@@ -47,6 +168,8 @@ class RedditDataProcessor:
         self.aws_access_key = os.getenv('AWS_ACCESS_KEY_ID')
         self.aws_secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
         self.aws_s3_bucket = os.getenv('AWS_S3_BUCKET')
+        self.raw_archive_mode = raw_archive_mode or os.getenv('RAW_ARCHIVE_MODE', 'per_post')
+        self.s3_upload_workers = s3_upload_workers
         
         # PostgreSQL configuration
         self.db_host = os.getenv("POSTGRES_HOSTNAME")
@@ -55,6 +178,10 @@ class RedditDataProcessor:
         self.db_password = os.getenv("POSTGRES_PASSWORD")
         self.db_port = os.getenv("POSTGRES_PORT")
         
+        # Connection pool, created on the first database write
+        self.db_pool_size = db_pool_size
+        self.db_pool = None
+        
         # Initialize clients
         self._init_s3_client()
         self._init_pinecone()
@@ -65,7 +192,17 @@ class RedditDataProcessor:
         self.s3_client = boto3.client(
             's3',
             aws_access_key_id=self.aws_access_key,
-            aws_secret_access_key=self.aws_secret_key
+            aws_secret_access_key=self.aws_secret_key,
+            # Leave room for the concurrent uploads in the connection pool
+            config=Config(max_pool_connections=max(10, self.s3_upload_workers))
+        )
+        self.raw_archive = RawArchiveWriter(
+            self.s3_client,
+            self.aws_s3_bucket,
+            mode=self.raw_archive_mode,
+            max_workers=self.s3_upload_workers,
+            json_encoder=NumpyEncoder,
+            retry=self._with_retries
         )
     
     def _init_pinecone(self):
@@ -90,193 +227,468 @@ class RedditDataProcessor:
         self.pc_index = pc.Index(self.pinecone_index_name)
     
     def _init_embedding_model(self):
-        """Initialize OpenAI embedding model"""
-        self.embeddings = OpenAIEmbeddings(
-            openai_api_key=self.openai_api_key,
-            model='text-embedding-3-small'
+        """Initialize OpenAI embedding model, behind the persistent embedding cache"""
+        self.embedding_cache = EmbeddingCache(self.embedding_cache_path, max_entries=self.embedding_cache_max_entries)
+        self.embeddings = CachedDocumentEmbeddings(
+            OpenAIEmbeddings(
+                openai_api_key=self.openai_api_key,
+                model=EMBEDDING_MODEL
+            ),
+            self.embedding_cache,
+            model=EMBEDDING_MODEL
         )
-    
-    
-    def save_to_s3(self, content, filename):
+
+    def process_reddit_data(self, dataframe, namespace):
         """
-        Save content to S3 bucket
+        Process Reddit data, skipping posts that did not change since the last run, by:
+        1. Saving to S3
+        2. Creating vector embeddings in batches
+        3. Storing in Pinecone with metadata in a specific namespace, in parallel upsert batches
+        4. Inserting into PostgreSQL
+        
+        The steps are split into the `prepare_batch`, `embed_batch` and `store_batch` stages, which the streaming
+        pipeline runs concurrently on consecutive batches.
         
         Args:
-            content (str): Content to save
-            filename (str): Filename/key for S3 object
-            
+            dataframe (pd.DataFrame): DataFrame containing Reddit posts
+            namespace (str): Pinecone namespace of the posts' category
+        
         Returns:
-            str: S3 URL of saved object
+            set: Ids of the posts that could not be archived or stored, the next run has to pick them up again
         """
-        try:
-            # Use custom JSON encoder to handle non-serializable types
-            serialized_content = json.dumps(content, cls=NumpyEncoder, default=str)
-            
-            self.s3_client.put_object(
-                Bucket=self.aws_s3_bucket,
-                Key=filename,
-                Body=serialized_content.encode('utf-8'),
-                ContentType='application/json'
-            )
-            return f"s3://{self.aws_s3_bucket}/{filename}"
-        except Exception as e:
-            print(f"Error uploading to S3: {e}")
-            raise
+        batch = self.prepare_batch(dataframe, namespace)
+        if batch is None:
+            return set()
+        return self.store_batch(self.embed_batch(batch))
 
-    def process_reddit_data(self, dataframe):
+    def prepare_batch(self, dataframe, namespace):
         """
-        Process Reddit data by:
-        1. Saving to S3
-        2. Creating vector embeddings
-        3. Storing in Pinecone with metadata in a specific namespace
-        4. Inserting into PostgreSQL
+        First stage: build the posts, drop the unchanged ones, update changed scores and archive the raw posts to S3
         
         Args:
             dataframe (pd.DataFrame): DataFrame containing Reddit posts
-        """
-        # Explicitly set namespace
-        namespace = 'headphones'
+            namespace (str): Pinecone namespace of the posts
         
+        Returns:
+            dict: Batch with the `namespace`, the archived `posts` to index and the `failed_post_ids` that could not
+                be archived, None when no post changed
+        """
         # Timestamp for S3 and tracking
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         
-        # Process each post
-        for _, row in dataframe.iterrows():
-            try:
-                # Convert row to dictionary with safe serialization
-                row_dict = row.to_dict()
-                
-                # Safely handle comments and convert NumPy types
-                if 'comments' in row_dict:
-                    row_dict['comments'] = [
-                        {k: (v.tolist() if isinstance(v, np.ndarray) else v) 
-                         for k, v in comment.items()}
-                        for comment in row_dict['comments']
-                    ]
-                
-                # Combine title, body, and comments for embedding
-                comments_text = " ".join([
-                    f"Comment by {comment.get('author', 'Unknown')}: {comment.get('text', '')}" 
-                    for comment in row_dict.get('comments', [])
-                ])
-                full_text = f"{row_dict['title']} {row_dict.get('body', '')} {comments_text}"
-                
-                # Save raw data to S3
-                s3_key = f"reddit_posts/{timestamp}/{row_dict['id']}.json"
-                s3_url = self.save_to_s3(row_dict, s3_key)
-
-                vector_store = PineconeVectorStore(
-                    index=self.pc_index, 
-                    embedding=self.embeddings,
-                    namespace=namespace
-                )
+        # Build the texts, metadata and database records of the whole chunk
+        posts = transform_posts(dataframe, namespace, self.index_version)
+        
+        # Only new and edited posts go through the pipeline, posts whose score alone changed are updated in place
+        posts, score_updates = self._select_changed_posts(posts)
+        if score_updates:
+            self.update_post_scores(score_updates, namespace)
+        
+        # Save raw data to S3, posts that could not be archived are not indexed
+        if not posts:
+            return None
+        s3_urls = self.raw_archive.write([post['raw'] for post in posts], prefix=f"reddit_posts/{timestamp}")
+        archived_posts, failed_post_ids = [], set()
+        for post in posts:
+            post_id = post['post_data']['id']
+            if post_id not in s3_urls:
+                print(f"Skipping post without raw data in S3: {post['post_data']['title']}")
+                failed_post_ids.add(post_id)
+                continue
+            post['metadata']['s3_url'] = post['post_data']['s3_url'] = s3_urls[post_id]
+            archived_posts.append(post)
+        
+        return {'namespace': namespace, 'posts': archived_posts, 'failed_post_ids': failed_post_ids}
+
+    def embed_batch(self, batch):
+        """
+        Second stage: split the posts into documents and embed them
+        
+        Args:
+            batch (dict): Batch returned by `prepare_batch`
+        
+        Returns:
+            dict: The batch with its `documents` and their `embeddings`
+        """
+        posts = batch['posts']
+        
+        # One vector per post, or per body chunk and comment window of every post in chunked mode
+        if self.indexing_mode == 'chunked':
+            documents = [document for post in posts for document in self._chunk_post(post)]
+        else:
+            documents = [
+                {'id': post['post_data']['id'], 'post_id': post['post_data']['id'], 'text': post['text'],
+                 'metadata': post['metadata']}
+                for post in posts
+            ]
+        
+        # Embed all the documents with one request per batch
+        embeddings = self.embed_texts([document['text'] for document in documents])
+        return {**batch, 'documents': documents, 'embeddings': embeddings}
 
-                # Prepare metadata for Pinecone
-                metadata = {
-                    'id': row_dict['id'],
-                    'title': row_dict['title'],
-                    'body': row_dict.get('body', ''),
-                    'author': row_dict['author'],
-                    'subreddit': row_dict['subreddit'],
-                    'score': row_dict['score'],
-                    'created': str(row_dict['created']),
-                    's3_url': s3_url,
-                    'namespace': namespace,
-                    'comments': json.dumps(row_dict.get('comments', []), cls=NumpyEncoder)
+    def store_batch(self, batch):
+        """
+        Last stage: upsert the vectors in parallel batches and insert the posts whose vectors were stored
+        
+        Args:
+            batch (dict): Batch returned by `embed_batch`
+        
+        Returns:
+            set: Ids of the posts of the batch that could not be archived or stored
+        """
+        namespace, posts, documents = batch['namespace'], batch['posts'], batch['documents']
+        
+        vectors = [
+            {'id': document['id'], 'values': embedding, 'metadata': document['metadata']}
+            for document, embedding in zip(documents, batch['embeddings'])
+        ]
+        failed_ids = self.upsert_vectors(vectors, namespace)
+        failed_post_ids = {document['post_id'] for document in documents if document['id'] in failed_ids}
+        
+        self.delete_stale_chunks(
+            [post for post in posts if post['stored'] and post['post_data']['id'] not in failed_post_ids],
+            documents,
+            namespace
+        )
+        
+        post_records = []
+        for post in posts:
+            post_data = post['post_data']
+            if post_data['id'] in failed_post_ids:
+                print(f"Skipping database insert for post without vector: {post_data['title']}")
+                continue
+            post_records.append(post_data)
+        
+        # Insert into database, one round trip for the whole chunk
+        # Without chunks the stored chunks of the posts are cleared, they may have been indexed in chunked mode
+        chunks = []
+        if self.indexing_mode == 'chunked':
+            stored_post_ids = {post_data['id'] for post_data in post_records}
+            chunks = [document for document in documents if document['post_id'] in stored_post_ids]
+        if self.insert_reddit_articles(post_records, chunks):
+            print(f"Processed {len(post_records)} posts in {namespace} namespace")
+        else:
+            failed_post_ids.update(post_data['id'] for post_data in post_records)
+        return failed_post_ids | batch['failed_post_ids']
+
+    def _chunk_post(self, post):
+        """
+        Split a post into documents for chunked indexing: the title and body split with the text splitter, and
+        windows of `comment_window_size` comments. Every chunk repeats the post title and links back to the post.
+        
+        Args:
+            post (dict): Prepared post
+        
+        Returns:
+            list: Documents with a chunk `id`, the parent `post_id`, the `text` to embed and Pinecone `metadata`
+        """
+        post_data = post['post_data']
+        title = post_data['title']
+        comments = post_data['comments']
+        
+        chunks = [('body', text) for text in self.text_splitter.split_text(f"{title}\n{post_data['body']}")]
+        for i in range(0, len(comments), self.comment_window_size):
+            window = "\n".join(
+                f"Comment by {comment.get('author', 'Unknown')}: {comment.get('text', '')}"
+                for comment in comments[i:i + self.comment_window_size]
+            )
+            # A window of long comments is split further, each piece keeps the title for context
+            chunks.extend(('comments', f"{title}\n{text}") for text in self.text_splitter.split_text(window))
+        
+        documents = []
+        chunk_counts = {}
+        for chunk_type, text in chunks:
+            chunk_index = chunk_counts.get(chunk_type, 0)
+            chunk_counts[chunk_type] = chunk_index + 1
+            chunk_id = f"{post_data['id']}#{chunk_type}-{chunk_index}"
+            documents.append({
+                'id': chunk_id,
+                'post_id': post_data['id'],
+                'text': text,
+                'metadata': {
+                    'id': chunk_id,
+                    'post_id': post_data['id'],
+                    'chunk_type': chunk_type,
+                    'chunk_index': chunk_index,
+                    'title': title,
+                    'author': post_data['author'],
+                    'subreddit': post_data['subreddit'],
+                    'score': post_data['score'],
+                    'created': str(post_data['created']),
+                    's3_url': post_data['s3_url'],
+                    'namespace': post_data['namespace'],
+                    'num_comments': len(comments)
                 }
+            })
+        return documents
+
+    def delete_stale_chunks(self, posts, documents, namespace):
+        """
+        Delete the vectors of re-indexed posts that were not rewritten by this run: chunks beyond the new chunk count,
+        the whole-post vector of posts indexed before chunking was enabled and the chunks of posts indexed in chunked
+        mode before switching back to one vector per post
+        
+        Args:
+            posts (list): Re-indexed posts that were already stored
+            documents (list): Documents upserted in this run
+            namespace (str): Pinecone namespace
+        """
+        current_ids = {document['id'] for document in documents}
+        for post in posts:
+            post_id = post['post_data']['id']
+            try:
+                chunk_ids = [
+                    vector_id
+                    for page in self.pc_index.list(prefix=f"{post_id}#", namespace=namespace)
+                    for vector_id in page
+                ]
+                stale_ids = [vector_id for vector_id in [post_id, *chunk_ids] if vector_id not in current_ids]
+                if not stale_ids:
+                    continue
+                self._with_retries(self.pc_index.delete, ids=stale_ids, namespace=namespace)
+            except Exception as e:
+                print(f"Error deleting stale chunks of post {post_id}: {e}")
 
-                # Add text with metadata
-                vector_store.add_texts(
-                    texts=[full_text],
-                    ids=[row_dict['id']],
-                    metadatas=[metadata]
+    def _select_changed_posts(self, posts):
+        """
+        Compare the prepared posts with their stored content hash and score
+        
+        Args:
+            posts (list): Prepared posts
+        
+        Returns:
+            tuple: The new or edited posts, and the (id, score) of unchanged posts with a new score
+        """
+        stored_posts = self.fetch_post_states([post['post_data']['id'] for post in posts])
+        
+        changed_posts, score_updates = [], []
+        for post in posts:
+            post_data = post['post_data']
+            stored = stored_posts.get(post_data['id'])
+            post['stored'] = stored is not None
+            if stored is None or stored['content_hash'] != post_data['content_hash']:
+                changed_posts.append(post)
+            elif stored['score'] != int(post_data['score']):
+                score_updates.append((post_data['id'], int(post_data['score'])))
+        
+        print(f"{len(changed_posts)} new or edited posts, {len(score_updates)} score updates, "
+              f"{len(posts) - len(changed_posts) - len(score_updates)} unchanged posts")
+        return changed_posts, score_updates
+
+    def fetch_post_states(self, post_ids):
+        """
+        Fetch the content hash and score of already stored posts
+        
+        Args:
+            post_ids (list): Post ids
+        
+        Returns:
+            dict: Content hash and score by post id, posts that are not stored yet are left out
+        """
+        if not post_ids:
+            return {}
+        try:
+            with self._db_connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT id, content_hash, score FROM reddit_posts WHERE id = ANY(%s)",
+                    (list(post_ids),)
                 )
-                
-                # Prepare post data for database
-                post_data = {
-                    'id': row_dict['id'],
-                    'title': row_dict['title'],
-                    'body': row_dict.get('body', ''),
-                    'author': row_dict['author'],
-                    'subreddit': row_dict['subreddit'],
-                    'score': row_dict['score'],
-                    'created': row_dict['created'],
-                    's3_url': s3_url,
-                    'vector_id': f"{namespace}_{row_dict['id']}",
-                    'namespace': namespace,
-                    'comments': row_dict.get('comments', [])
+                return {
+                    post_id: {'content_hash': content_hash, 'score': score}
+                    for post_id, content_hash, score in cursor.fetchall()
                 }
-                
-                # Insert into database
-                self.insert_reddit_article(post_data)
-                
-                print(f"Processed post in {namespace} namespace: {row_dict['title']}")
-            
+        except Exception as e:
+            # Without the stored state every post is processed as new
+            print(f"Error fetching stored posts: {e}")
+            return {}
+
+    def update_post_scores(self, score_updates, namespace):
+        """
+        Update the score of unchanged posts in the Pinecone metadata and in PostgreSQL, without re-embedding them
+        
+        Args:
+            score_updates (list): (post id, score) pairs
+            namespace (str): Pinecone namespace
+        """
+        updated = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.upsert_workers) as executor:
+            future_to_update = {
+                executor.submit(self._update_vector_scores, post_id, score, namespace): (post_id, score)
+                for post_id, score in score_updates
+            }
+            for future in concurrent.futures.as_completed(future_to_update):
+                try:
+                    future.result()
+                    updated.append(future_to_update[future])
+                except Exception as e:
+                    print(f"Error updating the score of post {future_to_update[future][0]} in Pinecone: {e}")
+        
+        if not updated:
+            return
+        try:
+            with self._db_connection() as conn, conn.cursor() as cursor:
+                execute_values(cursor, UPDATE_REDDIT_POST_SCORES, updated, page_size=1000)
+        except Exception as e:
+            print(f"Database score update error: {e}")
+
+    def _update_vector_scores(self, post_id, score, namespace):
+        """
+        Set the score metadata of every vector of a post: its chunks in chunked mode, falling back to the whole-post
+        vector of posts indexed before chunking was enabled
+        
+        Args:
+            post_id (str): Reddit post id
+            score (int): New score
+            namespace (str): Pinecone namespace
+        """
+        vector_ids = [post_id]
+        if self.indexing_mode == 'chunked':
+            vector_ids = [
+                vector_id
+                for page in self.pc_index.list(prefix=f"{post_id}#", namespace=namespace)
+                for vector_id in page
+            ] or vector_ids
+        for vector_id in vector_ids:
+            self._with_retries(self.pc_index.update, id=vector_id, set_metadata={'score': score}, namespace=namespace)
+
+    def embed_texts(self, texts):
+        """
+        Embed texts with one embedding request per batch of `embedding_batch_size` texts
+        
+        Args:
+            texts (list): Texts to embed
+        
+        Returns:
+            list: Embedding of every text, in order
+        """
+        embeddings = []
+        for i in range(0, len(texts), self.embedding_batch_size):
+            batch = texts[i:i + self.embedding_batch_size]
+            embeddings.extend(self._with_retries(self.embeddings.embed_documents, batch))
+        return embeddings
+
+    def upsert_vectors(self, vectors, namespace):
+        """
+        Upsert vectors to Pinecone in parallel batches, retrying failed batches
+        
+        Args:
+            vectors (list): Pinecone vectors with `id`, `values` and `metadata`
+            namespace (str): Pinecone namespace
+        
+        Returns:
+            set: Ids of the vectors whose batch still failed after the retries
+        """
+        failed_ids = set()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.upsert_workers) as executor:
+            future_to_batch = {
+                executor.submit(self._with_retries, self.pc_index.upsert, vectors=batch, namespace=namespace): batch
+                for batch in self._upsert_batches(vectors)
+            }
+            for future in concurrent.futures.as_completed(future_to_batch):
+                batch = future_to_batch[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error upserting {len(batch)} vectors to Pinecone: {e}")
+                    failed_ids.update(vector['id'] for vector in batch)
+        return failed_ids
+
+    def _upsert_batches(self, vectors):
+        """
+        Split vectors into batches under Pinecone's per request vector count and payload size limits
+        """
+        batch, batch_bytes = [], 0
+        for vector in vectors:
+            vector_bytes = 4 * len(vector['values']) + len(json.dumps(vector['metadata'], cls=NumpyEncoder, default=str))
+            if batch and (len(batch) >= self.upsert_batch_size or batch_bytes + vector_bytes > MAX_UPSERT_REQUEST_BYTES):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(vector)
+            batch_bytes += vector_bytes
+        if batch:
+            yield batch
+
+    def _with_retries(self, func, *args, **kwargs):
+        """
+        Call `func`, retrying with exponential backoff when it raises
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                return func(*args, **kwargs)
             except Exception as e:
-                print(f"Error processing post: {e}")
-                # Optionally, print full traceback for debugging
-                import traceback
-                traceback.print_exc()
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_backoff_seconds * 2 ** attempt
+                print(f"Attempt {attempt + 1} failed with {e}, retrying in {delay}s")
+                time.sleep(delay)
 
-    def insert_reddit_article(self, post_data):
+    def _init_db_pool(self):
+        """Initialize the PostgreSQL connection pool and make sure the reddit_posts table exists"""
+        db_pool = psycopg2.pool.ThreadedConnectionPool(
+            minconn=1,
+            maxconn=self.db_pool_size,
+            host=self.db_host,
+            database=self.db_name,
+            user=self.db_user,
+            password=self.db_password,
+            port=self.db_port
+        )
+        conn = db_pool.getconn()
+        try:
+            with conn, conn.cursor() as cursor:
+                cursor.execute(CREATE_TABLES)
+        finally:
+            db_pool.putconn(conn)
+        self.db_pool = db_pool
+
+    @contextmanager
+    def _db_connection(self):
         """
-        Insert Reddit post data into PostgreSQL
+        Borrow a connection from the pool, committing on success and rolling back on error
+        """
+        if self.db_pool is None:
+            self._init_db_pool()
+        conn = self.db_pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.db_pool.putconn(conn)
+
+    def close(self):
+        """Close the pooled database connections and the embedding cache"""
+        if self.db_pool is not None:
+            self.db_pool.closeall()
+            self.db_pool = None
+        print(f"Embedding cache: {self.embedding_cache.stats()}")
+        self.embedding_cache.close()
+
+    def insert_reddit_articles(self, posts, chunks=None):
+        """
+        Bulk insert Reddit posts into PostgreSQL.
+        
+        The posts are loaded into a temporary staging table with one multi-row insert, then merged into
+        reddit_posts with a single set based upsert, all in one transaction on a pooled connection.
+        
+        When chunks are given they replace the stored chunks of the posts in the same transaction.
         
         Args:
-            post_data (dict): Dictionary containing post details
+            posts (list): Dictionaries containing post details
+            chunks (list, optional): Chunk documents of the posts, from `_chunk_post`, None keeps the stored chunks
         
         Returns:
             bool: Success status of insertion
         """
-        conn = None
-        try:
-            conn = psycopg2.connect(
-                host=self.db_host,
-                database=self.db_name,
-                user=self.db_user,
-                password=self.db_password,
-                port=self.db_port
-            )
-            
-            cursor = conn.cursor()
-            
-            # Ensure table exists
-            create_table_query = """
-            CREATE TABLE IF NOT EXISTS reddit_posts (
-                id TEXT PRIMARY KEY,
-                title TEXT,
-                body TEXT,
-                author TEXT,
-                subreddit TEXT,
-                score INTEGER,
-                created_at TIMESTAMP,
-                s3_url TEXT,
-                vector_id TEXT,
-                namespace TEXT,
-                comments JSONB
-            );
-            """
-            cursor.execute(create_table_query)
-            
-            # Insert or update post
-            insert_query = """
-            INSERT INTO reddit_posts 
-            (id, title, body, author, subreddit, score, created_at, s3_url, vector_id, namespace, comments)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT (id) DO UPDATE SET 
-            title = EXCLUDED.title,
-            body = EXCLUDED.body,
-            score = EXCLUDED.score,
-            s3_url = EXCLUDED.s3_url,
-            vector_id = EXCLUDED.vector_id,
-            namespace = EXCLUDED.namespace,
-            comments = EXCLUDED.comments;
-            """
-            
-            # Use the custom JSON encoder to handle NumPy types
-            comments_json = json.dumps(post_data.get('comments', []), cls=NumpyEncoder)
-            
-            cursor.execute(insert_query, (
+        # A post can only be upserted once per statement, the last version of a post wins
+        posts = list({post_data.get('id', ''): post_data for post_data in posts}.values())
+        if not posts:
+            return True
+        
+        rows = [
+            (
                 post_data.get('id', ''),
                 post_data.get('title', ''),
                 post_data.get('body', ''),
@@ -287,18 +699,55 @@ class RedditDataProcessor:
                 post_data.get('s3_url', ''),
                 post_data.get('vector_id', ''),
                 post_data.get('namespace', ''),
-                comments_json
-            ))
-            
-            conn.commit()
+                # Use the custom JSON encoder to handle NumPy types
+                json.dumps(post_data.get('comments', []), cls=NumpyEncoder),
+                post_data.get('content_hash')
+            )
+            for post_data in posts
+        ]
+        
+        try:
+            with self._db_connection() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "CREATE TEMP TABLE reddit_posts_staging (LIKE reddit_posts INCLUDING DEFAULTS) ON COMMIT DROP"
+                )
+                execute_values(
+                    cursor,
+                    f"INSERT INTO reddit_posts_staging ({REDDIT_POSTS_COLUMNS}) VALUES %s",
+                    rows,
+                    page_size=1000
+                )
+                cursor.execute(UPSERT_STAGED_REDDIT_POSTS)
+                if chunks is not None:
+                    cursor.execute(
+                        "DELETE FROM reddit_post_chunks WHERE post_id = ANY(%s)",
+                        ([post_data.get('id', '') for post_data in posts],)
+                    )
+                    execute_values(
+                        cursor,
+                        "INSERT INTO reddit_post_chunks (id, post_id, namespace, chunk_type, chunk_index, content) "
+                        "VALUES %s ON CONFLICT (id) DO UPDATE SET content = EXCLUDED.content",
+                        [
+                            (chunk['id'], chunk['post_id'], chunk['metadata']['namespace'],
+                             chunk['metadata']['chunk_type'], chunk['metadata']['chunk_index'], chunk['text'])
+                            for chunk in {chunk['id']: chunk for chunk in chunks}.values()
+                        ],
+                        page_size=1000
+                    )
             return True
         
         except Exception as e:
             print(f"Database insertion error: {e}")
-            if conn:
-                conn.rollback()
             return False
+
+    def insert_reddit_article(self, post_data):
+        """
+        Insert Reddit post data into PostgreSQL
         
-        finally:
-            if conn:
-                conn.close()
\ No newline at end of file
+        Args:
+            post_data (dict): Dictionary containing post details
+        
+        Returns:
+            bool: Success status of insertion
+        """
+        return self.insert_reddit_articles([post_data])
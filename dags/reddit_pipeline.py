@@ -1,95 +1,280 @@
 import os
-import time
+import itertools
+import collections
 import pandas as pd
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from airflow.utils.dates import days_ago
+from airflow.utils.task_group import TaskGroup
 
 # Import custom modules
+from category_registry import load_categories
+from comment_expansion import CommentBudget
 from reddit_scrapper import RedditScraper
 from reddit_data_processor import RedditDataProcessor
+from scrape_artifacts import iter_posts_artifact, write_posts_artifact
+from scrape_checkpoints import checkpoint_after, get_checkpoint_store
+from streaming_pipeline import StreamingPipeline
 
-def scrape_reddit(**kwargs):
+# Product categories to ingest, one task group each, writing to the category's Pinecone namespace
+CATEGORIES = load_categories()
+
+# 'batch' maps scrape_task over the subreddits of a category and process_task over the scraped chunks, 'streaming'
+# runs a single task per category in which the processing stages consume the posts while they are being scraped
+PIPELINE_MODE = os.getenv('REDDIT_PIPELINE_MODE', 'batch')
+
+# Airflow pools limiting the concurrent tasks calling the external APIs, created by airflow-init
+REDDIT_API_POOL = os.getenv('REDDIT_API_POOL', 'reddit_api')
+PROCESSING_POOL = os.getenv('PROCESSING_POOL', 'embedding_api')
+
+# Local directory or s3://bucket/prefix of the scraped chunks handed from scrape_task to process_task, use S3 when
+# the tasks run on several workers
+SCRAPE_ARTIFACT_DIR = os.getenv('SCRAPE_ARTIFACT_DIR', 'output')
+
+# 'full' re-scrapes the top posts of the year, 'incremental' scrapes the new posts since the checkpoint of the
+# previous run and refreshes the posts younger than the refresh window
+SCRAPE_MODE = os.getenv('REDDIT_SCRAPE_MODE', 'full')
+REFRESH_WINDOW = timedelta(hours=float(os.getenv('SCRAPE_REFRESH_WINDOW_HOURS', 48)))
+
+# Cron expression or preset, incremental scraping is meant to run on a schedule
+SCHEDULE_INTERVAL = os.getenv('REDDIT_PIPELINE_SCHEDULE') or None
+
+def iter_scraped_posts(scraper, subreddit, scrape_config, checkpoint=None):
     """
-    Scrape Reddit data using RedditScraper
+    Posts of a subreddit in the configured scrape mode
     """
-    # Initialize scraper
-    scraper = RedditScraper()
+    if SCRAPE_MODE == 'incremental':
+        return scraper.iter_new_posts(
+            subreddit,
+            checkpoint=checkpoint,
+            refresh_window=REFRESH_WINDOW,
+            limit=scrape_config['limit'],
+            comments_limit=scrape_config['comments_limit']
+        )
+    return scraper.iter_subreddit(
+        subreddit,
+        sort_by=scrape_config['sort_by'],
+        time_filter=scrape_config['time_filter'],
+        limit=scrape_config['limit'],
+        comments_limit=scrape_config['comments_limit']
+    )
+
+def new_scraper(scrape_config):
+    """
+    Scraper of a category, expanding the nested replies within the `comment_expansion` budget when one is set
+    """
+    return RedditScraper(comment_budget=CommentBudget.from_config(scrape_config.get('comment_expansion')))
+
+def checkpoint_key(namespace, subreddit):
+    """
+    Checkpoints are kept per category, a subreddit shared by two categories is scraped independently by each
+    """
+    return f"{namespace}:{subreddit}"
+
+def scrape_subreddit(category, subreddit, **kwargs):
+    """
+    Scrape one subreddit of a category, scrape_task is mapped over the subreddits of the category.
     
-    # Subreddits to scrape
-    subreddits = ['HeadphoneAdvice']
+    The posts are saved as Parquet chunk artifacts of `chunk_size` posts while they are scraped, process_task is
+    mapped over the chunks so they are processed in parallel across the workers.
     
-    # Scraping configuration
-    scrape_config = {
-        'sort_by': 'top',
-        'time_filter': 'year',
-        'limit': 1000
-    }
+    Args:
+        category (dict): Category of the registry, with its namespace, scrape settings and chunk size
+        subreddit (str): Subreddit to scrape
+    
+    Returns:
+        dict: The checkpoint key, the paths of the chunk artifacts and, in incremental mode, the new checkpoint
+    """
+    namespace = category['namespace']
+    scrape_config = category['scrape']
+    
+    # Initialize scraper
+    scraper = new_scraper(scrape_config)
+    # Posts per chunk artifact, one process_task per chunk
+    chunk_size = category['chunk_size']
+    
+    incremental = SCRAPE_MODE == 'incremental'
+    key = checkpoint_key(namespace, subreddit)
+    checkpoint = new_checkpoint = get_checkpoint_store().load(key) if incremental else None
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     
     try:
-        # Use concurrent scraping method
-        scraped_data = scraper.scrape_multiple_subreddits_concurrent(
-            subreddits,
-            sort_by=scrape_config['sort_by'],
-            time_filter=scrape_config['time_filter'],
-            limit=scrape_config['limit']
-        )
-        
-        # Save full dataset
-        scraper.save_to_file(
-            scraped_data, 
-            base_filename='multi_subreddit_posts', 
-            output_dir='output', 
-            formats=['csv', 'json']
-        )
+        posts = iter_scraped_posts(scraper, subreddit, scrape_config, checkpoint)
+        artifact_paths = []
+        while batch := list(itertools.islice(posts, chunk_size)):
+            if incremental:
+                new_checkpoint = checkpoint_after(new_checkpoint, batch)
+            # Only the path of the chunk goes through XCom
+            artifact_paths.append(write_posts_artifact(
+                pd.DataFrame(batch),
+                f"{SCRAPE_ARTIFACT_DIR.rstrip('/')}/{namespace}_{subreddit}_{timestamp}"
+                f"_part-{len(artifact_paths):04d}.parquet",
+                row_group_size=chunk_size
+            ))
+        print(f"Saved r/{subreddit} of {category['name']} in {len(artifact_paths)} chunk artifacts")
         
-        return scraped_data
+        return {'checkpoint_key': key, 'artifact_paths': artifact_paths, 'checkpoint': new_checkpoint}
     
     except Exception as e:
         print(f"Error in scraping execution: {e}")
         raise
 
-def process_reddit_data(**kwargs):
+def list_chunk_artifacts(scrape_task_id, namespace, **kwargs):
     """
-    Process scraped Reddit data using RedditDataProcessor
+    Flatten the chunk artifacts of every mapped scrape_task of a category into the arguments of its mapped
+    process_task
     """
-    # Pull scraped data from XCom
-    ti = kwargs['ti']
-    scraped_data = ti.xcom_pull(task_ids='scrape_task')
+    scrape_results = kwargs['ti'].xcom_pull(task_ids=scrape_task_id) or []
+    return [
+        {'artifact_path': artifact_path, 'namespace': namespace}
+        for result in scrape_results if result
+        for artifact_path in result['artifact_paths']
+    ]
+
+def process_chunk(artifact_path, namespace, **kwargs):
+    """
+    Process one chunk artifact into the namespace of its category using RedditDataProcessor, process_task is mapped
+    over the chunks
+    """
+    # Initialize processor
+    processor = RedditDataProcessor()
+    failed_post_ids = set()
+    
+    try:
+        for chunk in iter_posts_artifact(artifact_path):
+            failed_post_ids |= processor.process_reddit_data(chunk, namespace)
+        # save_checkpoints keeps the checkpoint of the subreddit before the posts that were not stored
+        return {'artifact_path': artifact_path, 'failed_post_ids': sorted(failed_post_ids)}
     
-    if scraped_data is None or scraped_data.empty:
-        print("No data to process")
+    except Exception as e:
+        print(f"Error in processing execution: {e}")
+        raise
+    
+    finally:
+        processor.close()
+
+def save_checkpoints(scrape_task_id, process_task_id, **kwargs):
+    """
+    Incremental mode: once every chunk of the category is processed, the next run starts from the newest post of
+    this one that was stored
+    """
+    if SCRAPE_MODE != 'incremental':
         return
+    ti = kwargs['ti']
+    scrape_results = ti.xcom_pull(task_ids=scrape_task_id) or []
+    failed_post_ids = {
+        result['artifact_path']: set(result['failed_post_ids'])
+        for result in ti.xcom_pull(task_ids=process_task_id) or [] if result
+    }
+    checkpoints = {}
+    for result in scrape_results:
+        if not result or not result['checkpoint']:
+            continue
+        checkpoint = stored_checkpoint(result, failed_post_ids)
+        if checkpoint is not None:
+            checkpoints[result['checkpoint_key']] = checkpoint
+    if checkpoints:
+        get_checkpoint_store().save(checkpoints)
+
+def stored_checkpoint(scrape_result, failed_post_ids):
+    """
+    Checkpoint of a scraped subreddit once its chunks are processed: the scraped checkpoint when every post was
+    stored, otherwise the newest post older than every post that was not. A chunk without a process_task result
+    was not stored at all.
     
-    # Initialize processor
+    Args:
+        scrape_result (dict): Result of scrape_subreddit
+        failed_post_ids (dict): Ids of the posts that could not be stored, by chunk artifact path
+    
+    Returns:
+        dict: The checkpoint to save, None when no post can be skipped by the next run
+    """
+    artifact_paths = scrape_result['artifact_paths']
+    if all(failed_post_ids.get(path) == set() for path in artifact_paths):
+        return scrape_result['checkpoint']
+    
+    posts, failed = [], set()
+    for path in artifact_paths:
+        for chunk in iter_posts_artifact(path, columns=['id', 'created_utc']):
+            posts.extend(chunk.to_dict('records'))
+            failed.update(failed_post_ids[path] if path in failed_post_ids else chunk['id'])
+    return checkpoint_after(None, posts, failed)
+
+def scrape_and_process_reddit_data(category, **kwargs):
+    """
+    Streaming mode: scrape the subreddits of a category and process the posts concurrently.
+
+    The scraper yields posts into batches of `streaming_batch_size`, and each batch goes through the prepare, embed
+    and store stages of RedditDataProcessor. Each stage runs in its own thread, with bounded queues between them.
+    """
+    namespace = category['namespace']
+    scrape_config = category['scrape']
+    batch_size = category['streaming_batch_size']
+    queue_size = 2
+    
+    scraper = new_scraper(scrape_config)
     processor = RedditDataProcessor()
+    checkpoint_store = get_checkpoint_store()
+    # Incremental mode: id and creation time of the posts scraped from every subreddit, by checkpoint key
+    scraped_posts = collections.defaultdict(list)
+    failed_post_ids = set()
     
-    # Process data in larger chunks
-    scrape_config = {
-        'chunk_size': 250
-    }
+    def scraped_batches():
+        for subreddit in category['subreddits']:
+            incremental = SCRAPE_MODE == 'incremental'
+            key = checkpoint_key(namespace, subreddit)
+            checkpoint = checkpoint_store.load(key) if incremental else None
+            posts = iter_scraped_posts(scraper, subreddit, scrape_config, checkpoint)
+            try:
+                while batch := list(itertools.islice(posts, batch_size)):
+                    if incremental:
+                        scraped_posts[key].extend(
+                            {'id': post['id'], 'created_utc': post['created_utc']} for post in batch
+                        )
+                    yield pd.DataFrame(batch)
+            except Exception as e:
+                # The posts already yielded stay processed, the other subreddits are still scraped. The checkpoint
+                # stays where it was, the older posts that were not reached are scraped by the next run
+                print(f"Error scraping {subreddit}: {e}")
+                scraped_posts.pop(key, None)
+    
+    pipeline = StreamingPipeline(
+        [
+            ('prepare', lambda dataframe: processor.prepare_batch(dataframe, namespace)),
+            ('embed', processor.embed_batch),
+            ('store', lambda batch: failed_post_ids.update(processor.store_batch(batch))),
+        ],
+        queue_size=queue_size
+    )
     
     try:
-        for i in range(0, len(scraped_data), scrape_config['chunk_size']):
-            chunk = scraped_data.iloc[i:i+scrape_config['chunk_size']]
-            
-            print(f"Processing chunk {i//scrape_config['chunk_size'] + 1}")
-            processor.process_reddit_data(chunk)
-            
-            # Reduced delay between chunks
-            time.sleep(1)
+        stats = pipeline.run(scraped_batches())
+        print(f"Streaming pipeline finished in {stats.pop('wall_seconds'):.1f}s, stages: {stats}")
+        
+        # Incremental mode: the next run starts from the newest post stored by this one, before any post that was
+        # not. The checkpoint store never moves a checkpoint back.
+        checkpoints = {
+            key: checkpoint
+            for key, posts in scraped_posts.items()
+            if (checkpoint := checkpoint_after(None, posts, failed_post_ids)) is not None
+        }
+        if checkpoints:
+            checkpoint_store.save(checkpoints)
     
     except Exception as e:
-        print(f"Error in processing execution: {e}")
+        print(f"Error in streaming execution: {e}")
         raise
+    
+    finally:
+        processor.close()
 
 # DAG configuration
 with DAG(
     'reddit_data_pipeline',
     start_date=days_ago(1),
-    schedule_interval=None,
+    schedule_interval=SCHEDULE_INTERVAL,
     dagrun_timeout=timedelta(minutes=500),
     # execution_timeout=timedelta(minutes=200),
     catchup=False,
@@ -101,17 +286,52 @@ with DAG(
     }
 ) as dag:
     
-    scrape_task = PythonOperator(
-        task_id='scrape_task',
-        python_callable=scrape_reddit,
-        provide_context=True
-    )
-    
-    process_task = PythonOperator(
-        task_id='process_task',
-        python_callable=process_reddit_data,
-        provide_context=True
-    )
-    
-    # Set task dependencies
-    scrape_task >> process_task
+    # Every category is an independent pipeline, a failing category does not hold back the others
+    for category in CATEGORIES:
+        with TaskGroup(group_id=category['name']):
+            
+            if PIPELINE_MODE == 'streaming':
+                scrape_and_process_task = PythonOperator(
+                    task_id='scrape_and_process_task',
+                    python_callable=scrape_and_process_reddit_data,
+                    op_kwargs={'category': category},
+                    provide_context=True
+                )
+            
+            else:
+                # One scrape task per subreddit, the Reddit API pool caps how many run at once across categories
+                scrape_task = PythonOperator.partial(
+                    task_id='scrape_task',
+                    python_callable=scrape_subreddit,
+                    pool=REDDIT_API_POOL
+                ).expand(op_kwargs=[
+                    {'category': category, 'subreddit': subreddit} for subreddit in category['subreddits']
+                ])
+                
+                # The chunks of the subreddits that were scraped are processed even when another subreddit failed
+                list_chunks_task = PythonOperator(
+                    task_id='list_chunks_task',
+                    python_callable=list_chunk_artifacts,
+                    op_kwargs={'scrape_task_id': scrape_task.task_id, 'namespace': category['namespace']},
+                    trigger_rule='all_done'
+                )
+                
+                # One process task per chunk artifact, the processing pool caps the concurrent OpenAI and Pinecone
+                # load
+                process_task = PythonOperator.partial(
+                    task_id='process_task',
+                    python_callable=process_chunk,
+                    pool=PROCESSING_POOL
+                ).expand(op_kwargs=list_chunks_task.output)
+                
+                # The checkpoints of the subreddits whose chunks were stored move forward even when another chunk
+                # failed, failed scrapes and chunks hold back the checkpoint of their subreddit
+                save_checkpoints_task = PythonOperator(
+                    task_id='save_checkpoints_task',
+                    python_callable=save_checkpoints,
+                    op_kwargs={'scrape_task_id': scrape_task.task_id, 'process_task_id': process_task.task_id},
+                    trigger_rule='all_done'
+                )
+                
+                # Set task dependencies
+                scrape_task >> list_chunks_task >> process_task >> save_checkpoints_task
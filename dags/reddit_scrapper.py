@@ -1,12 +1,22 @@
 import os
+import itertools
+import threading
+import collections
 import praw
+import requests
 import pandas as pd
 import datetime as dt
-from typing import List, Optional, Dict
+from typing import Dict, Iterator, List, Optional
 from dotenv import load_dotenv
 from praw.models import MoreComments
+from prawcore.exceptions import TooManyRequests
 import concurrent.futures
-from typing import List
+
+from comment_expansion import CommentBudget, expand_comments
+from rate_limiter import TokenBucket
+
+# Posts per listing request, Reddit pages its listings 100 posts at a time
+LISTING_PAGE_SIZE = 100
 
 class RedditScraper:
     """
@@ -25,7 +35,11 @@ class RedditScraper:
         user_agent: Optional[str] = None,
         username: Optional[str] = None,
         password: Optional[str] = None,
-        load_env: bool = True
+        load_env: bool = True,
+        comment_workers: int = 8,
+        requests_per_minute: float = 100,
+        max_rate_limit_retries: int = 3,
+        comment_budget: Optional[CommentBudget] = None
     ):
         """
         Initialize the Reddit Scraper with flexible authentication options.
@@ -37,6 +51,12 @@ class RedditScraper:
             username (str, optional): Reddit username
             password (str, optional): Reddit password
             load_env (bool, optional): Whether to load environment variables. Defaults to True.
+            comment_workers (int, optional): Number of comment trees fetched concurrently. Defaults to 8.
+            requests_per_minute (float, optional): Request rate until Reddit's rate limit headers are seen.
+                Defaults to 100, the OAuth client limit.
+            max_rate_limit_retries (int, optional): Retries of an API call rejected with a 429. Defaults to 3.
+            comment_budget (CommentBudget, optional): Expand the nested replies of every post within this budget,
+                instead of taking the first `comments_limit` top-level comments. Defaults to None.
         """
         # Load environment variables if specified
         if load_env:
@@ -51,6 +71,18 @@ class RedditScraper:
             'password': password or os.getenv('REDDIT_PASSWORD')
         }
 
+        # One rate limiter shared by every thread, Reddit counts the requests of all of them against one budget
+        self.comment_workers = comment_workers
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.comment_budget = comment_budget
+        self.rate_limiter = TokenBucket(rate=requests_per_minute / 60, capacity=max(comment_workers, 1))
+        self._thread_local = threading.local()
+        # Resolves the MoreComments placeholders of a reply level concurrently, apart from the comment workers that
+        # wait for them
+        self._expansion_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(comment_workers, 1), thread_name_prefix='expand-comments'
+        ) if comment_budget else None
+
         # Authenticate Reddit instance
         self.reddit = self._authenticate()
 
@@ -73,8 +105,14 @@ class RedditScraper:
             if key not in cleaned_credentials:
                 raise ValueError(f"Missing essential Reddit API credential: {key.upper()}")
 
+        # Every response updates the shared rate limiter from its rate limit headers
+        session = requests.Session()
+        session.hooks['response'].append(
+            lambda response, *args, **kwargs: self.rate_limiter.update_from_headers(response.headers)
+        )
+
         try:
-            return praw.Reddit(**cleaned_credentials)
+            return praw.Reddit(**cleaned_credentials, requestor_kwargs={'session': session})
         except Exception as e:
             raise ValueError(f"Authentication failed: {str(e)}")
 
@@ -88,39 +126,14 @@ class RedditScraper:
         comments_limit: int = 25
     ) -> pd.DataFrame:
         try:
-            subreddit = self.reddit.subreddit(subreddit_name)
-            
-            # Use generator methods to reduce memory consumption
-            sorting_methods = {
-                'top': subreddit.top(time_filter=time_filter, limit=limit),
-                'hot': subreddit.hot(limit=limit),
-                'new': subreddit.new(limit=limit),
-                'rising': subreddit.rising(limit=limit)
-            }
-            
-            posts = sorting_methods.get(sort_by.lower())
-            if not posts:
-                raise ValueError(f"Invalid sort method: {sort_by}")
-
-            # Use list comprehension for faster data collection
-            topics_data = [
-                {
-                    "title": submission.title,
-                    "score": submission.score,
-                    "id": submission.id,
-                    "url": submission.url,
-                    "comments_num": submission.num_comments,
-                    "created": dt.datetime.fromtimestamp(submission.created),
-                    "author": str(submission.author) if submission.author else "Deleted",
-                    "body": submission.selftext or "No body text",
-                    "subreddit": subreddit_name,
-                    "comments": (
-                        self._extract_comments(submission, comments_limit) 
-                        if include_comments else []
-                    )
-                }
-                for submission in posts
-            ][:limit]  # Ensure we don't exceed limit
+            topics_data = list(self.iter_subreddit(
+                subreddit_name,
+                sort_by=sort_by,
+                time_filter=time_filter,
+                limit=limit,
+                include_comments=include_comments,
+                comments_limit=comments_limit
+            ))
 
             df = pd.DataFrame(topics_data)
             print(f"Scraped {len(df)} posts from r/{subreddit_name}")
@@ -130,6 +143,203 @@ class RedditScraper:
             print(f"Error scraping {subreddit_name}: {e}")
             return pd.DataFrame()
 
+    def iter_subreddit(
+        self,
+        subreddit_name: str,
+        sort_by: str = 'top',
+        time_filter: str = 'year',
+        limit: int = 1000,
+        include_comments: bool = True,
+        comments_limit: int = 25
+    ) -> Iterator[Dict]:
+        """
+        Yield the posts of a subreddit one by one, as the listing is paged in from the API
+        
+        Args:
+            subreddit_name: Subreddit to scrape
+            sort_by: 'top', 'hot', 'new' or 'rising'
+            time_filter: Time filter of the 'top' listing
+            limit: Maximum number of posts
+            include_comments: Whether to fetch the comments of every post
+            comments_limit: Maximum number of comments per post
+        """
+        subreddit = self.reddit.subreddit(subreddit_name)
+        
+        # Use generator methods to reduce memory consumption
+        sorting_methods = {
+            'top': lambda: subreddit.top(time_filter=time_filter, limit=limit),
+            'hot': lambda: subreddit.hot(limit=limit),
+            'new': lambda: subreddit.new(limit=limit),
+            'rising': lambda: subreddit.rising(limit=limit)
+        }
+        
+        listing = sorting_methods.get(sort_by.lower())
+        if not listing:
+            raise ValueError(f"Invalid sort method: {sort_by}")
+
+        # Ensure we don't exceed limit
+        yield from self._iter_posts(
+            itertools.islice(self._rate_limited_listing(listing()), limit),
+            subreddit_name,
+            include_comments,
+            comments_limit
+        )
+
+    def iter_new_posts(
+        self,
+        subreddit_name: str,
+        checkpoint: Optional[Dict] = None,
+        refresh_window: dt.timedelta = dt.timedelta(days=2),
+        limit: int = 1000,
+        include_comments: bool = True,
+        comments_limit: int = 25
+    ) -> Iterator[Dict]:
+        """
+        Incrementally scrape a subreddit: yield the posts of the `new` listing, newest first, until the checkpoint
+        of the previous scrape.
+        
+        Posts created within `refresh_window` are yielded again even when they are older than the checkpoint, so
+        their score and comments are refreshed while they are still active. Posts that did not change are skipped
+        by the processor.
+        
+        Args:
+            subreddit_name: Subreddit to scrape
+            checkpoint: `created_utc` and `post_id` of the newest post of the previous scrape, None on the first
+                scrape
+            refresh_window: Age under which already scraped posts are fetched again
+            limit: Maximum number of posts, Reddit listings stop at 1000 posts
+            include_comments: Whether to fetch the comments of every post
+            comments_limit: Maximum number of comments per post
+        """
+        cutoff = (dt.datetime.now(dt.timezone.utc) - refresh_window).timestamp()
+        if checkpoint is not None:
+            cutoff = min(cutoff, checkpoint['created_utc'])
+        
+        def unseen_submissions():
+            for submission in self._rate_limited_listing(self.reddit.subreddit(subreddit_name).new(limit=limit)):
+                if checkpoint is None:
+                    yield submission
+                    continue
+                if submission.created_utc < cutoff:
+                    break
+                # The checkpoint post ends the scrape unless the refresh window reaches past it
+                if submission.id == checkpoint['post_id'] and cutoff >= checkpoint['created_utc']:
+                    break
+                yield submission
+        
+        yield from self._iter_posts(unseen_submissions(), subreddit_name, include_comments, comments_limit)
+
+    def _iter_posts(
+        self,
+        submissions: Iterator,
+        subreddit_name: str,
+        include_comments: bool,
+        comments_limit: int
+    ) -> Iterator[Dict]:
+        posts = (self._post_data(submission, subreddit_name) for submission in submissions)
+        if not include_comments:
+            yield from posts
+            return
+
+        # The comment trees are fetched concurrently while the listing is paged in, the posts are still yielded in
+        # listing order and at most two fetches per worker are in flight
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.comment_workers) as executor:
+            pending = collections.deque()
+            for post in posts:
+                pending.append((post, executor.submit(self._fetch_comments, post['id'], comments_limit)))
+                if len(pending) >= 2 * self.comment_workers:
+                    yield self._with_comments(*pending.popleft())
+            while pending:
+                yield self._with_comments(*pending.popleft())
+
+    @staticmethod
+    def _post_data(submission, subreddit_name: str) -> Dict:
+        return {
+            "title": submission.title,
+            "score": submission.score,
+            "id": submission.id,
+            "url": submission.url,
+            "comments_num": submission.num_comments,
+            "created": dt.datetime.fromtimestamp(submission.created),
+            # Epoch seconds, the incremental scrape checkpoint
+            "created_utc": submission.created_utc,
+            "author": str(submission.author) if submission.author else "Deleted",
+            "body": submission.selftext or "No body text",
+            "subreddit": subreddit_name,
+            "comments": []
+        }
+
+    @staticmethod
+    def _with_comments(post: Dict, future: concurrent.futures.Future) -> Dict:
+        try:
+            post["comments"] = future.result()
+        except Exception as e:
+            print(f"Error fetching comments of post {post['id']}: {e}")
+        return post
+
+    def _thread_reddit(self) -> praw.Reddit:
+        """
+        Reddit instance of the calling thread, PRAW instances are not thread safe
+        """
+        if not hasattr(self._thread_local, 'reddit'):
+            self._thread_local.reddit = self._authenticate()
+        return self._thread_local.reddit
+
+    def _fetch_comments(self, post_id: str, comments_limit: int) -> List[Dict]:
+        """
+        Fetch the comment tree of a post, every API call waiting for the shared rate limiter
+        """
+        submission = self._thread_reddit().submission(id=post_id)
+        if self.comment_budget:
+            # The nested replies keep their place in the tree
+            return [
+                {**self._comment_data(comment), 'parent_id': comment.parent_id, 'depth': depth}
+                for comment, depth in expand_comments(
+                    submission, self.comment_budget, self._rate_limited,
+                    executor=self._expansion_executor, reddit=self._thread_reddit
+                )
+            ]
+        return self._rate_limited(lambda: self._extract_comments(submission, comments_limit))
+
+    def _rate_limited_listing(self, listing: Iterator) -> Iterator:
+        """
+        Page through a listing, every page request waiting for the shared rate limiter like the comment fetches
+        """
+        iterator = iter(listing)
+        for index in itertools.count():
+            try:
+                # The listing requests its next page when the previous one is used up
+                if index % LISTING_PAGE_SIZE == 0:
+                    submission = self._rate_limited(lambda: next(iterator))
+                else:
+                    submission = next(iterator)
+            except StopIteration:
+                return
+            yield submission
+
+    def _rate_limited(self, call):
+        """
+        Run an API call once the shared rate limiter allows it, waiting out 429 responses
+        """
+        for attempt in range(self.max_rate_limit_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                return call()
+            except TooManyRequests as e:
+                if attempt == self.max_rate_limit_retries:
+                    raise
+                retry_after = float(e.retry_after or 2 ** attempt)
+                print(f"Rate limited, retrying in {retry_after}s")
+                self.rate_limiter.pause(retry_after)
+
+    @staticmethod
+    def _comment_data(comment) -> Dict:
+        return {
+            'text': comment.body,
+            'score': comment.score,
+            'author': str(comment.author)
+        }
+
     def _extract_comments(self, submission, comments_limit=5):
         """
         Efficiently extract comments with minimal overhead
@@ -137,16 +347,14 @@ class RedditScraper:
         try:
             # submission.comments.replace_more(limit=0)
             a = [
-                {
-                    'text': comment.body,
-                    'score': comment.score,
-                    'author': str(comment.author)
-                }
+                self._comment_data(comment)
                 for comment in submission.comments[:comments_limit]
                 if not isinstance(comment, MoreComments)
             ]
             # print(a)
             return a
+        except TooManyRequests:
+            raise
         except Exception:
             return []
 
@@ -183,6 +391,9 @@ class RedditScraper:
                     dataframe.to_excel(filename, index=False)
                 elif fmt == 'json':
                     dataframe.to_json(filename, orient='records')
+                elif fmt == 'parquet':
+                    # Keeps the comments as a nested column, unlike CSV
+                    dataframe.to_parquet(filename, index=False, compression='zstd')
                 
                 print(f"Data saved to {fmt.upper()}: {filename}")
 
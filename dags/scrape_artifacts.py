@@ -0,0 +1,79 @@
+import os
+import tempfile
+
+import boto3
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# One row group per process_reddit_data call, so a batch is read without decoding the rest of the file
+ROW_GROUP_SIZE = 250
+
+
+def write_posts_artifact(dataframe, path, s3_client=None, row_group_size=ROW_GROUP_SIZE, compression='zstd'):
+    """
+    Write scraped posts to a Parquet file, with the comments kept as a nested list<struct> column
+
+    Args:
+        dataframe (pd.DataFrame): Scraped posts
+        path (str): Local file path or s3://bucket/key url of the artifact
+        s3_client: boto3 S3 client for s3 urls, a default client is created when missing
+        row_group_size (int): Posts per row group, the unit `iter_posts_artifact` reads
+        compression (str): Parquet compression codec
+
+    Returns:
+        str: The artifact path, small enough to be passed between tasks through XCom
+    """
+    table = pa.Table.from_pandas(dataframe, preserve_index=False)
+
+    if not path.startswith('s3://'):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        pq.write_table(table, path, row_group_size=row_group_size, compression=compression)
+        return path
+
+    buffer = pa.BufferOutputStream()
+    pq.write_table(table, buffer, row_group_size=row_group_size, compression=compression)
+    bucket, key = _split_s3_url(path)
+    (s3_client or boto3.client('s3')).put_object(
+        Bucket=bucket, Key=key, Body=buffer.getvalue().to_pybytes(), ContentType='application/vnd.apache.parquet'
+    )
+    return path
+
+
+def iter_posts_artifact(path, s3_client=None, columns=None):
+    """
+    Read a posts artifact back one row group at a time
+
+    Local files are memory-mapped, S3 artifacts are downloaded to a temporary file first and removed once read.
+
+    Args:
+        path (str): Path returned by `write_posts_artifact`
+        s3_client: boto3 S3 client for s3 urls, a default client is created when missing
+        columns (list): Columns to read, all of them by default
+
+    Yields:
+        pd.DataFrame: The posts of a row group, with the comments of every post as an array of dictionaries
+    """
+    if not path.startswith('s3://'):
+        yield from _iter_row_groups(path, columns)
+        return
+
+    bucket, key = _split_s3_url(path)
+    fd, local_path = tempfile.mkstemp(suffix='.parquet')
+    os.close(fd)
+    try:
+        (s3_client or boto3.client('s3')).download_file(bucket, key, local_path)
+        yield from _iter_row_groups(local_path, columns)
+    finally:
+        os.remove(local_path)
+
+
+def _iter_row_groups(path, columns=None):
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    for i in range(parquet_file.num_row_groups):
+        yield parquet_file.read_row_group(i, columns=columns).to_pandas()
+
+
+def _split_s3_url(s3_url):
+    bucket, key = s3_url.removeprefix('s3://').split('/', 1)
+    return bucket, key
@@ -0,0 +1,143 @@
+import json
+import math
+import os
+from contextlib import contextmanager
+
+import psycopg2
+
+CREATE_CHECKPOINTS_TABLE = """
+CREATE TABLE IF NOT EXISTS reddit_scrape_checkpoints (
+    subreddit TEXT PRIMARY KEY,
+    created_utc DOUBLE PRECISION NOT NULL,
+    post_id TEXT NOT NULL,
+    updated_at TIMESTAMP DEFAULT now()
+);
+"""
+
+# A checkpoint only moves forward, a late run of an older scrape cannot move it back
+UPSERT_CHECKPOINT = """
+INSERT INTO reddit_scrape_checkpoints (subreddit, created_utc, post_id) VALUES (%s, %s, %s)
+ON CONFLICT (subreddit) DO UPDATE SET
+created_utc = EXCLUDED.created_utc,
+post_id = EXCLUDED.post_id,
+updated_at = now()
+WHERE EXCLUDED.created_utc >= reddit_scrape_checkpoints.created_utc;
+"""
+
+
+def checkpoint_after(checkpoint, posts, failed_post_ids=()):
+    """
+    Checkpoint of a subreddit once `posts` are processed: the newest post, by `created_utc`, that is older than
+    every post that could not be stored, so the next scrape reaches the failed posts again
+
+    Args:
+        checkpoint (dict): Current checkpoint with `created_utc` and `post_id`, None before the first scrape
+        posts (list): Scraped posts of the subreddit
+        failed_post_ids (set): Ids of the posts that could not be stored
+
+    Returns:
+        dict: The new checkpoint, the current one when no stored post is newer
+    """
+    oldest_failed = min((post['created_utc'] for post in posts if post['id'] in failed_post_ids), default=math.inf)
+    for post in posts:
+        if post['created_utc'] >= oldest_failed:
+            continue
+        if checkpoint is None or post['created_utc'] > checkpoint['created_utc']:
+            checkpoint = {'created_utc': post['created_utc'], 'post_id': post['id']}
+    return checkpoint
+
+
+class FileCheckpointStore:
+    """
+    Scrape checkpoints of every subreddit in a local JSON file, for single worker deployments
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self, subreddit):
+        return self._read().get(subreddit)
+
+    def save(self, checkpoints):
+        """
+        Args:
+            checkpoints (dict): Checkpoint of every scraped subreddit
+        """
+        stored = self._read()
+        for subreddit, checkpoint in checkpoints.items():
+            if subreddit not in stored or checkpoint['created_utc'] >= stored[subreddit]['created_utc']:
+                stored[subreddit] = checkpoint
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # Replace the file in one step, a crash mid-write keeps the previous checkpoints
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(stored, f)
+        os.replace(temp_path, self.path)
+
+    def _read(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path) as f:
+            return json.load(f)
+
+
+class PostgresCheckpointStore:
+    """
+    Scrape checkpoints of every subreddit in the reddit_scrape_checkpoints table, shared by all the workers
+    """
+
+    def __init__(self, **connection_params):
+        self.connection_params = connection_params
+        self._table_created = False
+
+    def load(self, subreddit):
+        with self._connection() as conn, conn.cursor() as cursor:
+            cursor.execute(
+                "SELECT created_utc, post_id FROM reddit_scrape_checkpoints WHERE subreddit = %s", (subreddit,)
+            )
+            row = cursor.fetchone()
+        return {'created_utc': row[0], 'post_id': row[1]} if row else None
+
+    def save(self, checkpoints):
+        with self._connection() as conn, conn.cursor() as cursor:
+            for subreddit, checkpoint in checkpoints.items():
+                cursor.execute(UPSERT_CHECKPOINT, (subreddit, checkpoint['created_utc'], checkpoint['post_id']))
+
+    @contextmanager
+    def _connection(self):
+        """
+        Open a connection, committing on success and rolling back on error
+        """
+        conn = psycopg2.connect(**self.connection_params)
+        try:
+            with conn:
+                if not self._table_created:
+                    with conn.cursor() as cursor:
+                        cursor.execute(CREATE_CHECKPOINTS_TABLE)
+                    self._table_created = True
+                yield conn
+        finally:
+            conn.close()
+
+
+def get_checkpoint_store():
+    """
+    Checkpoint store selected by SCRAPE_CHECKPOINT_BACKEND: 'file' (default) at SCRAPE_CHECKPOINT_PATH, or
+    'postgres' with the POSTGRES_* connection settings of the processor
+    """
+    backend = os.getenv('SCRAPE_CHECKPOINT_BACKEND', 'file')
+    if backend == 'postgres':
+        return PostgresCheckpointStore(
+            host=os.getenv("POSTGRES_HOSTNAME"),
+            database=os.getenv("POSTGRES_DB"),
+            user=os.getenv("POSTGRES_USER"),
+            password=os.getenv("POSTGRES_PASSWORD"),
+            port=os.getenv("POSTGRES_PORT")
+        )
+    if backend == 'file':
+        return FileCheckpointStore(
+            os.getenv('SCRAPE_CHECKPOINT_PATH', os.path.join('output', 'scrape_checkpoints.json'))
+        )
+    raise ValueError(f"Unknown scrape checkpoint backend {backend}, expected 'file' or 'postgres'")
@@ -47,7 +47,7 @@ def main():
             chunk = scraped_data.iloc[i:i+scrape_config['chunk_size']]
             
             print(f"Processing chunk {i//scrape_config['chunk_size'] + 1}")
-            processor.process_reddit_data(chunk)
+            processor.process_reddit_data(chunk, 'headphones')
             
             # Reduced delay between chunks
             time.sleep(1)
@@ -0,0 +1,120 @@
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class StreamingPipeline:
+    """
+    Runs a source and a chain of stages concurrently, each in its own thread, connected by bounded queues.
+
+    Every item of the source goes through the stages in order, a stage returning None drops the item. While a stage
+    works on an item the previous stages already work on the next ones, so the wall time approaches the time of the
+    slowest stage instead of the sum of all of them. A full queue blocks the stage feeding it, which keeps a fast
+    producer at most `queue_size` items ahead of a slow consumer.
+
+    The first error raised by the source or a stage stops the whole pipeline and is raised again by `run`.
+    """
+
+    def __init__(self, stages, queue_size=2, poll_seconds=0.5):
+        """
+        Args:
+            stages (list): (name, callable) pairs, every callable takes the output of the previous stage
+            queue_size (int): Maximum number of items waiting between two stages
+            poll_seconds (float): How often blocked threads check whether the pipeline failed
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        self.poll_seconds = poll_seconds
+
+    def run(self, source):
+        """
+        Feed the items of `source` through the stages and wait until the last item went through
+
+        Args:
+            source (iterable): Items of the first stage, iterated in a thread of its own
+
+        Returns:
+            dict: Number of items and busy seconds of the source and every stage, and the wall seconds of the run
+        """
+        self._failed = threading.Event()
+        self._errors = []
+        self._stats = {name: {'items': 0, 'busy_seconds': 0.0} for name in ['source', *dict(self.stages)]}
+
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        threads = [threading.Thread(target=self._run_source, args=(source, queues[0]), name='source', daemon=True)]
+        for i, (name, func) in enumerate(self.stages):
+            output = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(threading.Thread(
+                target=self._run_stage, args=(name, func, queues[i], output), name=name, daemon=True
+            ))
+
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_seconds = time.perf_counter() - start
+
+        if self._errors:
+            raise self._errors[0]
+        return {**self._stats, 'wall_seconds': wall_seconds}
+
+    def _run_source(self, source, output):
+        try:
+            iterator = iter(source)
+            while True:
+                started = time.perf_counter()
+                item = next(iterator, _DONE)
+                self._record('source', started, item is not _DONE)
+                if item is _DONE or not self._put(output, item):
+                    break
+        except Exception as e:
+            self._fail('source', e)
+        finally:
+            self._put(output, _DONE)
+
+    def _run_stage(self, name, func, input_queue, output):
+        try:
+            while (item := self._get(input_queue)) is not _DONE:
+                started = time.perf_counter()
+                result = func(item)
+                self._record(name, started, True)
+                if result is not None and output is not None and not self._put(output, result):
+                    break
+        except Exception as e:
+            self._fail(name, e)
+        finally:
+            if output is not None:
+                self._put(output, _DONE)
+
+    def _put(self, output, item):
+        """Put `item` on the queue, the end marker is always delivered and other items only while nothing failed"""
+        while item is _DONE or not self._failed.is_set():
+            try:
+                output.put(item, timeout=self.poll_seconds)
+                return True
+            except queue.Full:
+                if item is _DONE and self._failed.is_set():
+                    # The consumer stopped on the failure and is not draining the queue anymore
+                    return False
+        return False
+
+    def _get(self, input_queue):
+        while not self._failed.is_set():
+            try:
+                return input_queue.get(timeout=self.poll_seconds)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _record(self, name, started, counted):
+        stats = self._stats[name]
+        stats['busy_seconds'] += time.perf_counter() - started
+        stats['items'] += counted
+
+    def _fail(self, name, error):
+        print(f"Streaming stage {name} failed: {error}")
+        self._errors.append(error)
+        self._failed.set()
@@ -4,7 +4,7 @@ from dotenv import load_dotenv
 from frontend.utils.chat import (
     get_openai_model_choices,
     get_categories,
-    search_initial,
+    search_initial_stream,
     search_product_listings,
     fetch_chat_sessions,
     process_selected_chat_session,
@@ -12,6 +12,45 @@ from frontend.utils.chat import (
 
 load_dotenv()
 
+STEP_LABELS = {
+    "vector_store_retrieval": "Retrieved community discussions",
+    "vector_store_evaluation": "Graded discussions for relevance",
+    "web_search_retrieval": "Searched the web",
+    "llm_generation": "Generated recommendations",
+}
+
+def preprocess_recommendations(raw_recommendations):
+    """
+    Convert the recommended products returned by the search into the product format used by the page.
+    """
+    return [
+        {
+            "title": product.get("product_name", "Product title unavailable"),
+            "price": "Price unavailable",
+            "product_url": "#",
+            "merchant_name": "Merchant unavailable",
+            "reason": product.get("reason_for_recommendation", "No reason provided."),
+        }
+        for product in raw_recommendations
+    ]
+
+def format_recommendations(processed_products, reasoning_summary=""):
+    """
+    Build the assistant reply listing the recommended products.
+    """
+    assistant_reply = "Based on the community discussions, here are some recommended products:\n\n"
+    for idx, product in enumerate(processed_products, start=1):
+        assistant_reply += (
+            f"**{idx}. {product['title']}**\n"
+            f"Reason: {product['reason']}\n"
+            f"Price: {product['price']}\n"
+            f"Merchant: {product['merchant_name']}\n\n"
+        )
+
+    if reasoning_summary:
+        assistant_reply += f"**Reasoning Summary:** {reasoning_summary}"
+    return assistant_reply
+
 def preprocess_products(raw_products):
     """
     Preprocess and validate the product list to ensure all necessary fields are present.
@@ -120,10 +159,24 @@ def qa_interface():
             with st.chat_message("user"):
                 st.markdown(prompt)
 
-            # Perform initial search for every prompt
-            with st.spinner("Searching for recommendations..."):
-                try:
-                    response = search_initial(model, prompt, category, selected_chat_session, st.session_state.chat_history)
+            # Stream the initial search so steps and products are shown as soon as they are ready
+            try:
+                response = None
+                streamed_products = []
+                with st.chat_message("assistant"):
+                    status = st.status("Searching for recommendations...")
+                    reply_placeholder = st.empty()
+                    for event, data in search_initial_stream(model, prompt, category, selected_chat_session, st.session_state.chat_history):
+                        if event == "step":
+                            status.write(STEP_LABELS.get(data["step"], data["step"]))
+                        elif event == "product":
+                            streamed_products.append(data)
+                            reply_placeholder.markdown(format_recommendations(preprocess_recommendations(streamed_products)))
+                        elif event == "result":
+                            response = data
+                        elif event == "error":
+                            raise RuntimeError(data.get("detail"))
+                    status.update(label="Search complete", state="complete", expanded=False)
 
                     if isinstance(response, dict):
                         rag_output = response.get("response", {})
@@ -135,49 +188,28 @@ def qa_interface():
                             st.warning("No products found in initial search. Fetching direct product listings.")
                         else:
                             # Preprocess RAG products
-                            processed_products = [
-                                {
-                                    "title": product.get("product_name", "Product title unavailable"),
-                                    "price": "Price unavailable",
-                                    "product_url": "#",
-                                    "merchant_name": "Merchant unavailable",
-                                    "reason": product.get("reason_for_recommendation", "No reason provided."),
-                                }
-                                for product in products
-                            ]
-
+                            processed_products = preprocess_recommendations(products)
                             st.session_state.recommended_products = processed_products
 
                             # Display recommendations
-                            assistant_reply = "Based on the community discussions, here are some recommended products:\n\n"
-                            for idx, product in enumerate(processed_products, start=1):
-                                assistant_reply += (
-                                    f"**{idx}. {product['title']}**\n"
-                                    f"Reason: {product['reason']}\n"
-                                    f"Price: {product['price']}\n"
-                                    f"Merchant: {product['merchant_name']}\n\n"
-                                )
-
-                            if reasoning_summary:
-                                assistant_reply += f"**Reasoning Summary:** {reasoning_summary}"
-
-                            with st.chat_message("assistant"):
-                                st.markdown(assistant_reply)
+                            assistant_reply = format_recommendations(processed_products, reasoning_summary)
+                            reply_placeholder.markdown(assistant_reply)
                             st.session_state.chat_history.append({"role": "assistant", "content": assistant_reply})
 
-                            # Fetch product listings for each recommended product
-                            for product in processed_products:
-                                with st.spinner(f"Fetching product links for: {product['title']}..."):
-                                    try:
-                                        product_response = search_product_listings(product['title'])
-                                        if isinstance(product_response, list) and product_response:
-                                            additional_products = preprocess_products(product_response)
-                                            card_markdown = create_cards(additional_products[:5], title=f"Product Listings for {product['title']}")
-                                            st.markdown(card_markdown, unsafe_allow_html=True)
-                                    except Exception as e:
-                                        st.error(f"Error fetching products for {product['title']}: {e}")
-                except Exception as e:
-                    st.error(f"Error during initial search: {e}")
+                if isinstance(response, dict) and st.session_state.recommended_products:
+                    # Fetch product listings for each recommended product
+                    for product in st.session_state.recommended_products:
+                        with st.spinner(f"Fetching product links for: {product['title']}..."):
+                            try:
+                                product_response = search_product_listings(product['title'])
+                                if isinstance(product_response, list) and product_response:
+                                    additional_products = preprocess_products(product_response)
+                                    card_markdown = create_cards(additional_products[:5], title=f"Product Listings for {product['title']}")
+                                    st.markdown(card_markdown, unsafe_allow_html=True)
+                            except Exception as e:
+                                st.error(f"Error fetching products for {product['title']}: {e}")
+            except Exception as e:
+                st.error(f"Error during initial search: {e}")
 
 if __name__ == "__main__":
     qa_interface()
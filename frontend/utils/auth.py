@@ -1,3 +1,5 @@
+import json
+
 import requests
 import streamlit as st
 
@@ -34,6 +36,36 @@ def make_authenticated_request(endpoint, method="GET", data=None, params=None):
     return response.json()
 
 
+def make_authenticated_stream_request(endpoint, data=None, params=None):
+    """
+    POST to a Server-Sent Events endpoint and yield `(event, data)` pairs as they arrive, an error response is
+    yielded as a single `error` event
+    """
+    token = get_access_token()
+    headers = {"Authorization": f"Bearer {token}", "Accept": "text/event-stream"}
+    url = f"{settings.BACKEND_URI}/{endpoint}"
+
+    with requests.post(url, json=data, headers=headers, params=params, stream=True) as response:
+        if not response.ok:
+            # An expired token or an invalid payload is answered with a JSON error instead of the event stream
+            try:
+                detail = response.json().get("detail")
+            except ValueError:
+                detail = None
+            yield "error", {"detail": detail or f"Search failed with HTTP {response.status_code}"}
+            return
+
+        event, data_lines = "message", []
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                data_lines.append(line[len("data:"):].strip())
+            elif not line and data_lines:
+                yield event, json.loads("\n".join(data_lines))
+                event, data_lines = "message", []
+
+
 def make_unauthenticated_request(endpoint, method="GET", data=None, params=None):
     url = f"{settings.BACKEND_URI}/{endpoint}"
 
@@ -7,7 +7,8 @@ import requests
 import streamlit as st
 from botocore.exceptions import ClientError
 
-from frontend.utils.auth import make_authenticated_request, make_unauthenticated_request
+from frontend.utils.auth import make_authenticated_request, make_unauthenticated_request, \
+    make_authenticated_stream_request
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +71,24 @@ def search_initial(model: str, prompt: str, category: str, chat_session_id: str
         data=payload
     )
 
+def search_initial_stream(model: str, prompt: str, category: str, chat_session_id: str | None, chat_history):
+    # POST /search/initial/stream
+    if chat_history:
+        prompt = " ".join([i["content"] for i in chat_history if i["role"] == "user"]) + prompt
+
+    chat_session_id = process_selected_chat_session(chat_session_id)
+
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "category": category,
+        "chat_session_id": chat_session_id,
+    }
+    yield from make_authenticated_stream_request(
+        endpoint="/search/initial/stream",
+        data=payload
+    )
+
 def fetch_chat_sessions():
     resp = make_authenticated_request(
         endpoint="/search/chat-sessions",
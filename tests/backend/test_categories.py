@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from backend.categories import get_category_namespace, get_category_registry
+from backend.config import settings
+from backend.services.choices import get_supported_product_categories
+
+
+@pytest.fixture
+def registry_path(tmp_path, monkeypatch):
+    path = tmp_path / "categories.json"
+    path.write_text(json.dumps({"categories": [
+        {"name": "headphones", "namespace": "audio", "subreddits": ["HeadphoneAdvice"]},
+        {"name": "sneakers", "subreddits": ["Sneakers"]},
+    ]}))
+    monkeypatch.setattr(settings, "CATEGORY_REGISTRY_PATH", str(path))
+    get_category_registry.cache_clear()
+    yield path
+    get_category_registry.cache_clear()
+
+
+def test_categories_come_from_the_registry(registry_path):
+    assert get_supported_product_categories() == ["headphones", "sneakers"]
+
+
+def test_category_namespace_defaults_to_the_category_name(registry_path):
+    assert get_category_namespace("headphones") == "audio"
+    assert get_category_namespace("sneakers") == "sneakers"
+    assert get_category_namespace("unknown") == "unknown"
+
+
+def test_repository_registry_lists_every_category():
+    get_category_registry.cache_clear()
+    assert "headphones" in get_supported_product_categories()
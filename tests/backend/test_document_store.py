@@ -0,0 +1,88 @@
+from unittest.mock import patch
+
+from langchain_core.documents import Document
+
+from backend.agent.document_store import DocumentStore
+from backend.agent.vector_store import Retriever
+
+
+class InMemoryDocumentStore(DocumentStore):
+    def __init__(self, documents: dict[str, Document], max_entries: int = 10, ttl_seconds: float = 600):
+        super().__init__(max_entries, ttl_seconds)
+        self.documents = documents
+        self.fetched = []
+
+    def _fetch(self, ids):
+        self.fetched.append(ids)
+        return {_id: self.documents[_id] for _id in ids if _id in self.documents}
+
+
+def test_get_many_serves_repeated_ids_from_the_cache():
+    store = InMemoryDocumentStore({"a": Document(id="a", page_content="A"), "b": Document(id="b", page_content="B")})
+
+    assert set(store.get_many(["a", "b", "missing"])) == {"a", "b"}
+    assert set(store.get_many(["a", "b"])) == {"a", "b"}
+    assert store.fetched == [["a", "b", "missing"]]
+
+
+def test_get_many_evicts_least_recently_used_documents():
+    store = InMemoryDocumentStore({_id: Document(id=_id, page_content=_id) for _id in "abc"}, max_entries=2)
+
+    store.get_many(["a", "b"])
+    store.get_many(["a"])
+    store.get_many(["c"])
+    store.get_many(["a", "b"])
+    assert store.fetched == [["a", "b"], ["c"], ["b"]]
+
+
+def test_get_many_refetches_expired_documents():
+    store = InMemoryDocumentStore({"a": Document(id="a", page_content="A")}, ttl_seconds=60)
+
+    with patch("backend.agent.document_store.time.monotonic", side_effect=[0, 0, 30, 61, 61]):
+        store.get_many(["a"])
+        store.get_many(["a"])
+        store.get_many(["a"])
+    assert store.fetched == [["a"], ["a"]]
+
+
+def test_retriever_hydrates_slim_documents_and_drops_unknown_ones():
+    store = InMemoryDocumentStore({
+        "p1#comments-0": Document(id="p1#comments-0", page_content="Comment by u: get the HD 600", metadata={"title": "t"})
+    })
+    retriever = Retriever(vector_store=None, document_store=store)
+    docs = [
+        Document(id="p1#comments-0", page_content="", metadata={"score": 3}),
+        Document(id="p2", page_content="", metadata={}),
+        Document(id="p3", page_content="already there", metadata={}),
+    ]
+
+    hydrated = retriever._hydrate_docs(docs)
+    assert [doc.page_content for doc in hydrated] == ["Comment by u: get the HD 600", "already there"]
+    assert hydrated[0].metadata == {"title": "t", "score": 3}
+
+
+def test_retriever_tops_up_from_the_next_candidates_when_documents_are_dropped():
+    store = InMemoryDocumentStore({_id: Document(id=_id, page_content=f"text of {_id}") for _id in ["b", "d"]})
+    retriever = Retriever(vector_store=None, document_store=store, top_k=3)
+    ranked = [Document(id=_id, page_content="", metadata={}) for _id in "abcd"]
+
+    hydrated = retriever._hydrate_docs(ranked)
+    assert [doc.page_content for doc in hydrated] == ["text of b", "text of d"]
+    # Only the documents that could fill the top k are looked up
+    assert store.fetched == [["a", "b", "c"], ["d"]]
+
+
+def test_retriever_keeps_documents_with_content_when_the_lookup_fails():
+    class FailingDocumentStore(DocumentStore):
+        def _fetch(self, ids):
+            raise ConnectionError("database unreachable")
+
+    retriever = Retriever(vector_store=None, document_store=FailingDocumentStore(max_entries=10), top_k=2)
+    ranked = [
+        Document(id="a", page_content="", metadata={}),
+        Document(id="b", page_content="local text", metadata={}),
+        Document(id="c", page_content="", metadata={}),
+        Document(id="d", page_content="more local text", metadata={}),
+    ]
+
+    assert [doc.id for doc in retriever._hydrate_docs(ranked)] == ["b", "d"]
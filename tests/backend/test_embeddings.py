@@ -0,0 +1,51 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from backend.agent.embeddings import CachedQueryEmbeddings
+
+
+@pytest.fixture
+def base_embeddings():
+    embeddings = MagicMock()
+    embeddings.embed_query.side_effect = lambda text: [float(len(text)), 1.0]
+    return embeddings
+
+
+def test_repeated_queries_are_embedded_once(base_embeddings):
+    embeddings = CachedQueryEmbeddings(base_embeddings, model="text-embedding-3-small", max_entries=10)
+
+    first = embeddings.embed_query("best noise cancelling headphones")
+    second = embeddings.embed_query("  Best noise   cancelling headphones ")
+
+    assert first == second
+    assert base_embeddings.embed_query.call_count == 1
+    assert (embeddings.hits, embeddings.misses) == (1, 1)
+
+
+def test_cache_is_bounded(base_embeddings):
+    embeddings = CachedQueryEmbeddings(base_embeddings, model="text-embedding-3-small", max_entries=2)
+
+    for query in ("a", "bb", "ccc", "a"):
+        embeddings.embed_query(query)
+
+    assert base_embeddings.embed_query.call_count == 4
+
+
+def test_model_embeds_the_query_as_typed(base_embeddings):
+    embeddings = CachedQueryEmbeddings(base_embeddings, model="text-embedding-3-small", max_entries=10)
+
+    embeddings.embed_query("  Sony WH-1000XM5  ")
+
+    base_embeddings.embed_query.assert_called_once_with("  Sony WH-1000XM5  ")
+
+
+def test_hits_and_misses_return_the_same_values(base_embeddings):
+    base_embeddings.embed_query.side_effect = lambda text: [0.1, 1 / 3]
+    embeddings = CachedQueryEmbeddings(base_embeddings, model="text-embedding-3-small", max_entries=10)
+
+    miss = embeddings.embed_query("headphones")
+    hit = embeddings.embed_query("headphones")
+
+    assert miss == hit
+    assert isinstance(miss, list)
@@ -0,0 +1,92 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.language_models import FakeListChatModel
+
+from backend.agent import build_workflow
+from backend.agent.edges import GraphEdges
+from backend.agent.graph import Steps
+from backend.agent.nodes import GraphNodes
+from backend.schemas.chain import SearchResult
+
+GENERATION = SearchResult(products=[], reasoning_summary="summary")
+
+
+class FakeRetriever:
+    documents = [Document(id="a", page_content="relevant post"), Document(id="b", page_content="weak post")]
+
+    def embed_query(self, prompt):
+        return [0.0]
+
+    async def aembed_query(self, prompt):
+        return [0.0]
+
+    def sim_search(self, prompt, namespace, embedding=None):
+        return list(self.documents)
+
+    async def asim_search(self, prompt, namespace, embedding=None):
+        return list(self.documents)
+
+
+class FakeGrader:
+    def __init__(self, relevant_contents):
+        self.relevant_contents = relevant_contents
+
+    def batch(self, inputs, config=None):
+        return [{"score": "yes" if i["resources"].page_content in self.relevant_contents else "no"} for i in inputs]
+
+    async def abatch(self, inputs, config=None):
+        return self.batch(inputs, config)
+
+
+@pytest.fixture
+def workflow_for():
+    def make(relevant_contents):
+        web_search_tool = MagicMock()
+        web_search_tool.invoke.return_value = [{"content": "web result"}]
+        web_search_tool.ainvoke = AsyncMock(return_value=[{"content": "web result"}])
+        nodes = GraphNodes(llm=FakeListChatModel(responses=[GENERATION.model_dump_json()]), retriever=FakeRetriever(),
+                           retrieval_grader=FakeGrader(relevant_contents), web_search_tool=web_search_tool)
+        return build_workflow(nodes, GraphEdges(None, None)), web_search_tool
+
+    with patch("backend.agent.nodes.create_message"), patch("backend.agent.nodes.acreate_message", AsyncMock()):
+        yield make
+
+
+def _run(workflow):
+    return workflow.invoke({"prompt": "best headphones", "category": "headphones", "chat_session_id": 1})
+
+
+def test_kept_documents_go_straight_to_generation(workflow_for):
+    # One weak document does not replace the relevant ones with web results
+    workflow, web_search_tool = workflow_for({"relevant post"})
+
+    state = _run(workflow)
+
+    assert [resource.page_content for resource in state["resources"]] == ["relevant post"]
+    assert Steps.WEB_SEARCH_RETRIEVAL.value not in state["steps"]
+    assert state["steps"][-1] == Steps.LLM_GENERATION.value
+    web_search_tool.invoke.assert_not_called()
+
+
+def test_web_search_runs_when_no_document_is_relevant(workflow_for):
+    workflow, web_search_tool = workflow_for(set())
+
+    state = _run(workflow)
+
+    assert state["resources"] == ["web result"]
+    assert Steps.WEB_SEARCH_RETRIEVAL.value in state["steps"]
+    assert state["steps"][-1] == Steps.LLM_GENERATION.value
+    web_search_tool.invoke.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_speculative_web_search_is_discarded_when_documents_are_kept(workflow_for):
+    workflow, web_search_tool = workflow_for({"relevant post"})
+
+    with patch("backend.agent.nodes.settings.SPECULATIVE_WEB_SEARCH", True):
+        state = await workflow.ainvoke({"prompt": "best headphones", "category": "headphones", "chat_session_id": 1})
+
+    assert state["speculative_web_search"] is None
+    assert Steps.WEB_SEARCH_RETRIEVAL.value not in state["steps"]
@@ -0,0 +1,85 @@
+from langchain_core.documents import Document
+
+from backend.agent.keyword_index import KeywordIndex, KeywordIndexStore, tokenize
+from backend.agent.vector_store import Retriever
+
+
+def _doc(doc_id: str, content: str, score: int = 1) -> Document:
+    return Document(id=doc_id, page_content=content, metadata={"id": doc_id, "score": score})
+
+
+def test_tokenize_keeps_model_name_spellings():
+    assert {"wh", "1000xm5", "wh1000xm5"} <= set(tokenize("Sony WH-1000XM5"))
+    assert "hd600" in tokenize("Sennheiser HD 600")
+    assert "the" not in tokenize("the best")
+
+
+def test_search_ranks_exact_model_matches_first():
+    index = KeywordIndex()
+    index.add([
+        _doc("1", "Sony WH-1000XM5 has the best noise cancelling"),
+        _doc("2", "Sennheiser HD 600 for mixing"),
+        _doc("3", "Noise cancelling headphones for travel, many options"),
+    ])
+
+    results = index.search("wh1000xm5 noise cancelling", k=2)
+    assert [doc.id for doc, _ in results] == ["1", "3"]
+    assert index.search("HD600", k=5)[0][0].id == "2"
+    assert index.search("unrelated", k=5) == []
+
+
+def test_add_replaces_and_remove_drops_documents():
+    index = KeywordIndex()
+    index.add([_doc("1", "Sony WH-1000XM4"), _doc("2", "AirPods Max")])
+    index.add([_doc("1", "Sony WH-1000XM5")])
+
+    assert index.search("1000xm4", k=5) == []
+    assert index.search("1000xm5", k=5)[0][0].id == "1"
+
+    index.remove(["2"])
+    assert len(index) == 1
+    assert index.search("airpods", k=5) == []
+
+
+def test_reciprocal_rank_fusion_prefers_documents_found_by_both_searches():
+    vector_hits = [(_doc("a", "a"), 0.9), (_doc("b", "b"), 0.8)]
+    keyword_hits = [(_doc("c", "c"), 7.0), (_doc("b", "b"), 5.0)]
+
+    fused = Retriever._fuse_ranked_docs([vector_hits, keyword_hits])
+    assert [doc.id for doc, _ in fused] == ["b", "a", "c"]
+
+
+def test_chunk_and_post_hits_of_the_same_post_are_fused():
+    chunk = Document(id="p1#body-0", page_content="", metadata={"id": "p1#body-0", "post_id": "p1"})
+    other_chunk = Document(id="p1#comments-0", page_content="", metadata={"id": "p1#comments-0", "post_id": "p1"})
+    vector_hits = [(_doc("p2", "p2"), 0.9), (chunk, 0.8), (other_chunk, 0.7)]
+    keyword_hits = [(_doc("p1", "p1"), 7.0)]
+
+    fused = Retriever._fuse_ranked_docs([vector_hits, keyword_hits])
+    assert [doc.id for doc, _ in fused] == ["p1#body-0", "p2"]
+
+
+class InMemoryKeywordIndexStore(KeywordIndexStore):
+    def __init__(self, posts: dict[str, tuple[str, str]]):
+        super().__init__(refresh_seconds=60)
+        # Post id to (content, content hash)
+        self.posts = posts
+
+    def _fetch_versions(self, namespace):
+        return {post_id: (content_hash, 1) for post_id, (_, content_hash) in self.posts.items()}
+
+    def _fetch_posts(self, post_ids):
+        return [_doc(post_id, self.posts[post_id][0]) for post_id in post_ids]
+
+
+def test_sync_reindexes_edited_posts_and_removes_deleted_ones():
+    store = InMemoryKeywordIndexStore({"1": ("Sony WH-1000XM4", "h1"), "2": ("AirPods Max", "h2")})
+    index = store.get_index("headphones")
+
+    store.posts = {"1": ("Sony WH-1000XM5", "h1-edited")}
+    store._sync_posts("headphones", index)
+
+    assert index.search("1000xm4", k=5) == []
+    assert index.search("1000xm5", k=5)[0][0].id == "1"
+    assert index.search("airpods", k=5) == []
+    assert len(index) == 1
@@ -0,0 +1,103 @@
+import sqlite3
+from contextlib import closing
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import numpy as np
+from langchain_core.documents import Document
+
+from backend.agent import local_index
+from backend.agent.local_index import LocalVectorIndex, LocalVectorStore, _embedding_cache_key, build_local_index
+from backend.config import settings
+
+
+def _batches(vectors: np.ndarray, batch_size: int = 100):
+    for start in range(0, len(vectors), batch_size):
+        ids = [f"post{i}" for i in range(start, min(start + batch_size, len(vectors)))]
+        yield ids, vectors[start:start + batch_size], [f"text of {_id}" for _id in ids], [{"id": _id} for _id in ids]
+
+
+def test_local_vector_store_returns_nearest_documents(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((500, 32)).astype(np.float32)
+    LocalVectorIndex.build(str(tmp_path / "headphones"), _batches(vectors), dimension=32, nlist=10)
+
+    store = LocalVectorStore(str(tmp_path), embedding=None, nprobe=10)
+    results = store.similarity_search_by_vector_with_score(vectors[42].tolist(), k=3, namespace="headphones")
+
+    assert len(results) == 3
+    document, score = results[0]
+    assert document.id == "post42"
+    assert document.page_content == "text of post42"
+    assert abs(score - 1.0) < 1e-5
+    assert [s for _, s in results] == sorted([s for _, s in results], reverse=True)
+
+
+def test_from_texts_builds_a_searchable_index():
+    class KeywordEmbeddings:
+        words = ["headphones", "sneakers", "keyboard"]
+
+        def embed_documents(self, texts):
+            return [self.embed_query(text) for text in texts]
+
+        def embed_query(self, text):
+            return [float(word in text) for word in self.words]
+
+    texts = ["best headphones", "running sneakers", "mechanical keyboard"]
+    store = LocalVectorStore.from_texts(texts, KeywordEmbeddings(), ids=["h", "s", "k"], namespace="misc", nlist=3)
+
+    documents = store.similarity_search("sneakers for running", k=1, namespace="misc")
+    assert [document.id for document in documents] == ["s"]
+
+
+def test_ingested_index_is_built_from_the_embedding_cache(tmp_path, monkeypatch):
+    documents = [
+        Document(id=f"p{i}#body-0", page_content=f"headphones post {i}", metadata={"post_id": f"p{i}"}) for i in range(3)
+    ]
+    vectors = np.eye(3, 8, dtype=np.float32)
+
+    # The SQLite layout of the ingestion pipeline's EmbeddingCache, without the vector of the last document
+    cache_path = tmp_path / "embedding_cache.sqlite"
+    with closing(sqlite3.connect(cache_path)) as connection:
+        connection.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used INTEGER)")
+        connection.executemany("INSERT INTO embeddings VALUES (?, ?, 0)", [
+            (_embedding_cache_key(document.page_content), vector.tobytes())
+            for document, vector in zip(documents[:2], vectors)
+        ])
+        connection.commit()
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_PATH", str(cache_path))
+    monkeypatch.setattr(local_index, "_fetch_ingested_documents", lambda namespace, batch_size: iter([documents]))
+
+    index = build_local_index("headphones", str(tmp_path / "offline"), dimension=8, nlist=1)
+    assert index.count == 2
+
+    class MissingEmbeddings:
+        def embed_documents(self, texts):
+            return [vectors[2].tolist() for _ in texts]
+
+    index = build_local_index("headphones", str(tmp_path / "embedded"), dimension=8, nlist=1,
+                              embeddings=MissingEmbeddings())
+    rows, _ = index.search(vectors[2].tolist(), k=1, nprobe=1)
+    [document] = index.documents(rows)
+    assert document.id == "p2#body-0" and document.page_content == "headphones post 2"
+
+
+def test_pinecone_index_copy_fills_in_slim_texts_from_the_database(tmp_path, monkeypatch):
+    vectors = np.eye(2, 8, dtype=np.float32)
+    fetched = {
+        "p0": SimpleNamespace(values=vectors[0].tolist(), metadata={"text": "indexed with text"}),
+        "p1#body-0": SimpleNamespace(values=vectors[1].tolist(), metadata={"post_id": "p1"}),
+    }
+    pinecone_index = MagicMock()
+    pinecone_index.list.return_value = iter([list(fetched)])
+    pinecone_index.fetch.return_value = SimpleNamespace(vectors=fetched)
+    monkeypatch.setattr("pinecone.Pinecone", lambda api_key: SimpleNamespace(Index=lambda name: pinecone_index))
+    monkeypatch.setattr(local_index, "fetch_documents", lambda ids: {
+        "p1#body-0": Document(id="p1#body-0", page_content="stored chunk", metadata={"title": "t"})
+    })
+
+    index = build_local_index("headphones", str(tmp_path), dimension=8, nlist=1, source="pinecone")
+    rows, _ = index.search(vectors[1].tolist(), k=2, nprobe=1)
+    documents = {document.id: document for document in index.documents(rows)}
+    assert documents["p0"].page_content == "indexed with text"
+    assert documents["p1#body-0"].page_content == "stored chunk"
+    assert documents["p1#body-0"].metadata == {"title": "t", "post_id": "p1"}
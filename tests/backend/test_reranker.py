@@ -0,0 +1,49 @@
+import json
+from datetime import datetime, timedelta
+
+from langchain_core.documents import Document
+
+from backend.agent.reranker import Reranker
+from backend.agent.vector_store import Retriever
+
+
+def _doc(doc_id: str, score: int = 1, age_days: int = 1, comments: int = 0) -> Document:
+    created = datetime.now() - timedelta(days=age_days)
+    return Document(id=doc_id, page_content=doc_id, metadata={
+        "id": doc_id, "score": score, "created": str(created), "comments": json.dumps([{"text": "c"}] * comments),
+    })
+
+
+def test_relevance_outweighs_upvotes():
+    docs = [_doc("popular", score=5000), _doc("relevant", score=10)]
+
+    reranked = Reranker().rerank(docs, relevance=[0.1, 0.9], k=2)
+    assert [doc.id for doc in reranked] == ["relevant", "popular"]
+
+
+def test_secondary_signals_break_relevance_ties():
+    docs = [_doc("old", age_days=1000), _doc("discussed", comments=50), _doc("plain")]
+
+    reranked = Reranker(relevance_weight=0, score_weight=0, recency_weight=0, comments_weight=1).rerank(
+        docs, relevance=[1.0, 1.0, 1.0], k=1
+    )
+    assert [doc.id for doc in reranked] == ["discussed"]
+
+    reranked = Reranker(relevance_weight=0, score_weight=0, recency_weight=1, comments_weight=0).rerank(
+        docs, relevance=[1.0, 1.0, 1.0], k=3
+    )
+    assert reranked[-1].id == "old"
+
+
+def test_missing_metadata_is_tolerated():
+    docs = [Document(page_content="web", metadata={}), _doc("post")]
+
+    assert len(Reranker().rerank(docs, relevance=[0.5, 0.5], k=6)) == 2
+    assert Reranker().rerank([], relevance=[], k=6) == []
+
+
+def test_retriever_turns_distances_into_relevance():
+    retriever = Retriever(vector_store=None, scores_are_distances=True)
+
+    reranked = retriever._rerank_docs([(_doc("far"), 1.4), (_doc("near"), 0.2)], [])
+    assert [doc.id for doc in reranked] == ["near", "far"]
@@ -0,0 +1,54 @@
+import time
+
+import pytest
+
+from backend.agent.semantic_cache import SemanticCache
+from backend.schemas.chain import SearchResult, ExtractedProduct
+
+
+@pytest.fixture
+def search_result():
+    return SearchResult(
+        products=[ExtractedProduct(product_name="Sony WH-1000XM5", reason_for_recommendation="Great ANC")],
+        reasoning_summary="Mentioned in most threads",
+    )
+
+
+def test_lookup_hit_above_threshold(search_result):
+    cache = SemanticCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=10)
+    cache.store("headphones", [1.0, 0.0, 0.0], search_result, ["vector_search"])
+
+    cached = cache.lookup("headphones", [0.99, 0.05, 0.0])
+    assert cached.result == search_result
+    assert cache.stats()["hits"] == 1
+
+
+def test_lookup_miss_below_threshold_or_other_category(search_result):
+    cache = SemanticCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=10)
+    cache.store("headphones", [1.0, 0.0, 0.0], search_result, ["vector_search"])
+
+    assert cache.lookup("headphones", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("sneakers", [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["misses"] == 2
+
+
+def test_expired_entries_are_ignored(search_result):
+    cache = SemanticCache(similarity_threshold=0.9, ttl_seconds=0, max_entries=10)
+    cache.store("headphones", [1.0, 0.0, 0.0], search_result, ["vector_search"])
+    time.sleep(0.01)
+
+    assert cache.lookup("headphones", [1.0, 0.0, 0.0]) is None
+
+
+def test_least_recently_used_entry_is_evicted(search_result):
+    cache = SemanticCache(similarity_threshold=0.9, ttl_seconds=60, max_entries=2)
+    cache.store("headphones", [1.0, 0.0, 0.0], search_result, ["vector_search"])
+    cache.store("headphones", [0.0, 1.0, 0.0], search_result, ["vector_search"])
+    # Touch the first entry so the second becomes the least recently used
+    assert cache.lookup("headphones", [1.0, 0.0, 0.0]) is not None
+    cache.store("sneakers", [0.0, 0.0, 1.0], search_result, ["vector_search"])
+
+    assert cache.stats()["size"] == 2
+    assert cache.lookup("headphones", [1.0, 0.0, 0.0]) is not None
+    assert cache.lookup("headphones", [0.0, 1.0, 0.0]) is None
+    assert cache.lookup("sneakers", [0.0, 0.0, 1.0]) is not None
@@ -0,0 +1,64 @@
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import AsyncMock, patch
+
+from fastapi.testclient import TestClient
+
+import backend.agent
+from backend.agent import get_agent_workflow
+
+
+def test_importing_the_search_service_does_not_build_the_graph():
+    # A fresh interpreter, the test session may already have built the graph
+    script = (
+        "import backend.agent\n"
+        "backend.agent.compile_graph = lambda: (_ for _ in ()).throw(AssertionError('graph built on import'))\n"
+        "import backend.services.search\n"
+        "assert backend.agent._agent_workflow is None\n"
+    )
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_agent_workflow_is_built_once_under_concurrent_calls(monkeypatch):
+    calls = []
+
+    def compile_graph():
+        calls.append(threading.get_ident())
+        # Keeps the first build going while the other threads ask for the workflow
+        time.sleep(0.05)
+        return object()
+
+    monkeypatch.setattr(backend.agent, "_agent_workflow", None)
+    monkeypatch.setattr(backend.agent, "compile_graph", compile_graph)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_agent_workflow())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len(results) == 8 and all(result is results[0] for result in results)
+
+
+def test_failing_warm_up_step_is_reported_without_stopping_the_app():
+    from backend.main import app
+
+    with patch("backend.main.settings.AGENT_WARMUP_ENABLED", True), \
+            patch("backend.services.startup._compile_agent_workflow", AsyncMock()), \
+            patch("backend.services.startup._embed_dummy_query", AsyncMock()), \
+            patch("backend.services.startup._open_vector_store", AsyncMock()), \
+            patch("backend.services.startup._open_database_connection",
+                  AsyncMock(side_effect=ConnectionError("database unreachable"))), \
+            patch("backend.services.startup._build_keyword_indexes", AsyncMock()), \
+            TestClient(app) as client:
+        response = client.get("/startup")
+
+    assert response.status_code == 200
+    steps = {step["name"]: step for step in response.json()["steps"]}
+    assert steps["database"]["ok"] is False and steps["database"]["error"] == "database unreachable"
+    assert all(step["ok"] for name, step in steps.items() if name != "database")
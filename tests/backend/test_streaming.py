@@ -0,0 +1,167 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.agent.streaming import ProductStreamParser, sse_event
+from backend.schemas.chain import ExtractedProduct, SearchResult
+from backend.services.auth_bearer import get_current_user_id
+from backend.views.search import search_router
+
+RESULT = SearchResult(
+    products=[
+        ExtractedProduct(product_name='Sony "XM5" {wireless}', reason_for_recommendation="Best ANC } in class"),
+        ExtractedProduct(product_name="Bose QC45", reason_for_recommendation="Comfort"),
+    ],
+    reasoning_summary="Picked from r/HeadphoneAdvice",
+)
+GENERATION = "```json\n" + RESULT.model_dump_json() + "\n```"
+
+
+def _feed(parser, text, chunk_size):
+    return [
+        product.product_name
+        for start in range(0, len(text), chunk_size)
+        for product in parser.feed(text[start:start + chunk_size])
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 16])
+def test_products_split_across_chunks_are_released_once(chunk_size):
+    assert _feed(ProductStreamParser(), GENERATION, chunk_size) == ['Sony "XM5" {wireless}', "Bose QC45"]
+
+
+def test_product_is_released_once_the_next_one_starts():
+    parser = ProductStreamParser()
+    first_product_end = GENERATION.index("},{") + 1
+
+    assert _feed(parser, GENERATION[:first_product_end], 4) == []
+    assert _feed(parser, GENERATION[first_product_end:first_product_end + 3], 4) == ['Sony "XM5" {wireless}']
+
+
+def test_trailing_garbage_after_the_object_is_ignored():
+    unfenced = RESULT.model_dump_json(exclude={"reasoning_summary"}) + " trailing } text {"
+
+    assert _feed(ProductStreamParser(), unfenced, 5) == ['Sony "XM5" {wireless}', "Bose QC45"]
+
+
+def test_finish_releases_the_products_a_truncated_stream_did_not():
+    parser = ProductStreamParser()
+    truncated = GENERATION[:GENERATION.index("Bose")]
+
+    assert _feed(parser, truncated, 8) == ['Sony "XM5" {wireless}']
+    assert [product.product_name for product in parser.finish(RESULT)] == ["Bose QC45"]
+    assert parser.finish(RESULT) == []
+
+
+def test_products_are_not_released_truncated_when_the_summary_comes_first():
+    summary_first = json.dumps({
+        "reasoning_summary": RESULT.reasoning_summary, **RESULT.model_dump(exclude={"reasoning_summary"}),
+    })
+    parser = ProductStreamParser()
+    truncated = summary_first[:summary_first.index("in class")]
+
+    assert _feed(parser, truncated, 1) == []
+    assert [product.reason_for_recommendation for product in parser.feed(summary_first[len(truncated):])] == [
+        "Best ANC } in class", "Comfort",
+    ]
+
+
+def test_long_generation_is_scanned_in_linear_time():
+    products = [
+        ExtractedProduct(product_name=f"Product {index}", reason_for_recommendation="Long review " * 20)
+        for index in range(200)
+    ]
+    generation = "```json\n" + SearchResult(products=products, reasoning_summary="Summary").model_dump_json() + "\n```"
+    parser = ProductStreamParser()
+
+    start = time.perf_counter()
+    released = _feed(parser, generation, 4)
+
+    assert released == [product.product_name for product in products]
+    # Re-parsing the whole buffer on every token is quadratic on this ~60 KB generation
+    assert time.perf_counter() - start < 2
+
+
+def test_sse_event_format():
+    assert sse_event("step", {"step": "retrieve"}) == 'event: step\ndata: {"step": "retrieve"}\n\n'
+
+
+class FakeWorkflow:
+    async def astream_events(self, state, version):
+        yield {"event": "on_chain_end", "name": "retrieve", "metadata": {"langgraph_node": "retrieve"},
+               "data": {"output": {**state, "steps": ["retrieve_documents"]}}}
+        for start in range(0, len(GENERATION), 20):
+            yield {"event": "on_chat_model_stream", "name": "ChatOpenAI", "metadata": {"langgraph_node": "generate"},
+                   "data": {"chunk": SimpleNamespace(content=GENERATION[start:start + 20])}}
+        yield {"event": "on_chain_end", "name": "generate", "metadata": {"langgraph_node": "generate"},
+               "data": {"output": {**state, "generation": RESULT, "steps": ["retrieve_documents", "generate_answer"]}}}
+
+
+def _events(body):
+    return [
+        (block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+        for block in body.strip().split("\n\n")
+    ]
+
+
+def test_stream_endpoint_event_order():
+    app = FastAPI()
+    app.include_router(search_router)
+    app.dependency_overrides[get_current_user_id] = lambda: 1
+
+    with patch("backend.services.search.settings.SEMANTIC_CACHE_ENABLED", False), \
+            patch("backend.services.search.get_agent_workflow", return_value=FakeWorkflow()), \
+            patch("backend.services.search.acreate_chat_session", AsyncMock(return_value=SimpleNamespace(id=7))), \
+            patch("backend.services.search.aupdate_chat_session_title", AsyncMock()):
+        response = TestClient(app).post("/search/initial/stream", json={
+            "model": "gpt-4o-mini", "prompt": "best headphones", "category": "headphones", "chat_session_id": None,
+        })
+
+    events = _events(response.text)
+    names = [name for name, _ in events]
+    assert names[:2] == ["session", "step"]
+    assert names[-1] == "result"
+    assert names.count("product") == 2 and names.count("step") == 2
+    # Every product follows the tokens it was parsed from, before the next step and the result
+    assert names.index("token") < names.index("product") < names.index("step", 2)
+    assert events[0][1] == {"chat_session_id": 7}
+    assert "".join(data["content"] for name, data in events if name == "token") == GENERATION
+    assert [data["product_name"] for name, data in events if name == "product"] == [
+        'Sony "XM5" {wireless}', "Bose QC45"
+    ]
+    assert events[-1][1]["chat_session_id"] == 7
+
+
+def test_query_embedding_runs_while_the_session_is_created():
+    app = FastAPI()
+    app.include_router(search_router)
+    app.dependency_overrides[get_current_user_id] = lambda: 1
+    embedding_started = asyncio.Event()
+
+    async def aembed_query(prompt):
+        embedding_started.set()
+        return [1.0, 0.0]
+
+    async def acreate_chat_session(user_id):
+        # Only returns once the embedding started, a sequential search would time out here
+        await asyncio.wait_for(embedding_started.wait(), timeout=1)
+        return SimpleNamespace(id=7)
+
+    with patch("backend.services.search.get_embeddings", return_value=SimpleNamespace(aembed_query=aembed_query)), \
+            patch("backend.services.search.get_semantic_cache", return_value=MagicMock(lookup=lambda *args: None)), \
+            patch("backend.services.search.get_agent_workflow", return_value=FakeWorkflow()), \
+            patch("backend.services.search.acreate_chat_session", acreate_chat_session), \
+            patch("backend.services.search.aupdate_chat_session_title", AsyncMock()), \
+            TestClient(app) as client:
+        response = client.post("/search/initial/stream", json={
+            "model": "gpt-4o-mini", "prompt": "best headphones", "category": "headphones", "chat_session_id": None,
+        })
+
+    names = [name for name, _ in _events(response.text)]
+    assert names[0] == "session" and names[-1] == "result"
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The DAG modules import each other by module name, the way Airflow loads them from the dags folder
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "dags"))
@@ -0,0 +1,43 @@
+import json
+
+import pytest
+
+from category_registry import load_categories
+
+
+def _write(tmp_path, registry):
+    path = tmp_path / "categories.json"
+    path.write_text(json.dumps(registry))
+    return str(path)
+
+
+def test_defaults_fill_the_settings_a_category_leaves_out(tmp_path):
+    path = _write(tmp_path, {
+        "defaults": {"scrape": {"sort_by": "top", "limit": 1000}, "chunk_size": 250},
+        "categories": [
+            {"name": "headphones", "subreddits": ["HeadphoneAdvice"], "scrape": {"limit": 50}},
+            {"name": "sneakers", "namespace": "shoes", "subreddits": ["Sneakers"], "chunk_size": 100},
+        ],
+    })
+
+    headphones, sneakers = load_categories(path)
+
+    assert headphones["namespace"] == "headphones"
+    assert headphones["scrape"] == {"sort_by": "top", "limit": 50}
+    assert headphones["chunk_size"] == 250
+    assert sneakers["namespace"] == "shoes"
+    assert sneakers["scrape"] == {"sort_by": "top", "limit": 1000}
+    assert sneakers["chunk_size"] == 100
+
+
+def test_invalid_registries_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        load_categories(_write(tmp_path, {"categories": [{"name": "headphones", "subreddits": []}]}))
+    with pytest.raises(ValueError):
+        load_categories(_write(tmp_path, {"categories": [
+            {"name": "headphones", "subreddits": ["a"]}, {"name": "headphones", "subreddits": ["b"]},
+        ]}))
+
+
+def test_repository_registry_loads():
+    assert {category["name"] for category in load_categories()} >= {"headphones"}
@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("praw")
+
+from praw.models import MoreComments
+
+from comment_expansion import CommentBudget, expand_comments
+
+
+def _comment(comment_id, score, parent_id="t3_post", replies=()):
+    return SimpleNamespace(id=comment_id, fullname=f"t1_{comment_id}", score=score, parent_id=parent_id,
+                           body=comment_id, author="user", replies=list(replies))
+
+
+class FakeMoreComments(MoreComments):
+    def __init__(self, parent_id, resolved, barrier=None):
+        super().__init__(None, _data={"count": len(resolved), "children": ["x"], "parent_id": parent_id, "id": "m"})
+        self.resolved = resolved
+        self.barrier = barrier
+        self.resolved_with = None
+
+    def comments(self, *, update=True):
+        if self.barrier:
+            # Only returns once every placeholder of the level is being resolved
+            self.barrier.wait(timeout=1)
+        self.resolved_with = self._reddit
+        return self.resolved
+
+
+class FakeSubmission:
+    id = "post"
+
+    def __init__(self, comments):
+        self.comments = comments
+
+
+class Requests:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, call):
+        self.calls += 1
+        return call()
+
+
+def test_levels_are_expanded_breadth_first_by_score():
+    submission = FakeSubmission([
+        _comment("low", 1, replies=[_comment("low-reply", 100, parent_id="t1_low")]),
+        _comment("high", 10, replies=[_comment("high-reply", 5, parent_id="t1_high")]),
+        # Resolves to a top-level comment and a reply nested under it
+        FakeMoreComments("t3_post", [
+            _comment("hidden", 50),
+            _comment("hidden-reply", 1, parent_id="t1_hidden"),
+        ]),
+    ])
+
+    comments = expand_comments(submission, CommentBudget(max_requests=5, max_depth=2, max_comments=10), Requests())
+    assert [(comment.id, depth) for comment, depth in comments] == [
+        ("hidden", 1), ("high", 1), ("low", 1), ("low-reply", 2), ("high-reply", 2), ("hidden-reply", 2)
+    ]
+
+
+def test_expansion_stays_within_the_budget():
+    deep = _comment("a", 3, replies=[_comment("b", 2, parent_id="t1_a", replies=[
+        _comment("c", 1, parent_id="t1_b"),
+    ])])
+    placeholders = [FakeMoreComments("t3_post", [_comment(f"more{i}", 0)]) for i in range(4)]
+    submission = FakeSubmission([deep, *placeholders])
+    requests = Requests()
+
+    comments = expand_comments(submission, CommentBudget(max_requests=3, max_depth=2, max_comments=10), requests)
+    # The submission and two of the four placeholders, the reply at depth 3 is not reached
+    assert requests.calls == 3
+    assert [comment.id for comment, _ in comments] == ["a", "more0", "more1", "b"]
+
+    capped = expand_comments(FakeSubmission([deep]), CommentBudget(max_requests=1, max_comments=2), Requests())
+    assert [comment.id for comment, _ in capped] == ["a", "b"]
+
+
+def test_placeholders_of_a_level_are_resolved_concurrently_with_thread_instances():
+    barrier = threading.Barrier(3)
+    placeholders = [FakeMoreComments("t3_post", [_comment(f"more{i}", i)], barrier=barrier) for i in range(3)]
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        comments = expand_comments(
+            FakeSubmission(placeholders), CommentBudget(max_requests=4), Requests(),
+            executor=executor, reddit=lambda: threading.current_thread().name,
+        )
+
+    assert [comment.id for comment, _ in comments] == ["more2", "more1", "more0"]
+    # Every placeholder requested through the instance of the thread resolving it
+    assert all(more.resolved_with.startswith("ThreadPoolExecutor") for more in placeholders)
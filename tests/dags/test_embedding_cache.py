@@ -0,0 +1,63 @@
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import EmbeddingCache, CachedDocumentEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_cached_texts_are_not_embedded_again(tmp_path):
+    model = CountingEmbeddings()
+    embeddings = CachedDocumentEmbeddings(model, EmbeddingCache(str(tmp_path / "cache.sqlite")), model="test")
+
+    first = embeddings.embed_documents(["a", "bb", "a"])
+    second = embeddings.embed_documents(["bb", "ccc"])
+
+    assert first == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert second == [[2.0, 1.0], [3.0, 1.0]]
+    assert model.embedded == ["a", "bb", "ccc"]
+
+
+def test_cache_persists_and_keys_on_model(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    CachedDocumentEmbeddings(CountingEmbeddings(), EmbeddingCache(path), model="small").embed_documents(["text"])
+
+    cache = EmbeddingCache(path)
+    model = CountingEmbeddings()
+    CachedDocumentEmbeddings(model, cache, model="small").embed_documents(["text"])
+    CachedDocumentEmbeddings(model, cache, model="large").embed_documents(["text"])
+
+    assert model.embedded == ["text"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    cache.put_many({"a": [1.0]})
+    cache.put_many({"b": [2.0]})
+    cache.get_many(["a"])
+    cache.put_many({"c": [3.0]})
+
+    assert set(cache.get_many(["a", "b", "c"])) == {"a", "c"}
+    assert cache.stats()["entries"] == 2
+
+
+def test_eviction_counts_the_entries_of_every_process(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    # Two workers sharing the file, neither one wrote every entry
+    first, second = EmbeddingCache(path, max_entries=3), EmbeddingCache(path, max_entries=3)
+    first.put_many({"a": [1.0], "b": [2.0]})
+    second.put_many({"c": [3.0], "d": [4.0]})
+    first.put_many({"e": [5.0]})
+
+    assert set(first.get_many(["a", "b", "c", "d", "e"])) == {"c", "d", "e"}
+    assert first.stats()["entries"] == second.stats()["entries"] == 3
@@ -0,0 +1,49 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from post_transform import transform_posts
+
+
+def _frame(comments):
+    return pd.DataFrame({
+        "id": ["a", "b", None], "title": ["HD 600 or HD 650?", "XM5 case", "no id"], "body": ["For mixing", None, ""],
+        "author": "user", "subreddit": "HeadphoneAdvice", "score": [3, 4, 5],
+        "created": pd.Timestamp("2024-01-01"), "comments": comments,
+    })
+
+
+def test_posts_get_their_text_hash_and_slim_metadata():
+    posts = transform_posts(_frame([[{"author": "c", "text": "HD 600"}, {"text": "HD 650"}], [], []]), "headphones")
+
+    assert [post["post_data"]["id"] for post in posts] == ["a", "b"]
+    assert posts[0]["text"] == "HD 600 or HD 650? For mixing Comment by c: HD 600 Comment by Unknown: HD 650"
+    assert posts[1]["text"] == "XM5 case  "
+    assert posts[0]["post_data"]["content_hash"] == hashlib.sha256(f"\n{posts[0]['text']}".encode("utf-8")).hexdigest()
+    assert posts[0]["metadata"] == {
+        "id": "a", "post_id": "a", "title": "HD 600 or HD 650?", "author": "user", "subreddit": "HeadphoneAdvice",
+        "score": 3, "created": "2024-01-01 00:00:00", "s3_url": None, "namespace": "headphones", "num_comments": 2,
+    }
+
+
+def test_comment_arrays_read_back_from_parquet_give_the_same_posts():
+    comments = [[{"author": "c", "text": "HD 600", "awards": ["gold"]}], [], []]
+    arrays = [np.array([{**comment, "awards": np.array(comment["awards"])} for comment in post], dtype=object)
+              for post in comments]
+
+    posts = transform_posts(_frame(comments), "headphones")
+    read_back = transform_posts(_frame(arrays), "headphones")
+
+    assert [post["text"] for post in read_back] == [post["text"] for post in posts]
+    assert read_back[0]["post_data"]["comments"] == comments[0]
+
+
+def test_the_content_hash_changes_with_the_index_version():
+    frame = _frame([[], [], []])
+
+    post_hashes = [post["post_data"]["content_hash"] for post in transform_posts(frame, "headphones", "2:post")]
+    chunked_hashes = [post["post_data"]["content_hash"] for post in transform_posts(frame, "headphones", "2:chunked")]
+
+    assert post_hashes == [post["post_data"]["content_hash"] for post in transform_posts(frame, "headphones", "2:post")]
+    assert not set(post_hashes) & set(chunked_hashes)
@@ -0,0 +1,49 @@
+from rate_limiter import TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_bucket_allows_a_burst_then_paces_requests():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.now == 0
+
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.now == 1.0
+
+
+def test_rate_limit_headers_spread_the_remaining_budget_until_the_reset():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=100, capacity=5, clock=clock, sleep=clock.sleep)
+
+    bucket.update_from_headers({"x-ratelimit-remaining": "10.0", "x-ratelimit-reset": "100"})
+    assert bucket.rate == 0.1
+
+    bucket.update_from_headers({"x-ratelimit-remaining": "0", "x-ratelimit-reset": "30"})
+    bucket.acquire()
+    assert clock.now == 30
+
+    bucket.update_from_headers({"x-ratelimit-used": "3"})
+    assert bucket.rate == 1 / 30
+
+
+def test_pause_holds_every_request():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=10, clock=clock, sleep=clock.sleep)
+
+    bucket.pause(5)
+    bucket.acquire()
+    assert clock.now >= 5
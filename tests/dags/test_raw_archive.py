@@ -0,0 +1,85 @@
+import pytest
+
+moto = pytest.importorskip("moto")
+boto3 = pytest.importorskip("boto3")
+
+from raw_archive import RawArchiveWriter, read_raw_post
+
+BUCKET = "raw-archive-test"
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+@pytest.fixture
+def posts():
+    return [{"id": f"post{i}", "title": f"Title {i}", "comments": [{"text": "comment"}] * i} for i in range(5)]
+
+
+def test_per_post_mode_uploads_one_object_per_post(s3_client, posts):
+    writer = RawArchiveWriter(s3_client, BUCKET, mode="per_post", max_workers=4)
+    s3_urls = writer.write(posts, prefix="reddit_posts/run")
+
+    assert s3_urls["post3"] == f"s3://{BUCKET}/reddit_posts/run/post3.json"
+    assert s3_client.list_objects_v2(Bucket=BUCKET)["KeyCount"] == len(posts)
+    assert read_raw_post(s3_client, s3_urls["post3"]) == posts[3]
+
+
+def test_bundled_mode_writes_one_object_and_a_manifest(s3_client, posts):
+    writer = RawArchiveWriter(s3_client, BUCKET, mode="bundled")
+    s3_urls = writer.write(posts, prefix="reddit_posts/run")
+
+    keys = sorted(obj["Key"] for obj in s3_client.list_objects_v2(Bucket=BUCKET)["Contents"])
+    assert len(keys) == 2
+    assert keys[0].endswith(".manifest.json") and keys[1].endswith(".ndjson.gz")
+
+    for post in posts:
+        assert read_raw_post(s3_client, s3_urls[post["id"]]) == post
+
+
+def test_unknown_mode_is_rejected(s3_client):
+    with pytest.raises(ValueError):
+        RawArchiveWriter(s3_client, BUCKET, mode="parquet")
+
+
+class FlakyS3:
+    def __init__(self, s3_client, failures):
+        self.s3_client = s3_client
+        self.failures = failures
+
+    def put_object(self, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("S3 unavailable")
+        return self.s3_client.put_object(**kwargs)
+
+
+def _retry_twice(func, *args, **kwargs):
+    for attempt in range(3):
+        try:
+            return func(*args, **kwargs)
+        except ConnectionError:
+            if attempt == 2:
+                raise
+
+
+@pytest.mark.parametrize("mode", RawArchiveWriter.MODES)
+def test_failed_uploads_are_retried(s3_client, posts, mode):
+    writer = RawArchiveWriter(FlakyS3(s3_client, failures=2), BUCKET, mode=mode, max_workers=1, retry=_retry_twice)
+
+    s3_urls = writer.write(posts, prefix="reddit_posts/run")
+    assert set(s3_urls) == {post["id"] for post in posts}
+
+
+@pytest.mark.parametrize("mode", RawArchiveWriter.MODES)
+def test_posts_that_cannot_be_archived_are_left_out(s3_client, posts, mode):
+    writer = RawArchiveWriter(FlakyS3(s3_client, failures=100), BUCKET, mode=mode, retry=_retry_twice)
+
+    assert writer.write(posts, prefix="reddit_posts/run") == {}
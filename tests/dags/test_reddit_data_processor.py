@@ -0,0 +1,109 @@
+from unittest.mock import MagicMock, patch
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("langchain_pinecone")
+
+from post_transform import transform_posts
+from reddit_data_processor import RedditDataProcessor
+
+
+@pytest.fixture
+def processor():
+    with patch.object(RedditDataProcessor, "_init_s3_client"), \
+            patch.object(RedditDataProcessor, "_init_pinecone"), \
+            patch.object(RedditDataProcessor, "_init_embedding_model"):
+        yield RedditDataProcessor()
+
+
+def _post(processor, title="Sony WH-1000XM5 or Bose QC Ultra?", score=10):
+    row = pd.Series({
+        "id": "abc", "title": title, "body": "Mostly for flights", "author": "user", "subreddit": "HeadphoneAdvice",
+        "score": score, "created": pd.Timestamp("2024-01-01"), "comments": [{"author": "c", "text": "XM5", "score": 1}],
+    })
+    return transform_posts(pd.DataFrame([row]), "headphones", processor.index_version)[0]
+
+
+def test_unchanged_posts_are_skipped_and_score_changes_are_updated_in_place(processor):
+    stored = _post(processor)["post_data"]
+    with patch.object(processor, "fetch_post_states", return_value={
+        "abc": {"content_hash": stored["content_hash"], "score": 10}
+    }):
+        assert processor._select_changed_posts([_post(processor)]) == ([], [])
+        assert processor._select_changed_posts([_post(processor, score=25)]) == ([], [("abc", 25)])
+
+        edited = _post(processor, title="Sony WH-1000XM5 or AirPods Max?")
+        assert processor._select_changed_posts([edited]) == ([edited], [])
+
+
+def test_new_posts_are_processed(processor):
+    post = _post(processor)
+    with patch.object(processor, "fetch_post_states", return_value={}):
+        assert processor._select_changed_posts([post]) == ([post], [])
+
+
+def test_chunked_mode_emits_body_chunks_and_comment_windows(processor):
+    processor.indexing_mode = "chunked"
+    processor.comment_window_size = 2
+    post = _post(processor)
+    post["post_data"]["comments"] = [{"author": f"user{i}", "text": f"comment {i}"} for i in range(5)]
+    post["post_data"]["s3_url"] = "s3://bucket/abc.json"
+
+    documents = processor._chunk_post(post)
+
+    assert [document["id"] for document in documents] == [
+        "abc#body-0", "abc#comments-0", "abc#comments-1", "abc#comments-2"
+    ]
+    assert all(document["metadata"]["post_id"] == "abc" for document in documents)
+    assert all(document["text"].startswith("Sony WH-1000XM5") for document in documents)
+    assert "comment 4" in documents[-1]["text"] and "comments" not in documents[0]["metadata"]
+
+
+def test_chunked_mode_updates_the_score_of_every_chunk(processor):
+    processor.indexing_mode = "chunked"
+    processor.pc_index = MagicMock()
+    processor.pc_index.list.side_effect = lambda prefix, namespace: {
+        "abc#": [["abc#body-0", "abc#comments-0"], ["abc#comments-1"]],
+    }.get(prefix, [])
+
+    with patch.object(processor, "_db_connection"):
+        processor.update_post_scores([("abc", 25), ("old", 7)], "headphones")
+
+    updated = {(c.kwargs["id"], c.kwargs["set_metadata"]["score"]) for c in processor.pc_index.update.call_args_list}
+    # Posts indexed before chunking keep their whole-post vector
+    assert updated == {("abc#body-0", 25), ("abc#comments-0", 25), ("abc#comments-1", 25), ("old", 7)}
+
+
+def test_reindexing_in_post_mode_deletes_the_chunks_of_the_post(processor):
+    processor.pc_index = MagicMock()
+    processor.pc_index.list.return_value = [["abc#body-0", "abc#comments-0"]]
+    post = _post(processor)
+    post["stored"] = True
+
+    processor.delete_stale_chunks([post], [{"id": "abc", "post_id": "abc"}], "headphones")
+
+    processor.pc_index.delete.assert_called_once_with(ids=["abc#body-0", "abc#comments-0"], namespace="headphones")
+
+
+def test_store_batch_reports_the_posts_that_were_not_stored(processor):
+    posts = [_post(processor), _post(processor)]
+    posts[1]["post_data"]["id"] = posts[1]["metadata"]["id"] = "def"
+    for post in posts:
+        post["stored"] = False
+    batch = {
+        "namespace": "headphones", "posts": posts, "failed_post_ids": {"ghi"},
+        "documents": [{"id": post_id, "post_id": post_id, "metadata": {}} for post_id in ("abc", "def")],
+        "embeddings": [[0.1], [0.2]],
+    }
+
+    with patch.object(processor, "upsert_vectors", return_value={"def"}), \
+            patch.object(processor, "delete_stale_chunks"), \
+            patch.object(processor, "insert_reddit_articles", return_value=True) as insert:
+        assert processor.store_batch(batch) == {"def", "ghi"}
+    assert [post["id"] for post in insert.call_args.args[0]] == ["abc"]
+
+    with patch.object(processor, "upsert_vectors", return_value=set()), \
+            patch.object(processor, "delete_stale_chunks"), \
+            patch.object(processor, "insert_reddit_articles", return_value=False):
+        assert processor.store_batch(batch) == {"abc", "def", "ghi"}
@@ -0,0 +1,78 @@
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("airflow")
+pytest.importorskip("langchain_pinecone")
+
+import reddit_pipeline
+from scrape_artifacts import write_posts_artifact
+from scrape_checkpoints import FileCheckpointStore
+
+DAGS_FOLDER = os.path.join(os.path.dirname(__file__), "..", "..", "dags")
+
+
+class FakeTaskInstance:
+    def __init__(self, xcoms):
+        self.xcoms = xcoms
+
+    def xcom_pull(self, task_ids):
+        return self.xcoms.get(task_ids)
+
+
+def test_every_category_gets_a_batch_task_group():
+    from airflow.models import DagBag
+
+    dag_bag = DagBag(dag_folder=os.path.join(DAGS_FOLDER, "reddit_pipeline.py"), include_examples=False)
+    assert dag_bag.import_errors == {}
+
+    dag = dag_bag.get_dag("reddit_data_pipeline")
+    for category in reddit_pipeline.CATEGORIES:
+        group = category["name"]
+        assert dag.get_task(f"{group}.scrape_task").downstream_task_ids == {f"{group}.list_chunks_task"}
+        assert dag.get_task(f"{group}.process_task").downstream_task_ids == {f"{group}.save_checkpoints_task"}
+        # A failed subreddit or chunk does not hold back the rest of the category
+        assert dag.get_task(f"{group}.list_chunks_task").trigger_rule == "all_done"
+        assert dag.get_task(f"{group}.save_checkpoints_task").trigger_rule == "all_done"
+
+
+def test_chunks_of_failed_scrapes_are_left_out():
+    ti = FakeTaskInstance({"headphones.scrape_task": [
+        {"checkpoint_key": "headphones:a", "artifact_paths": ["a-0.parquet", "a-1.parquet"], "checkpoint": None},
+        None,
+    ]})
+
+    assert reddit_pipeline.list_chunk_artifacts("headphones.scrape_task", "headphones", ti=ti) == [
+        {"artifact_path": "a-0.parquet", "namespace": "headphones"},
+        {"artifact_path": "a-1.parquet", "namespace": "headphones"},
+    ]
+
+
+def test_checkpoints_only_move_past_stored_posts(tmp_path, monkeypatch):
+    store = FileCheckpointStore(str(tmp_path / "checkpoints.json"))
+    monkeypatch.setattr(reddit_pipeline, "SCRAPE_MODE", "incremental")
+    monkeypatch.setattr(reddit_pipeline, "get_checkpoint_store", lambda: store)
+
+    def scrape_result(subreddit):
+        # Newest first, like the `new` listing
+        posts = pd.DataFrame({"id": [f"{subreddit}{i}" for i in range(3)], "created_utc": [300.0, 200.0, 100.0]})
+        path = write_posts_artifact(posts, str(tmp_path / f"{subreddit}.parquet"))
+        checkpoint = {"created_utc": 300.0, "post_id": f"{subreddit}0"}
+        return {"checkpoint_key": f"headphones:{subreddit}", "artifact_paths": [path], "checkpoint": checkpoint}
+
+    scrape_results = [scrape_result("stored"), scrape_result("failed"), scrape_result("crashed"), None]
+    ti = FakeTaskInstance({
+        "headphones.scrape_task": scrape_results,
+        # The chunk of the crashed subreddit has no process_task result
+        "headphones.process_task": [
+            {"artifact_path": scrape_results[0]["artifact_paths"][0], "failed_post_ids": []},
+            {"artifact_path": scrape_results[1]["artifact_paths"][0], "failed_post_ids": ["failed1"]},
+        ],
+    })
+
+    reddit_pipeline.save_checkpoints("headphones.scrape_task", "headphones.process_task", ti=ti)
+
+    assert store.load("headphones:stored") == {"created_utc": 300.0, "post_id": "stored0"}
+    assert store.load("headphones:failed") == {"created_utc": 100.0, "post_id": "failed2"}
+    assert store.load("headphones:crashed") is None
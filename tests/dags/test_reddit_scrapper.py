@@ -0,0 +1,135 @@
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("praw")
+
+from prawcore.exceptions import TooManyRequests
+
+import reddit_scrapper
+from comment_expansion import CommentBudget
+from reddit_scrapper import RedditScraper
+
+
+class FakeReddit:
+    def __init__(self, fetch_seconds=0.0, rate_limited_fetches=0):
+        self.fetch_seconds = fetch_seconds
+        self.rate_limited_fetches = rate_limited_fetches
+
+    def subreddit(self, name):
+        # Newest first, one post per hour
+        now = time.time()
+        submissions = [
+            SimpleNamespace(id=f"p{i}", title=f"Title {i}", score=i, url="", num_comments=1, created=now - i * 3600,
+                            created_utc=now - i * 3600, author="user", selftext="body")
+            for i in range(12)
+        ]
+        return SimpleNamespace(
+            top=lambda time_filter, limit: iter(submissions), new=lambda limit: iter(submissions[:limit]),
+            hot=lambda limit: self.listing(submissions * 20),
+        )
+
+    def listing(self, submissions):
+        reddit = self
+
+        class Listing:
+            """Pages of 100 submissions requested on demand like praw's ListingGenerator, a page can be rejected"""
+            index = 0
+
+            def __iter__(self):
+                return self
+
+            def __next__(self):
+                if self.index == len(submissions):
+                    raise StopIteration
+                if self.index % 100 == 0 and reddit.rate_limited_fetches:
+                    reddit.rate_limited_fetches -= 1
+                    raise TooManyRequests(SimpleNamespace(headers={"retry-after": "0.01"}, text="", status_code=429))
+                self.index += 1
+                return submissions[self.index - 1]
+
+        return Listing()
+
+    def submission(self, id):
+        reddit = self
+
+        class Submission:
+            @property
+            def comments(self):
+                time.sleep(reddit.fetch_seconds)
+                if reddit.rate_limited_fetches:
+                    reddit.rate_limited_fetches -= 1
+                    raise TooManyRequests(SimpleNamespace(headers={"retry-after": "0.01"}, text="", status_code=429))
+                return [SimpleNamespace(body=f"comment on {id}", score=1, author="c")]
+
+        return Submission()
+
+
+@pytest.fixture
+def scraper_for(monkeypatch):
+    def make(reddit):
+        # The worker threads authenticate their own instance, all of them get the fake
+        monkeypatch.setattr(RedditScraper, "_authenticate", lambda self: reddit)
+        return RedditScraper(client_id="id", client_secret="secret", load_env=False, comment_workers=6,
+                             requests_per_minute=60_000)
+    return make
+
+
+def test_comment_trees_are_fetched_concurrently_in_listing_order(scraper_for):
+    scraper = scraper_for(FakeReddit(fetch_seconds=0.1))
+
+    start = time.perf_counter()
+    posts = list(scraper.iter_subreddit("HeadphoneAdvice", limit=12))
+
+    # 12 sequential fetches would take 1.2s
+    assert time.perf_counter() - start < 0.6
+    assert [post["id"] for post in posts] == [f"p{i}" for i in range(12)]
+    assert all(post["comments"] == [{"text": f"comment on {post['id']}", "score": 1, "author": "c"}] for post in posts)
+
+
+def test_rate_limited_fetches_are_retried(scraper_for):
+    scraper = scraper_for(FakeReddit(rate_limited_fetches=2))
+
+    posts = list(scraper.iter_subreddit("HeadphoneAdvice", limit=3))
+    assert all(post["comments"] for post in posts)
+
+
+def test_incremental_scrape_stops_at_the_checkpoint_or_the_refresh_window(scraper_for):
+    scraper = scraper_for(FakeReddit())
+    first_scrape = list(scraper.iter_new_posts("HeadphoneAdvice", include_comments=False))
+    assert len(first_scrape) == 12
+
+    checkpoint = {"created_utc": first_scrape[5]["created_utc"], "post_id": "p5"}
+    new_posts = scraper.iter_new_posts("HeadphoneAdvice", checkpoint, refresh_window=timedelta(0),
+                                       include_comments=False)
+    assert [post["id"] for post in new_posts] == ["p0", "p1", "p2", "p3", "p4"]
+
+    # Posts younger than 7.5 hours are refreshed even though p5 to p7 were already scraped
+    refreshed = scraper.iter_new_posts("HeadphoneAdvice", checkpoint, refresh_window=timedelta(hours=7.5),
+                                       include_comments=False)
+    assert [post["id"] for post in refreshed] == [f"p{i}" for i in range(8)]
+
+
+def test_listing_pages_wait_for_the_rate_limiter(scraper_for, monkeypatch):
+    scraper = scraper_for(FakeReddit(rate_limited_fetches=1))
+    acquired = []
+    monkeypatch.setattr(scraper.rate_limiter, "acquire", lambda: acquired.append(1))
+
+    posts = list(scraper.iter_subreddit("HeadphoneAdvice", sort_by="hot", limit=240, include_comments=False))
+
+    assert len(posts) == 240
+    # Pages 1 to 3, and the retry of the rejected first page
+    assert len(acquired) == 4
+
+
+def test_expanded_comments_keep_their_place_in_the_tree(scraper_for, monkeypatch):
+    scraper = scraper_for(FakeReddit())
+    scraper.comment_budget = CommentBudget()
+    reply = SimpleNamespace(body="HD 650", score=3, author="c", parent_id="t1_top")
+    monkeypatch.setattr(reddit_scrapper, "expand_comments", lambda submission, budget, request, **kwargs: [(reply, 2)])
+
+    assert scraper._fetch_comments("p0", comments_limit=25) == [
+        {"text": "HD 650", "score": 3, "author": "c", "parent_id": "t1_top", "depth": 2}
+    ]
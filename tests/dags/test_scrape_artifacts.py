@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from post_transform import transform_posts
+from scrape_artifacts import iter_posts_artifact, write_posts_artifact
+
+BUCKET = "scrape-artifacts-test"
+
+
+@pytest.fixture
+def scraped_data():
+    return pd.DataFrame({
+        "id": [f"post{i}" for i in range(7)],
+        "title": [f"Title {i}" for i in range(7)],
+        "body": "body",
+        "author": "user",
+        "subreddit": "HeadphoneAdvice",
+        "score": range(7),
+        "created": pd.Timestamp("2024-01-01"),
+        "comments": [[{"text": f"comment {j}", "score": j, "author": "c"} for j in range(i)] for i in range(7)],
+    })
+
+
+def test_artifact_is_read_back_one_row_group_at_a_time(tmp_path, scraped_data):
+    path = write_posts_artifact(scraped_data, str(tmp_path / "posts.parquet"), row_group_size=3)
+
+    chunks = list(iter_posts_artifact(path))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+
+    read_back = pd.concat(chunks, ignore_index=True)
+    assert [post["text"] for post in transform_posts(read_back, "headphones")] == [
+        post["text"] for post in transform_posts(scraped_data, "headphones")
+    ]
+
+
+def test_artifact_columns_can_be_read_alone(tmp_path, scraped_data):
+    path = write_posts_artifact(scraped_data, str(tmp_path / "posts.parquet"), row_group_size=3)
+
+    chunks = list(iter_posts_artifact(path, columns=["id", "score"]))
+    assert all(list(chunk.columns) == ["id", "score"] for chunk in chunks)
+    assert pd.concat(chunks)["id"].tolist() == scraped_data["id"].tolist()
+
+
+def test_artifact_round_trips_through_s3(monkeypatch, scraped_data):
+    moto = pytest.importorskip("moto")
+    boto3 = pytest.importorskip("boto3")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+
+    with moto.mock_aws():
+        s3_client = boto3.client("s3", region_name="us-east-1")
+        s3_client.create_bucket(Bucket=BUCKET)
+
+        path = write_posts_artifact(scraped_data, f"s3://{BUCKET}/scrapes/posts.parquet", s3_client=s3_client)
+        chunks = list(iter_posts_artifact(path, s3_client=s3_client))
+
+    assert path == f"s3://{BUCKET}/scrapes/posts.parquet"
+    assert pd.concat(chunks)["id"].tolist() == scraped_data["id"].tolist()
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from scrape_checkpoints import FileCheckpointStore, checkpoint_after
+
+
+def test_checkpoint_moves_to_the_newest_post():
+    posts = [{"id": "b", "created_utc": 200.0}, {"id": "c", "created_utc": 300.0}, {"id": "a", "created_utc": 100.0}]
+
+    assert checkpoint_after(None, posts) == {"created_utc": 300.0, "post_id": "c"}
+    assert checkpoint_after({"created_utc": 400.0, "post_id": "d"}, posts) == {"created_utc": 400.0, "post_id": "d"}
+    assert checkpoint_after(None, []) is None
+
+
+def test_checkpoint_stays_before_the_oldest_post_that_was_not_stored():
+    posts = [{"id": "d", "created_utc": 400.0}, {"id": "c", "created_utc": 300.0}, {"id": "b", "created_utc": 200.0},
+             {"id": "a", "created_utc": 100.0}]
+
+    assert checkpoint_after(None, posts, {"d", "b"}) == {"created_utc": 100.0, "post_id": "a"}
+    assert checkpoint_after(None, posts, {"a"}) is None
+    assert checkpoint_after({"created_utc": 50.0, "post_id": "x"}, posts, {"c"}) == {
+        "created_utc": 200.0, "post_id": "b"
+    }
+
+
+def test_file_store_keeps_the_newest_checkpoint(tmp_path):
+    store = FileCheckpointStore(str(tmp_path / "state" / "checkpoints.json"))
+    assert store.load("HeadphoneAdvice") is None
+
+    store.save({"HeadphoneAdvice": {"created_utc": 300.0, "post_id": "c"}})
+    store.save({
+        "HeadphoneAdvice": {"created_utc": 100.0, "post_id": "a"},
+        "headphones": {"created_utc": 5.0, "post_id": "x"},
+    })
+
+    assert FileCheckpointStore(store.path).load("HeadphoneAdvice") == {"created_utc": 300.0, "post_id": "c"}
+    assert store.load("headphones") == {"created_utc": 5.0, "post_id": "x"}
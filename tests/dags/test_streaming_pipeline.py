@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from streaming_pipeline import StreamingPipeline
+
+
+def _sleeping(seconds, func=lambda item: item):
+    def stage(item):
+        time.sleep(seconds)
+        return func(item)
+    return stage
+
+
+def test_stages_overlap_and_keep_the_item_order():
+    stored = []
+    pipeline = StreamingPipeline([
+        ("prepare", _sleeping(0.05, lambda item: None if item == 3 else item)),
+        ("embed", _sleeping(0.05, lambda item: item * 10)),
+        ("store", _sleeping(0.05, stored.append)),
+    ], poll_seconds=0.01)
+
+    stats = pipeline.run(range(8))
+
+    assert stored == [0, 10, 20, 40, 50, 60, 70]
+    assert stats["prepare"]["items"] == 8 and stats["store"]["items"] == 7
+    # 23 stage calls of 50ms run sequentially would take over 1.1s
+    assert stats["wall_seconds"] < 0.8
+
+
+def test_a_slow_consumer_holds_back_the_source():
+    produced, consumed = [], []
+
+    def source():
+        for i in range(10):
+            produced.append(i)
+            yield i
+
+    def consume(item):
+        # Items queued between the source and the stage, plus the one the source thread is blocked on
+        assert len(produced) - len(consumed) <= 2 + 2
+        consumed.append(item)
+        time.sleep(0.01)
+
+    StreamingPipeline([("store", consume)], queue_size=2, poll_seconds=0.01).run(source())
+    assert consumed == list(range(10))
+
+
+def test_a_failing_stage_stops_the_pipeline():
+    stopped = threading.Event()
+
+    def source():
+        for i in range(1000):
+            yield i
+        stopped.set()
+
+    def fail_on_the_third_item(item):
+        if item == 2:
+            raise RuntimeError("embedding failed")
+        return item
+
+    pipeline = StreamingPipeline([("embed", fail_on_the_third_item), ("store", print)], poll_seconds=0.01)
+    with pytest.raises(RuntimeError, match="embedding failed"):
+        pipeline.run(source())
+    assert not stopped.is_set()
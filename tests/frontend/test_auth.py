@@ -0,0 +1,30 @@
+from unittest.mock import MagicMock, patch
+
+from frontend.utils import auth
+
+
+def _response(status_code, lines=(), json_body=None):
+    response = MagicMock(ok=status_code < 400, status_code=status_code)
+    response.__enter__.return_value = response
+    response.iter_lines.return_value = iter(lines)
+    response.json.return_value = json_body
+    return response
+
+
+def _stream(response):
+    with patch.object(auth, "get_access_token", return_value="token"), \
+            patch.object(auth.requests, "post", return_value=response):
+        return list(auth.make_authenticated_stream_request("search/initial/stream", data={}))
+
+
+def test_stream_events_are_parsed():
+    response = _response(200, ["event: session", 'data: {"chat_session_id": 7}', "", 'data: {"content": "x"}', ""])
+
+    assert _stream(response) == [("session", {"chat_session_id": 7}), ("message", {"content": "x"})]
+
+
+def test_error_response_is_yielded_as_an_error_event():
+    response = _response(401, json_body={"detail": "Invalid token or expired token."})
+
+    assert _stream(response) == [("error", {"detail": "Invalid token or expired token."})]
+    response.iter_lines.assert_not_called()
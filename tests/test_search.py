@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 from backend.schemas.search import InitialSearchResponse
 from backend.services.search import (
     process_initial_search_query,
@@ -10,11 +10,12 @@ from backend.services.search import (
 # Fixtures
 @pytest.fixture
 def mock_agent_workflow():
-    with patch("backend.agent.agent_workflow.invoke", return_value={
-        "generation": "Generated response",
-        "steps": ["Step 1", "Step 2"],
-        "perform_web_search": True,
-    }) as mock:
+    with patch("backend.services.search.get_agent_workflow") as mock:
+        mock.return_value.ainvoke = AsyncMock(return_value={
+            "generation": "Generated response",
+            "steps": ["Step 1", "Step 2"],
+            "perform_web_search": True,
+        })
         yield mock
 
 @pytest.fixture